@@ -0,0 +1,51 @@
+# bench_anomaly.py
+
+from xIndices.utils import calculate_anomaly
+
+from .common import skip_if_too_large
+from .synthetic import cached_field, n_steps
+
+
+class MonthlyAnomaly:
+    """calculate_anomaly on monthly fields, whole-record and base-period climatologies."""
+
+    params = (['5deg', '1deg', '0.25deg'], [10, 40])
+    param_names = ['resolution', 'n_years']
+    timeout = 600
+
+    def setup(self, resolution, n_years):
+        skip_if_too_large(resolution, n_years)
+        self.field = cached_field(resolution, n_steps(n_years, 'monthly'))
+
+    def time_calculate_anomaly(self, resolution, n_years):
+        calculate_anomaly(self.field)
+
+    def time_calculate_anomaly_base_period(self, resolution, n_years):
+        calculate_anomaly(self.field, clim_start=1950, clim_end=1950 + n_years // 2 - 1)
+
+    def peakmem_calculate_anomaly(self, resolution, n_years):
+        calculate_anomaly(self.field)
+
+
+class DailyAnomaly:
+    """calculate_anomaly with a day-of-year climatology."""
+
+    params = (['5deg', '1deg'], [5, 20])
+    param_names = ['resolution', 'n_years']
+    timeout = 600
+
+    def setup(self, resolution, n_years):
+        skip_if_too_large(resolution, n_years, 'daily')
+        self.field = cached_field(resolution, n_steps(n_years, 'daily'), 'daily')
+
+    def time_calculate_anomaly(self, resolution, n_years):
+        calculate_anomaly(self.field, freq='dayofyear')
+
+    def peakmem_calculate_anomaly(self, resolution, n_years):
+        calculate_anomaly(self.field, freq='dayofyear')
+
+    def time_calculate_anomaly_harmonic(self, resolution, n_years):
+        calculate_anomaly(self.field, freq='dayofyear', n_harmonics=3)
+
+    def peakmem_calculate_anomaly_harmonic(self, resolution, n_years):
+        calculate_anomaly(self.field, freq='dayofyear', n_harmonics=3)
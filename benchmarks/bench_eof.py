@@ -0,0 +1,95 @@
+# bench_eof.py
+
+from xIndices.combined_eof import combined_eofs
+from xIndices.utils import calculate_anomaly, clear_eof_cache, compute_rotated_eofs, stack_vars, standardize_data
+
+from .common import skip_if_too_large
+from .synthetic import cached_field, n_steps
+
+
+# Anomalies of the synthetic fields carry three signals (trend, ENSO, AMO); rotating
+# pure-noise modes as well does not converge, so the rotation is timed on those modes.
+ROTATED_MODES = 3
+
+
+class RotatedEOFs:
+    """compute_rotated_eofs on global monthly anomalies for every solver backend."""
+
+    params = (['5deg', '1deg'], [20, 40], ['full', 'randomized', 'gram'])
+    param_names = ['resolution', 'n_years', 'solver']
+    timeout = 900
+
+    def setup(self, resolution, n_years, solver):
+        skip_if_too_large(resolution, n_years)
+        if resolution == '1deg' and solver == 'full':
+            raise NotImplementedError("the full SVD of a global 1-degree field takes too long")
+        self.anomaly = calculate_anomaly(cached_field(resolution, n_steps(n_years, 'monthly')))
+
+    def time_unrotated(self, resolution, n_years, solver):
+        compute_rotated_eofs(self.anomaly, rotated=None, n_modes=10, use_coslat=True, solver=solver,
+                             random_state=0, cache=False).components()
+
+    def time_varimax(self, resolution, n_years, solver):
+        compute_rotated_eofs(self.anomaly, rotated='Varimax', n_modes=ROTATED_MODES, use_coslat=True, solver=solver,
+                             random_state=0, cache=False).components()
+
+    def peakmem_unrotated(self, resolution, n_years, solver):
+        compute_rotated_eofs(self.anomaly, rotated=None, n_modes=10, use_coslat=True, solver=solver,
+                             random_state=0, cache=False).components()
+
+
+class RotationSweep:
+    """Varimax and Promax on 2..ROTATED_MODES modes, refitting every time or reusing one fit."""
+
+    params = (['5deg', '1deg'], ['full', 'gram'])
+    param_names = ['resolution', 'solver']
+    timeout = 900
+
+    def setup(self, resolution, solver):
+        if resolution == '1deg' and solver == 'full':
+            raise NotImplementedError("the full SVD of a global 1-degree field takes too long")
+        self.anomaly = calculate_anomaly(cached_field(resolution, n_steps(20, 'monthly')))
+
+    def _sweep(self, solver, cache):
+        clear_eof_cache()
+        previous = None
+        for rotated in ('Varimax', 'Promax'):
+            for n_rotated in range(2, ROTATED_MODES + 1):
+                previous = compute_rotated_eofs(self.anomaly, rotated=rotated, n_modes=ROTATED_MODES,
+                                                n_rotated=n_rotated, solver=solver, cache=cache,
+                                                initial_rotation=previous if cache else None)
+                previous.components()
+
+    def time_sweep_refit(self, resolution, solver):
+        self._sweep(solver, cache=False)
+
+    def time_sweep_reused_fit(self, resolution, solver):
+        self._sweep(solver, cache=True)
+
+
+class CombinedEOFs:
+    """Combined EOFs of three variables: blockwise Gram solver against stack_vars + standardize_data."""
+
+    params = (['5deg', '1deg'],)
+    param_names = ['resolution']
+    timeout = 900
+
+    def setup(self, resolution):
+        n_time = n_steps(20, 'monthly')
+        self.variables = [calculate_anomaly(cached_field(resolution, n_time, seed=seed)) for seed in (0, 1, 2)]
+
+    def _stacked(self):
+        stacked = standardize_data(stack_vars(self.variables), dim='time')
+        compute_rotated_eofs(stacked, n_modes=5, solver='gram', cache=False).components()
+
+    def time_combined(self, resolution):
+        combined_eofs(self.variables, n_modes=5, normalize='point').components()
+
+    def time_stacked(self, resolution):
+        self._stacked()
+
+    def peakmem_combined(self, resolution):
+        combined_eofs(self.variables, n_modes=5, normalize='point').components()
+
+    def peakmem_stacked(self, resolution):
+        self._stacked()
@@ -0,0 +1,31 @@
+# bench_filter.py
+
+from xIndices.utils import lanczos_filter_xarray, lanczos_filter_bank
+
+from .common import skip_if_too_large
+from .synthetic import cached_field, n_steps
+
+
+class LanczosFilter:
+    """Low- and band-pass Lanczos filtering of monthly fields along time."""
+
+    params = (['5deg', '1deg'], [10, 40])
+    param_names = ['resolution', 'n_years']
+    timeout = 600
+
+    def setup(self, resolution, n_years):
+        skip_if_too_large(resolution, n_years)
+        self.field = cached_field(resolution, n_steps(n_years, 'monthly')).fillna(0)
+
+    def time_lowpass(self, resolution, n_years):
+        lanczos_filter_xarray(self.field, Cf=1 / 24, M=61, filter_type='low')
+
+    def time_bandpass(self, resolution, n_years):
+        lanczos_filter_xarray(self.field, Cf=1 / 96, Cf2=1 / 24, M=61, filter_type='band')
+
+    def time_filter_bank(self, resolution, n_years):
+        lanczos_filter_bank(self.field, {'interannual': {'filter_type': 'band', 'Cf': 1 / 96, 'Cf2': 1 / 24},
+                                         'decadal': {'filter_type': 'low', 'Cf': 1 / 120}}, M=61)
+
+    def peakmem_lowpass(self, resolution, n_years):
+        lanczos_filter_xarray(self.field, Cf=1 / 24, M=61, filter_type='low')
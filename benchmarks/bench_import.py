@@ -0,0 +1,65 @@
+# bench_import.py
+
+"""
+Import cost of the package. Run as a script to enforce the budget, e.g. in CI:
+
+    python -m benchmarks.bench_import
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+
+# Dependencies that must only be imported on first use (plotting, regridding, EOF fitting, dask)
+HEAVY_MODULES = ('matplotlib', 'cartopy', 'xesmf', 'ESMF', 'xeofs', 'sklearn', 'scipy', 'dask')
+
+# Seconds allowed for 'import xIndices' in a fresh interpreter
+IMPORT_BUDGET = float(os.environ.get('XINDICES_IMPORT_BUDGET', 1.5))
+
+_REPORT = """
+import json, sys, time
+start = time.perf_counter()
+import xIndices
+seconds = time.perf_counter() - start
+heavy = sorted({name.split('.')[0] for name in sys.modules} & set(%r))
+print(json.dumps({'seconds': seconds, 'heavy': heavy}))
+""" % (HEAVY_MODULES,)
+
+
+def import_report():
+    """Time 'import xIndices' in a fresh interpreter and list the heavy modules it loaded."""
+    output = subprocess.run([sys.executable, '-c', _REPORT], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+class Import:
+    """Start-up cost paid by every worker process."""
+
+    timeout = 120
+
+    def timeraw_import_xindices(self):
+        return "import xIndices"
+
+    def track_heavy_modules_loaded(self):
+        return len(import_report()['heavy'])
+
+    track_heavy_modules_loaded.unit = 'modules'
+
+
+def main():
+    report = import_report()
+    print(f"import xIndices: {report['seconds']:.2f} s (budget {IMPORT_BUDGET:.2f} s)")
+    failed = False
+    if report['heavy']:
+        print(f"Heavy modules imported eagerly: {', '.join(report['heavy'])}")
+        failed = True
+    if report['seconds'] > IMPORT_BUDGET:
+        print("Import time exceeds the budget.")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
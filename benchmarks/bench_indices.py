@@ -0,0 +1,46 @@
+# bench_indices.py
+
+from xIndices.indices import global_sst_trend_and_enso, compute_pdo, compute_amo, compute_nao, compute_indices
+
+from .common import skip_if_too_large
+from .synthetic import cached_field, n_steps
+
+
+def _compute(result):
+    """Materialize every output of a (lazy) IndexResult."""
+    return list(result)
+
+
+class Indices:
+    """The index functions end to end on monthly SST, from the raw field."""
+
+    params = (['5deg', '1deg', '0.25deg'], [20, 40])
+    param_names = ['resolution', 'n_years']
+    timeout = 900
+
+    def setup(self, resolution, n_years):
+        skip_if_too_large(resolution, n_years)
+        self.field = cached_field(resolution, n_steps(n_years, 'monthly'))
+
+    def time_global_sst_trend_and_enso(self, resolution, n_years):
+        _compute(global_sst_trend_and_enso(data=self.field, solver='randomized', random_state=0))
+
+    def time_compute_pdo(self, resolution, n_years):
+        _compute(compute_pdo(data=self.field, solver='randomized', random_state=0))
+
+    def time_compute_amo(self, resolution, n_years):
+        _compute(compute_amo(data=self.field))
+
+    def time_compute_nao(self, resolution, n_years):
+        # The SST field stands in for sea-level pressure; few modes keep the rotation convergent
+        _compute(compute_nao(data=self.field, n_modes=3, nao_mode=1, solver='randomized', random_state=0))
+
+    def time_compute_indices(self, resolution, n_years):
+        bundle = compute_indices(['sst_trend_and_enso', 'pdo', 'amo'], data=self.field)
+        for result in bundle.values():
+            _compute(result)
+
+    def peakmem_compute_indices(self, resolution, n_years):
+        bundle = compute_indices(['sst_trend_and_enso', 'pdo', 'amo'], data=self.field)
+        for result in bundle.values():
+            _compute(result)
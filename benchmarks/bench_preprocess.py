@@ -0,0 +1,44 @@
+# bench_preprocess.py
+
+import os
+import shutil
+import tempfile
+
+from xIndices.preprocess_data import load_data
+
+from .synthetic import write_yearly_files
+
+
+class LoadData:
+    """Reading a record stored as one file per year: single file, and lazily through a glob."""
+
+    params = (['5deg', '1deg'], [10, 40])
+    param_names = ['resolution', 'n_years']
+    timeout = 600
+
+    def setup_cache(self):
+        root = tempfile.mkdtemp(prefix='xindices-bench-')
+        for resolution in self.params[0]:
+            for n_years in self.params[1]:
+                write_yearly_files(os.path.join(root, f'{resolution}-{n_years}'), resolution, n_years)
+        return root
+
+    def setup(self, root, resolution, n_years):
+        self.directory = os.path.join(root, f'{resolution}-{n_years}')
+        self.first = sorted(os.listdir(self.directory))[0]
+
+    def time_load_single_file(self, root, resolution, n_years):
+        load_data(os.path.join(self.directory, self.first), var='sst').load()
+
+    def time_load_glob(self, root, resolution, n_years):
+        load_data(os.path.join(self.directory, 'sst_*.nc'), var='sst').load()
+
+    def time_load_glob_subset(self, root, resolution, n_years):
+        load_data(os.path.join(self.directory, 'sst_*.nc'), var='sst', start_time=1955, end_time=1959,
+                  lat_s=-30, lat_e=30, lon_s=120, lon_e=280).load()
+
+    def peakmem_load_glob(self, root, resolution, n_years):
+        load_data(os.path.join(self.directory, 'sst_*.nc'), var='sst').load()
+
+    def teardown_cache(self, root):
+        shutil.rmtree(root, ignore_errors=True)
@@ -0,0 +1,31 @@
+# bench_render.py
+
+import shutil
+import tempfile
+
+from xIndices.rendering import render_maps
+
+from .synthetic import cached_field
+
+
+class RenderMaps:
+    """Batch map rendering, filled contours against raster quick-looks, without map features."""
+
+    params = (['1deg', '0.25deg'], [False, True])
+    param_names = ['resolution', 'quicklook']
+    timeout = 900
+
+    def setup(self, resolution, quicklook):
+        self.field = cached_field(resolution, 2)
+        self.directory = tempfile.mkdtemp(prefix='xindices-bench-')
+
+    def teardown(self, resolution, quicklook):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def time_render_maps(self, resolution, quicklook):
+        render_maps(self.field, self.directory, features=None, quicklook=quicklook, figsize=(8, 4), dpi=100,
+                    max_workers=1)
+
+    def peakmem_render_maps(self, resolution, quicklook):
+        render_maps(self.field, self.directory, features=None, quicklook=quicklook, figsize=(8, 4), dpi=100,
+                    max_workers=1)
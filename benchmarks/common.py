@@ -0,0 +1,15 @@
+# common.py
+
+import os
+
+from .synthetic import field_nbytes
+
+
+# Largest field a benchmark may build; larger parameter combinations are skipped
+MAX_FIELD_BYTES = float(os.environ.get('XINDICES_BENCH_MAX_BYTES', 2.5e9))
+
+
+def skip_if_too_large(resolution, n_years, freq='monthly'):
+    """Skip (asv's NotImplementedError) parameter combinations above MAX_FIELD_BYTES."""
+    if field_nbytes(resolution, n_years, freq) > MAX_FIELD_BYTES:
+        raise NotImplementedError(f"{resolution} x {n_years} years ({freq}) exceeds MAX_FIELD_BYTES")
@@ -0,0 +1,159 @@
+# synthetic.py
+
+"""
+Reproducible synthetic climate fields for the benchmarks, so that no data has to be downloaded.
+
+Fields look like SST: a latitude-dependent mean state, a seasonal cycle of opposite phase in
+the two hemispheres, a warming trend, an ENSO-like oscillation in the tropical Pacific, a slow
+AMO-like signal in the North Atlantic, AR(1) red noise and a fixed land mask. The same
+arguments always give the same field.
+"""
+
+import functools
+import os
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+
+# Grid spacing in degrees of the benchmark resolutions
+RESOLUTIONS = {'5deg': 5.0, '1deg': 1.0, '0.25deg': 0.25}
+
+# Time step of the benchmark frequencies
+FREQUENCIES = {'monthly': 'MS', 'daily': 'D'}
+
+# Persistence of the red noise per time step
+_NOISE_LAG1 = {'monthly': 0.6, 'daily': 0.95}
+
+
+def grid(resolution):
+    """Cell-centred latitudes (ascending) and longitudes (0-360) of a regular grid."""
+    lat = np.arange(-90 + resolution / 2, 90, resolution)
+    lon = np.arange(resolution / 2, 360, resolution)
+    return lat, lon
+
+
+def land_mask(lat, lon, seed=0, land_fraction=0.3):
+    """
+    Boolean (lat, lon) land mask made of smooth random continents plus Antarctica.
+
+    A sum of a few low-wavenumber waves is thresholded so that about 'land_fraction' of the
+    grid cells are land. The continents have the same shape at every resolution.
+    """
+    rng = np.random.default_rng(seed)
+    phi = np.deg2rad(lat)[:, np.newaxis]
+    lam = np.deg2rad(lon)[np.newaxis, :]
+    relief = np.zeros((lat.size, lon.size))
+    for _ in range(12):
+        m, n = rng.integers(1, 5), rng.integers(1, 4)
+        relief += rng.normal() * np.cos(m * lam + rng.uniform(0, 2 * np.pi)) * np.cos(n * phi + rng.uniform(0, np.pi))
+    land = relief > np.quantile(relief, 1 - land_fraction)
+    land |= (lat < -70)[:, np.newaxis]
+    return land
+
+
+def _signals(time, freq, seed):
+    """Time coefficients (time, component) of the seasonal cycle, trend, ENSO and AMO signals."""
+    rng = np.random.default_rng(seed + 1)
+    years = (time - time[0]).days.values / 365.25
+    phase = 2 * np.pi * (time.dayofyear.values - 15) / 365.25
+
+    # ENSO: a few 3-7 year oscillations with random phases, normalized to unit variance
+    enso = sum(np.sin(2 * np.pi * years / period + rng.uniform(0, 2 * np.pi)) for period in rng.uniform(3, 7, 4))
+    enso = enso / enso.std() if enso.std() > 0 else enso
+    amo = np.sin(2 * np.pi * years / 65 + rng.uniform(0, 2 * np.pi))
+    return np.stack([np.cos(phase), years, enso, amo], axis=1)
+
+
+def _patterns(lat, lon):
+    """Spatial patterns (component, lat, lon) matching _signals, and the mean state."""
+    lat2, lon2 = np.meshgrid(lat, lon, indexing='ij')
+    mean_state = 28 * np.cos(np.deg2rad(lat2)) ** 2 - 1
+    seasonal = 4 * np.sin(np.deg2rad(lat2))
+    trend = 0.01 * (1 + 0.5 * np.cos(np.deg2rad(lat2)))
+    enso = 1.5 * np.exp(-(lat2 / 8) ** 2 - ((lon2 - 235) / 40) ** 2) \
+        - 0.5 * np.exp(-((np.abs(lat2) - 30) / 10) ** 2 - ((lon2 - 190) / 30) ** 2)
+    amo = 0.4 * np.exp(-((lat2 - 40) / 20) ** 2 - ((lon2 - 320) / 30) ** 2)
+    return np.stack([seasonal, trend, enso, amo]), mean_state
+
+
+def climate_field(resolution=1.0, n_time=480, freq='monthly', start='1950-01-01', seed=0, land=True,
+    noise=0.5, dtype='float32', name='sst'):
+    """
+    Synthetic SST-like field (time, lat, lon).
+
+    Parameters:
+    resolution (float or str): Grid spacing in degrees, or a key of RESOLUTIONS. Default is 1.0.
+    n_time (int, optional): Number of time steps. Default is 480 (40 years of months).
+    freq (str, optional): 'monthly' or 'daily'. Default is 'monthly'.
+    start (str, optional): First time step. Default is '1950-01-01'.
+    seed (int, optional): Seed of the land mask, signals and noise. Default is 0.
+    land (bool, optional): Set land points to NaN. Default is True.
+    noise (float, optional): Standard deviation of the red noise. Default is 0.5.
+    dtype (str, optional): dtype of the values. Default is 'float32'.
+    name (str, optional): Name of the DataArray. Default is 'sst'.
+
+    Returns:
+    xarray.DataArray: The field, with CF units on lat and lon as in observational products.
+    """
+    resolution = RESOLUTIONS.get(resolution, resolution)
+    lat, lon = grid(resolution)
+    time = pd.date_range(start, periods=n_time, freq=FREQUENCIES[freq])
+
+    # Deterministic signals: one (time, component) @ (component, point) product
+    patterns, mean_state = _patterns(lat, lon)
+    values = (_signals(time, freq, seed) @ patterns.reshape(patterns.shape[0], -1)).astype(dtype)
+    values += mean_state.ravel().astype(dtype)
+
+    # AR(1) red noise, generated step by step in the output dtype to bound memory
+    rng = np.random.default_rng(seed + 2)
+    lag1 = _NOISE_LAG1[freq]
+    scale = noise * np.sqrt(1 - lag1 ** 2)
+    state = rng.standard_normal(values.shape[1], dtype=np.float32) * noise
+    for step in range(n_time):
+        state *= lag1
+        state += scale * rng.standard_normal(values.shape[1], dtype=np.float32)
+        values[step] += state
+
+    values = values.reshape(n_time, lat.size, lon.size)
+    if land:
+        values[:, land_mask(lat, lon, seed=seed)] = np.nan
+
+    field = xr.DataArray(values, dims=('time', 'lat', 'lon'), coords={'time': time, 'lat': lat, 'lon': lon},
+                         name=name)
+    field.lat.attrs['units'] = 'degrees_north'
+    field.lon.attrs['units'] = 'degrees_east'
+    field.attrs['units'] = 'degC'
+    return field
+
+
+@functools.lru_cache(maxsize=4)
+def cached_field(resolution, n_time, freq='monthly', seed=0):
+    """climate_field memoized within a benchmark process. Do not modify the result in place."""
+    return climate_field(resolution, n_time=n_time, freq=freq, seed=seed)
+
+
+def n_steps(n_years, freq):
+    """Number of time steps of a record of 'n_years' years."""
+    return n_years * 12 if freq == 'monthly' else int(round(n_years * 365.25))
+
+
+def field_nbytes(resolution, n_years, freq='monthly', itemsize=4):
+    """Size in bytes of a field, to skip parameter combinations that would not fit in memory."""
+    lat, lon = grid(RESOLUTIONS.get(resolution, resolution))
+    return lat.size * lon.size * n_steps(n_years, freq) * itemsize
+
+
+def write_yearly_files(directory, resolution, n_years, freq='monthly', seed=0):
+    """
+    Write a synthetic record as one netCDF file per year (like many archives) and return the paths.
+    """
+    os.makedirs(directory, exist_ok=True)
+    field = climate_field(resolution, n_time=n_steps(n_years, freq), freq=freq, seed=seed)
+    paths = []
+    for year, chunk in field.groupby('time.year'):
+        path = os.path.join(directory, f'{field.name}_{year}.nc')
+        chunk.to_dataset().to_netcdf(path)
+        paths.append(path)
+    return paths
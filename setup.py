@@ -29,7 +29,7 @@ setup(
     long_description_content_type='text/markdown',
     author='Jivesh Dixit',
     author_email='jiveshdixit@cas.iitd.ac.in',
-    packages=find_packages(where='.', exclude=['tests', 'tests.*', 'docs', 'docs.*']),
+    packages=find_packages(where='.', exclude=['tests', 'tests.*', 'docs', 'docs.*', 'benchmarks', 'benchmarks.*']),
     classifiers=[
         'License :: OSI Approved :: MIT License',
         'Programming Language :: Python :: 3',
@@ -44,8 +44,13 @@ setup(
         'xesmf>= 0.7',
         'matplotlib',
         'cartopy',
-        'xeofs>2.2.3'
+        'xeofs>=3.0,<3.1',
+        'scipy'
     ],
+    extras_require={
+        'zarr': ['zarr'],
+        'test': ['pytest'],
+    },
     python_requires='>=3.11',
     url="https://github.com/JiveshDixit/xindices",
     license="MIT",
@@ -0,0 +1,17 @@
+# collection.py
+
+"""Pytest plugin (see pytest.ini) for the layout of the repository."""
+
+import os
+
+import pytest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def pytest_collect_directory(path, parent):
+    # The repository root holds an __init__.py of its own; collect it as a plain directory
+    # instead of importing it as the package of the tests
+    if str(path) == ROOT:
+        return pytest.Dir.from_parent(parent, path=path)
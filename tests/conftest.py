@@ -0,0 +1,13 @@
+# conftest.py
+
+import pytest
+
+from benchmarks.synthetic import climate_field
+
+
+@pytest.fixture
+def sst():
+    """Small monthly SST-like field (240 months, 4 degree grid) with land and one gap."""
+    field = climate_field(resolution=4.0, n_time=240)
+    field[3, 20, 40] = float('nan')
+    return field
@@ -0,0 +1,43 @@
+# test_anomaly.py
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from xIndices.climatology import ClimatologyAccumulator
+from xIndices.utils import _monthly_anomaly, calculate_anomaly
+
+
+@pytest.mark.parametrize('clim_start, clim_end', [(None, None), (1955, 1960)])
+def test_monthly_anomaly_identical_to_groupby(sst, clim_start, clim_end):
+    base = sst if clim_start is None else sst.sel(time=slice(f'{clim_start}-01-01', f'{clim_end}-12-31'))
+    expected = sst.groupby('time.month') - base.groupby('time.month').mean('time')
+
+    anomaly = _monthly_anomaly(sst, clim_start=clim_start, clim_end=clim_end)
+    assert anomaly is not None
+    xr.testing.assert_identical(anomaly, expected)
+
+
+def test_monthly_anomaly_falls_back_for_dask(sst):
+    assert _monthly_anomaly(sst.chunk({'time': 60})) is None
+    xr.testing.assert_allclose(calculate_anomaly(sst.chunk({'time': 60})).compute(), calculate_anomaly(sst))
+
+
+def test_climatology_accumulator_merge_matches_groupby(sst):
+    base = sst.sel(time=slice('1955-01-01', '1964-12-31'))
+    first = ClimatologyAccumulator(clim_start=1955, clim_end=1964)
+    second = ClimatologyAccumulator(clim_start=1955, clim_end=1964)
+    # Uneven chunks on two workers, one of them covering months outside the base period
+    first.update(sst.isel(time=slice(0, 77))).update(sst.isel(time=slice(77, 100)))
+    second.update(sst.isel(time=slice(100, None)))
+    merged = first.merge(second)
+
+    np.testing.assert_allclose(merged.climatology().values, base.groupby('time.month').mean('time').values,
+                               rtol=1e-6, atol=1e-6)
+    np.testing.assert_allclose(merged.std().values, base.groupby('time.month').std('time').values,
+                               rtol=1e-5, atol=1e-6)
+
+
+def test_climatology_accumulator_rejects_other_base_period():
+    with pytest.raises(ValueError):
+        ClimatologyAccumulator(clim_start=1955, clim_end=1964).merge(ClimatologyAccumulator())
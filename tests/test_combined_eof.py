@@ -0,0 +1,48 @@
+# test_combined_eof.py
+
+import numpy as np
+import pytest
+
+from xIndices.combined_eof import CombinedEOF, combined_eofs
+from xIndices.utils import calculate_anomaly
+
+
+def _preprocessed(field):
+    """Centred, sqrt(coslat) weighted (time, valid point) matrix of one field."""
+    values = field.transpose('time', 'lat', 'lon').values.reshape(field.sizes['time'], -1).astype(np.float64)
+    weights = np.broadcast_to(np.sqrt(np.cos(np.deg2rad(field.lat.values)))[:, np.newaxis], field.shape[1:])
+    valid = np.isfinite(values).all(axis=0)
+    values = values[:, valid] - values[:, valid].mean(axis=0)
+    return values * weights.ravel()[valid]
+
+
+@pytest.mark.parametrize('normalize', [None, 'field'])
+def test_combined_eof_matches_svd_of_stacked_matrix(sst, normalize):
+    variables = {'sst': calculate_anomaly(sst),
+                 'coarse': calculate_anomaly(sst.coarsen(lat=3, lon=3, boundary='trim').mean()) * 10}
+    blocks = [_preprocessed(field) for field in variables.values()]
+    if normalize == 'field':
+        blocks = [block / np.sqrt((block ** 2).sum() / (block.shape[0] - 1)) for block in blocks]
+    U, s, VT = np.linalg.svd(np.concatenate(blocks, axis=1), full_matrices=False)
+
+    # A small block size makes the fit run over many slabs of rows
+    model = CombinedEOF(n_modes=4, normalize=normalize, block_size=5000).fit(variables)
+    np.testing.assert_allclose(model.singular_values().values, s[:4], rtol=1e-6)
+    scores = model.scores(normalized=True).transpose('mode', 'time').values
+    np.testing.assert_allclose(np.abs((scores * U[:, :4].T).sum(axis=1)), 1, atol=1e-6)
+
+    patterns = model.components()
+    n_sst = blocks[0].shape[1]
+    sst_pattern = patterns['sst'].values.reshape(4, -1)
+    sst_pattern = sst_pattern[:, np.isfinite(sst_pattern).all(axis=0)]
+    signs = np.sign((scores * U[:, :4].T).sum(axis=1))[:, np.newaxis]
+    np.testing.assert_allclose(sst_pattern * signs, VT[:4, :n_sst], atol=1e-6)
+
+
+def test_combined_eofs_wrapper_equals_model(sst):
+    anomaly = calculate_anomaly(sst)
+    variables = {'a': anomaly, 'b': anomaly.isel(lat=slice(10, 30))}
+    model = combined_eofs(variables, n_modes=3, block_size=3000)
+    assert model.block_size == 3000
+    reference = CombinedEOF(n_modes=3).fit(variables)
+    np.testing.assert_allclose(model.singular_values().values, reference.singular_values().values, rtol=1e-10)
@@ -0,0 +1,34 @@
+# test_eof_model.py
+
+import numpy as np
+import xarray as xr
+
+from xIndices.eof_model import load_eof_model
+from xIndices.indices import compute_pdo
+
+
+def test_eof_model_index_reproduces_index(sst):
+    pdo_index, model = compute_pdo(data=sst, desired=['pdo_index', 'eof_model'], solver='full')
+    np.testing.assert_allclose(model.index(sst).values, pdo_index.values, atol=1e-5)
+
+
+def test_eof_model_save_load_round_trip(sst, tmp_path):
+    model = compute_pdo(data=sst, desired=['eof_model'], solver='full')
+    model.save(tmp_path / 'pdo_model.nc')
+    loaded = load_eof_model(tmp_path / 'pdo_model.nc')
+
+    xr.testing.assert_allclose(loaded.to_dataset(), model.to_dataset())
+    # None entries are not written to the netCDF attributes
+    assert loaded.metadata == {key: value for key, value in model.metadata.items() if value is not None}
+    xr.testing.assert_allclose(loaded.index(sst), model.index(sst))
+
+
+def test_eof_model_update_appends_projected_scores(sst):
+    model = compute_pdo(data=sst.isel(time=slice(0, 180)), desired=['eof_model'], solver='full')
+    new = model.anomaly(sst.isel(time=slice(180, None)))
+    updated, drift = model.update(new)
+
+    assert updated.scores_.sizes['time'] == 240
+    xr.testing.assert_allclose(updated.scores_.isel(time=slice(180, None)), model.project(new))
+    xr.testing.assert_identical(updated.patterns, model.patterns)
+    assert 0 <= float(drift['residual_variance_fraction']) <= 1
@@ -0,0 +1,41 @@
+# test_eof_solvers.py
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from benchmarks.synthetic import climate_field
+from xIndices.eof_model import EOFModel
+from xIndices.utils import EOF_SOLVERS, calculate_anomaly, check_eof_solver, compute_rotated_eofs
+
+
+@pytest.fixture
+def anomaly():
+    # xeofs refuses points with partial gaps, so the field without the gap of 'sst'
+    return calculate_anomaly(climate_field(resolution=4.0, n_time=240))
+
+
+@pytest.mark.parametrize('solver', EOF_SOLVERS)
+def test_solver_matches_full(anomaly, solver):
+    check = check_eof_solver(anomaly, solver=solver, n_modes=3, random_state=0,
+                             solver_kwargs={'n_iter': 10} if solver == 'randomized' else None)
+    # The leading modes are well separated; trailing ones are left to the randomized tolerance
+    leading = check.sel(mode=[1, 2])
+    np.testing.assert_allclose(leading['pattern_correlation'].values, 1, atol=1e-4)
+    np.testing.assert_allclose(leading['singular_value_error'].values, 0, atol=1e-4)
+
+
+@pytest.mark.parametrize('solver', EOF_SOLVERS)
+@pytest.mark.parametrize('rotated', ['Varimax', 'Promax'])
+def test_rotated_model_projection_reproduces_scores(anomaly, solver, rotated):
+    solver_model = compute_rotated_eofs(anomaly, rotated=rotated, n_modes=4, solver=solver, random_state=0,
+                                        cache=False)
+    model = EOFModel.from_solver(solver_model)
+    xr.testing.assert_allclose(model.project(anomaly).transpose('mode', 'time'),
+                               solver_model.scores(normalized=False).transpose('mode', 'time'), rtol=1e-4,
+                               atol=1e-3)
+
+
+def test_invalid_solver_raises(anomaly):
+    with pytest.raises(ValueError):
+        compute_rotated_eofs(anomaly, solver='svd')
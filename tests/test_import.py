@@ -0,0 +1,11 @@
+# test_import.py
+
+from benchmarks.bench_import import IMPORT_BUDGET, import_report
+
+
+def test_import_loads_no_heavy_dependency(monkeypatch, pytestconfig):
+    # A fresh interpreter in the repository root imports the working tree
+    monkeypatch.chdir(pytestconfig.rootpath)
+    report = import_report()
+    assert report['heavy'] == []
+    assert report['seconds'] < IMPORT_BUDGET
@@ -0,0 +1,33 @@
+# test_session.py
+
+import xarray as xr
+
+from xIndices.session import IndexSession, _select_region
+from xIndices.utils import calculate_anomaly
+
+
+REGION = (20, 70, 110, 260)
+
+
+def test_shared_anomaly_is_computed_on_first_use(sst):
+    session = IndexSession(data=sst, share_anomaly=True)
+    assert session.nbytes == 0
+    regional = session.anomaly(region=REGION)
+
+    full = session._get(('anomaly', '0_360', None, None, 'month', None))
+    assert full is not None
+    expected = calculate_anomaly(_select_region(session.standardized('0_360'), REGION))
+    xr.testing.assert_allclose(regional, expected)
+
+
+def test_regions_are_computed_alone_by_default(sst):
+    session = IndexSession(data=sst)
+    session.anomaly(region=REGION)
+    assert session._get(('anomaly', '0_360', None, None, 'month', None)) is None
+
+
+def test_packed_anomaly_matches_full_grid(sst):
+    session = IndexSession(data=sst)
+    compact = session.compact(clim_start=1955, clim_end=1960)
+    expected = calculate_anomaly(session.standardized('0_360'), clim_start=1955, clim_end=1960)
+    xr.testing.assert_allclose(compact.to_dataarray().transpose(*expected.dims), expected)
@@ -0,0 +1,24 @@
+# test_significance.py
+
+import numpy as np
+
+from xIndices.indices import compute_pdo
+from xIndices.significance import explained_variance_significance
+from xIndices.utils import calculate_anomaly
+
+
+def test_significance_kwargs_reach_both_tests(sst):
+    kwargs = {'n_surrogates': 50, 'method': 'phase', 'seed': 0}
+    significance, variance_ci = compute_pdo(data=sst, desired=['pdo_pattern_significance', 'variance_fraction_pdo_ci'],
+                                            solver='full', significance_kwargs=kwargs)
+    assert significance.attrs['method'] == 'phase'
+    assert variance_ci.attrs['method'] == 'block'
+    assert float(variance_ci['ci_lower']) <= float(variance_ci['ci_upper'])
+
+
+def test_explained_variance_standardize_ignores_constant_points(sst):
+    anomaly = calculate_anomaly(sst)
+    anomaly[:, 0, :] = 0
+    result = explained_variance_significance(anomaly, n_modes=3, n_surrogates=50, standardize=True)
+    assert np.isfinite(result['explained_variance_ratio']).all()
+    assert np.isfinite(result['ci_lower']).all()
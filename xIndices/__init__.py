@@ -4,7 +4,22 @@
 __version__ = "1.3.7"
 
 from .utils import calculate_anomaly, compute_weights, line_plot, compute_rotated_eofs, contour_plot, lanczos_filter_xarray,\
-		standardize_data, project_data_onto_eofs, stack_vars
-from .indices import global_sst_trend_and_enso, compute_pdo, compute_amo, compute_regional_eof_modes, compute_nao
+		lanczos_filter_bank, check_eof_solver, standardize_data, project_data_onto_eofs, stack_vars, clear_eof_cache
+from .indices import global_sst_trend_and_enso, compute_pdo, compute_amo, compute_regional_eof_modes, compute_nao, \
+		compute_indices
 from .preprocess_data import load_data, write_netcdf, regridding, adjust_longitude, \
-		rename_dims_to_standard, adjust_latitude
+		rename_dims_to_standard, adjust_latitude, get_regridder, clear_regrid_cache, write_zarr, output_encoding
+from .session import IndexSession
+from .eof_model import EOFModel, load_eof_model
+from .results import IndexResult
+from .compaction import CompactField, valid_mask
+from .ensemble import run_ensemble, ensemble_members
+from .significance import regression_significance, explained_variance_significance, surrogates
+from .climatology import ClimatologyAccumulator, load_climatology_accumulator, accumulate_climatology, \
+		calculate_anomaly_from, HarmonicClimatology, load_harmonic_climatology
+from .regression import regression_maps
+from .streaming import index_stream, watch_files, read_fields, standardize_fields, anomaly_fields, project_fields
+from .instrumentation import profile_stages, enable_instrumentation, disable_instrumentation, MemorySink, \
+		JSONLinesSink, LoggingSink
+from .rendering import render_maps, render_lines
+from .combined_eof import CombinedEOF, combined_eofs
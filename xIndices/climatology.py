@@ -0,0 +1,669 @@
+# climatology.py
+
+import numpy as np
+import xarray as xr
+
+
+CLIMATOLOGY_FORMAT = 1
+
+# Number of calendar groups per frequency, as numbered by the datetime accessor (1-based)
+_N_GROUPS = {'month': 12, 'dayofyear': 366}
+
+
+class ClimatologyAccumulator:
+    """
+    Single-pass climatology of records that do not fit in memory.
+
+    Time chunks (or files) are added one at a time with 'update'. For every calendar month (or
+    day of year) and grid point the accumulator keeps the count, the running mean and the sum
+    of squared deviations (Welford), merging each chunk with Chan's parallel formula. The
+    state is small (12 or 366 grid fields) and can be merged across workers with 'merge' and
+    written to netCDF with 'save'.
+
+    The finished climatology and standard deviation equal
+    data.sel(time=base period).groupby('time.month').mean() and .std() of the full record.
+
+    Parameters:
+    ----------
+    freq : str, optional
+        'month' or 'dayofyear'. Default is 'month'.
+    clim_start : int, optional
+        First year of the base period. If None (with clim_end), every time step is used.
+    clim_end : int, optional
+        Last year of the base period.
+    time_dim : str, optional
+        Time dimension. Default is 'time'.
+
+    Examples:
+    --------
+    >>> acc = ClimatologyAccumulator(clim_start=1981, clim_end=2010)
+    >>> for path in sorted(glob.glob('sst_*.nc')):
+    ...     acc.update(load_data(path, var='sst'))
+    >>> climatology = acc.climatology()
+    >>> anomaly = acc.anomaly(load_data('sst_2024.nc', var='sst'))
+    """
+
+    def __init__(self, freq='month', clim_start=None, clim_end=None, time_dim='time'):
+        if freq not in _N_GROUPS:
+            raise ValueError('Frequency must be "month" or "dayofyear".')
+        self.freq = freq
+        self.clim_start = clim_start
+        self.clim_end = clim_end
+        self.time_dim = time_dim
+        self.template = None
+        self.seen = np.zeros(_N_GROUPS[freq], dtype=bool)
+        self.count = None
+        self.mean = None
+        self.m2 = None
+
+
+    def _init_state(self, template):
+        self.template = template
+        shape = (_N_GROUPS[self.freq],) + template.shape
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+
+
+    def _base_period(self, data):
+        if self.clim_start is None:
+            return data
+        return data.sel({self.time_dim: slice(f'{self.clim_start}-01-01', f'{self.clim_end}-12-31')})
+
+
+    def update(self, data):
+        """
+        Add a time chunk to the accumulator.
+
+        Steps outside the base period are ignored. Dask-backed data are read one time chunk at
+        a time, so a whole lazily opened archive can be passed at once.
+
+        Parameters:
+        ----------
+        data : xarray.DataArray
+            Field with the time dimension and any spatial dimensions, on the same grid for
+            every call.
+
+        Returns:
+        -------
+        ClimatologyAccumulator
+            self, to allow chaining.
+        """
+        data = self._base_period(data).transpose(self.time_dim, ...)
+        if data.sizes[self.time_dim] == 0:
+            return self
+        if data.chunks is not None:
+            start = 0
+            for size in data.chunks[0]:
+                self._update_block(data.isel({self.time_dim: slice(start, start + size)}).compute())
+                start += size
+        else:
+            self._update_block(data)
+        return self
+
+
+    def _update_block(self, data):
+        template = data.isel({self.time_dim: 0}, drop=True)
+        if self.template is None:
+            self._init_state(template.drop_vars([name for name in template.coords if name not in template.dims]))
+        elif template.shape != self.template.shape:
+            raise ValueError("All chunks must be on the grid of the first one.")
+
+        groups = getattr(data[self.time_dim].dt, self.freq).values - 1
+        values = np.asarray(data.values, dtype=np.float64)
+        for group in np.unique(groups):
+            block = values[groups == group]
+            finite = np.isfinite(block)
+            count = finite.sum(axis=0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = np.where(finite, block, 0).sum(axis=0) / count
+                m2 = np.where(finite, block - mean, 0) ** 2
+            self._merge_group(group, count, np.nan_to_num(mean), m2.sum(axis=0))
+            self.seen[group] = True
+
+
+    def _merge_group(self, group, count, mean, m2):
+        """Chan et al. merge of (count, mean, m2) into the state of one calendar group."""
+        total = self.count[group] + count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = mean - self.mean[group]
+            weight = np.where(total > 0, count / total, 0)
+            self.mean[group] += delta * weight
+            self.m2[group] += m2 + delta ** 2 * self.count[group] * weight
+        self.count[group] = total
+
+
+    def merge(self, other):
+        """
+        Combine with the accumulator of another worker (same freq, base period and grid).
+
+        Returns:
+        -------
+        ClimatologyAccumulator
+            A new accumulator holding both.
+        """
+        if (other.freq, other.clim_start, other.clim_end) != (self.freq, self.clim_start, self.clim_end):
+            raise ValueError("Only accumulators with the same freq and base period can be merged.")
+        merged = ClimatologyAccumulator(self.freq, self.clim_start, self.clim_end, self.time_dim)
+        for source in (self, other):
+            if source.template is None:
+                continue
+            if merged.template is None:
+                merged._init_state(source.template)
+            for group in np.flatnonzero(source.seen):
+                merged._merge_group(group, source.count[group], source.mean[group], source.m2[group])
+            merged.seen |= source.seen
+        return merged
+
+
+    def __add__(self, other):
+        return self.merge(other)
+
+
+    def _grouped(self, values, name):
+        groups = np.flatnonzero(self.seen)
+        return xr.DataArray(values[groups], dims=(self.freq,) + self.template.dims,
+                            coords={self.freq: groups + 1, **self.template.coords}, name=name)
+
+
+    def climatology(self):
+        """
+        Mean of every calendar group, as from groupby(f'time.{freq}').mean().
+
+        Returns:
+        -------
+        xarray.DataArray
+            Climatology (month or dayofyear, ...), NaN where a point has no valid value.
+        """
+        if self.template is None:
+            raise ValueError("The accumulator is empty.")
+        return self._grouped(np.where(self.count > 0, self.mean, np.nan), 'climatology')
+
+
+    def std(self, ddof=0):
+        """
+        Standard deviation of every calendar group, as from groupby(f'time.{freq}').std(ddof=ddof).
+        """
+        if self.template is None:
+            raise ValueError("The accumulator is empty.")
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = np.where(self.count > ddof, self.m2 / (self.count - ddof), np.nan)
+        return self._grouped(np.sqrt(variance), 'std')
+
+
+    def anomaly(self, data):
+        """
+        Subtract the finished climatology from 'data' (lazily, chunk by chunk for dask-backed data).
+        """
+        return calculate_anomaly_from(data, self.climatology(), freq=self.freq, time_dim=self.time_dim)
+
+
+    def to_dataset(self):
+        """Return the accumulator state as an xarray.Dataset (see save)."""
+        if self.template is None:
+            raise ValueError("The accumulator is empty.")
+        groups = np.arange(1, self.seen.size + 1)
+        dims = ('group',) + self.template.dims
+        coords = {'group': groups, **self.template.coords}
+        ds = xr.Dataset({
+            'count': xr.DataArray(self.count, dims=dims, coords=coords),
+            'mean': xr.DataArray(self.mean, dims=dims, coords=coords),
+            'm2': xr.DataArray(self.m2, dims=dims, coords=coords),
+            'seen': xr.DataArray(self.seen.astype(np.int8), dims=('group',), coords={'group': groups}),
+        })
+        ds.attrs = {'format_version': CLIMATOLOGY_FORMAT, 'freq': self.freq, 'time_dim': self.time_dim}
+        if self.clim_start is not None:
+            ds.attrs.update(clim_start=int(self.clim_start), clim_end=int(self.clim_end))
+        return ds
+
+
+    @classmethod
+    def from_dataset(cls, ds):
+        """Rebuild an accumulator from the output of to_dataset."""
+        clim_start = ds.attrs.get('clim_start')
+        clim_end = ds.attrs.get('clim_end')
+        accumulator = cls(ds.attrs['freq'], None if clim_start is None else int(clim_start),
+                          None if clim_end is None else int(clim_end), ds.attrs.get('time_dim', 'time'))
+        template = ds['mean'].isel(group=0, drop=True)
+        accumulator._init_state(template.copy(data=np.zeros(template.shape)))
+        accumulator.count[:] = ds['count'].values
+        accumulator.mean[:] = ds['mean'].values
+        accumulator.m2[:] = ds['m2'].values
+        accumulator.seen[:] = ds['seen'].values.astype(bool)
+        return accumulator
+
+
+    def save(self, path, complevel=4):
+        """
+        Write the accumulator state to a compressed netCDF file, e.g. to resume or merge later.
+
+        Parameters:
+        ----------
+        path : str
+            Output file.
+        complevel : int, optional
+            zlib compression level. Default is 4.
+        """
+        ds = self.to_dataset()
+        ds.to_netcdf(path, encoding={name: {'zlib': True, 'complevel': complevel} for name in ds.data_vars})
+
+
+def _year_phase(time):
+    """
+    Angle (radians) of every time step within its calendar year, 0 on January 1 at 00:00.
+
+    Each year is mapped onto one full cycle, so 29 February simply falls between 28 February and
+    1 March and December 31 of a leap year is as close to January 1 as that of other years.
+    """
+    days_in_year = getattr(time.dt, 'days_in_year', None)
+    if days_in_year is None:
+        days_in_year = 365 + time.dt.is_leap_year.astype(int)
+    day = time.dt.dayofyear - 1 + time.dt.hour / 24 + time.dt.minute / 1440
+    return 2 * np.pi * np.asarray(day, dtype=np.float64) / np.asarray(days_in_year, dtype=np.float64)
+
+
+def _harmonic_basis(phase, n_harmonics):
+    """Design matrix (time, 1 + 2 * n_harmonics): 1, cos(k phase), sin(k phase) for k = 1..n_harmonics."""
+    columns = [np.ones_like(phase)]
+    for k in range(1, n_harmonics + 1):
+        columns += [np.cos(k * phase), np.sin(k * phase)]
+    return np.stack(columns, axis=1)
+
+
+def _coefficient_names(n_harmonics):
+    return ['mean'] + [f'{kind}{k}' for k in range(1, n_harmonics + 1) for kind in ('cos', 'sin')]
+
+
+class HarmonicClimatology:
+    """
+    Smooth daily climatology made of the annual mean and the first few annual harmonics.
+
+    The climatology of every grid point is fitted by least squares to
+
+        c(t) = a0 + sum_k [a_k cos(k phase(t)) + b_k sin(k phase(t))],   k = 1..n_harmonics,
+
+    where phase(t) runs once around the circle per calendar year, so leap days need no special
+    treatment. The fit is a handful of matrix products over the time axis for all points at once:
+    time chunks (or files) are added with 'update', which accumulates the normal equations, and
+    the finished climatology is 1 + 2 * n_harmonics coefficient maps instead of 366 daily fields.
+
+    Missing values are left out point by point. Products of harmonics are harmonics of the sum
+    and difference frequencies, so the normal equations of a gappy point only need the sums of
+    cos(m phase) and sin(m phase) over its valid days (m = 0..2 * n_harmonics).
+
+    Parameters:
+    ----------
+    n_harmonics : int, optional
+        Number of annual harmonics. Default is 3 (periods of one year, six and four months).
+    clim_start : int, optional
+        First year of the base period. If None (with clim_end), every time step is used.
+    clim_end : int, optional
+        Last year of the base period.
+    time_dim : str, optional
+        Time dimension. Default is 'time'.
+
+    Examples:
+    --------
+    >>> clim = HarmonicClimatology(n_harmonics=3, clim_start=1991, clim_end=2020).update(daily_sst)
+    >>> anomaly = clim.anomaly(daily_sst)            # lazy for dask-backed input
+    >>> clim.save('sst_daily_climatology.nc')         # 7 coefficient maps
+    """
+
+    def __init__(self, n_harmonics=3, clim_start=None, clim_end=None, time_dim='time'):
+        if n_harmonics < 0:
+            raise ValueError("n_harmonics must be 0 or more.")
+        self.n_harmonics = int(n_harmonics)
+        self.clim_start = clim_start
+        self.clim_end = clim_end
+        self.time_dim = time_dim
+        self.template = None
+        self.xty = None
+        self.moments = None
+        self.total_moments = None
+        self._coefficients = None
+
+
+    @property
+    def n_coefficients(self):
+        return 1 + 2 * self.n_harmonics
+
+
+    def _base_period(self, data):
+        if self.clim_start is None:
+            return data
+        return data.sel({self.time_dim: slice(f'{self.clim_start}-01-01', f'{self.clim_end}-12-31')})
+
+
+    def update(self, data):
+        """
+        Add a time chunk to the fit. Steps outside the base period are ignored, and dask-backed
+        data are read one time chunk at a time.
+
+        Parameters:
+        ----------
+        data : xarray.DataArray
+            Daily (or sub-daily) field with the time dimension, on the same grid for every call.
+
+        Returns:
+        -------
+        HarmonicClimatology
+            self, to allow chaining.
+        """
+        if self.template is not None and self.xty is None:
+            raise ValueError("A climatology loaded from its coefficients cannot be updated.")
+        data = self._base_period(data).transpose(self.time_dim, ...)
+        if data.sizes[self.time_dim] == 0:
+            return self
+        if data.chunks is not None:
+            start = 0
+            for size in data.chunks[0]:
+                self._update_block(data.isel({self.time_dim: slice(start, start + size)}).compute())
+                start += size
+        else:
+            # Bound the float64 working copies to about 128 MiB
+            step = max(1, 2 ** 24 // max(1, data[{self.time_dim: 0}].size))
+            for start in range(0, data.sizes[self.time_dim], step):
+                self._update_block(data.isel({self.time_dim: slice(start, start + step)}))
+        return self
+
+
+    def _update_block(self, data):
+        template = data.isel({self.time_dim: 0}, drop=True)
+        if self.template is None:
+            self.template = template.drop_vars([name for name in template.coords if name not in template.dims])
+            self.xty = np.zeros((self.n_coefficients, template.size))
+            self.moments = np.zeros((2 * self.n_coefficients - 1, template.size))
+            self.total_moments = np.zeros(2 * self.n_coefficients - 1)
+        elif template.shape != self.template.shape:
+            raise ValueError("All chunks must be on the grid of the first one.")
+
+        phase = _year_phase(data[self.time_dim])
+        values = np.asarray(data.values).reshape(phase.size, -1)
+        valid = np.isfinite(values)
+        # Sums of 1, cos(m phase), sin(m phase) over the valid steps of every point, m = 1..2n.
+        # They are shared by the points without gaps in this block and zero for fully missing
+        # ones (e.g. land), so the products only run over the other columns.
+        moments = _harmonic_basis(phase, 2 * self.n_harmonics)
+        total = moments.sum(axis=0)
+        full = valid.all(axis=0)
+        gappy = np.flatnonzero(valid.any(axis=0) & ~full)
+        full = np.flatnonzero(full)
+        self.total_moments += total
+        self.moments[:, full] += total[:, np.newaxis]
+        self.xty[:, full] += moments[:, :self.n_coefficients].T @ values[:, full].astype(np.float64)
+        if gappy.size:
+            mask = valid[:, gappy]
+            self.moments[:, gappy] += moments.T @ mask.astype(np.float64)
+            self.xty[:, gappy] += moments[:, :self.n_coefficients].T @ np.where(mask, values[:, gappy], 0).astype(np.float64)
+        self._coefficients = None
+
+
+    def merge(self, other):
+        """
+        Combine with the fit of another worker (same harmonics, base period and grid).
+
+        Returns:
+        -------
+        HarmonicClimatology
+            A new climatology holding both.
+        """
+        if (other.n_harmonics, other.clim_start, other.clim_end) != (self.n_harmonics, self.clim_start, self.clim_end):
+            raise ValueError("Only climatologies with the same harmonics and base period can be merged.")
+        if (self.template is not None and self.xty is None) or (other.template is not None and other.xty is None):
+            raise ValueError("A climatology loaded from its coefficients cannot be merged.")
+        merged = HarmonicClimatology(self.n_harmonics, self.clim_start, self.clim_end, self.time_dim)
+        for source in (self, other):
+            if source.template is None:
+                continue
+            if merged.template is None:
+                merged.template = source.template
+                merged.xty = source.xty.copy()
+                merged.moments = source.moments.copy()
+                merged.total_moments = source.total_moments.copy()
+            else:
+                merged.xty += source.xty
+                merged.moments += source.moments
+                merged.total_moments += source.total_moments
+        return merged
+
+
+    def __add__(self, other):
+        return self.merge(other)
+
+
+    def _gram(self, moments):
+        """
+        Normal matrices (point, coefficient, coefficient) from the moment sums of each point, using
+        cos a cos b = (cos(a-b) + cos(a+b)) / 2, sin a sin b = (cos(a-b) - cos(a+b)) / 2 and
+        cos a sin b = (sin(a+b) - sin(a-b)) / 2.
+        """
+        n = self.n_harmonics
+
+        def cos_sum(m):
+            return moments[0] if m == 0 else moments[2 * abs(m) - 1]
+
+        def sin_sum(m):
+            return 0 if m == 0 else np.sign(m) * moments[2 * abs(m)]
+
+        # Basis function i is (kind, frequency): ('c', 0), ('c', 1), ('s', 1), ...
+        basis = [('c', 0)] + [(kind, k) for k in range(1, n + 1) for kind in ('c', 's')]
+        gram = np.empty((moments.shape[1], len(basis), len(basis)))
+        for i, (kind_i, a) in enumerate(basis):
+            for j, (kind_j, b) in enumerate(basis):
+                if kind_i == 'c' and kind_j == 'c':
+                    entry = (cos_sum(a - b) + cos_sum(a + b)) / 2
+                elif kind_i == 's' and kind_j == 's':
+                    entry = (cos_sum(a - b) - cos_sum(a + b)) / 2
+                elif kind_i == 'c':
+                    entry = (sin_sum(a + b) - sin_sum(a - b)) / 2
+                else:
+                    entry = (sin_sum(a + b) - sin_sum(b - a)) / 2
+                gram[:, i, j] = entry
+        return gram
+
+
+    def coefficients(self):
+        """
+        Fitted coefficient maps.
+
+        Returns:
+        -------
+        xarray.DataArray
+            (coefficient, ...) with coefficients 'mean', 'cos1', 'sin1', ..., NaN at points with
+            fewer valid steps than coefficients.
+        """
+        if self.template is None:
+            raise ValueError("The climatology is empty.")
+        if self._coefficients is None:
+            count = self.moments[0]
+            solution = np.full(self.xty.shape, np.nan)
+            # Gap-free points share one normal matrix
+            complete = count == self.total_moments[0]
+            gram = self._gram(self.total_moments[:, np.newaxis])[0]
+            if complete.any() and np.linalg.cond(gram) < 1e10:
+                solution[:, complete] = np.linalg.solve(gram, self.xty[:, complete])
+            gappy = np.flatnonzero(~complete & (count >= self.n_coefficients))
+            for block in np.array_split(gappy, max(1, gappy.size // 65536)):
+                if block.size == 0:
+                    continue
+                grams = self._gram(self.moments[:, block])
+                # Singular systems (e.g. all valid days in one season) stay NaN
+                well_posed = np.linalg.cond(grams) < 1e10
+                solved = np.linalg.solve(grams[well_posed], self.xty[:, block[well_posed]].T[..., np.newaxis])
+                solution[:, block[well_posed]] = solved[..., 0].T
+            self._coefficients = xr.DataArray(
+                solution.reshape((self.n_coefficients,) + self.template.shape),
+                dims=('coefficient',) + self.template.dims,
+                coords={'coefficient': _coefficient_names(self.n_harmonics), **self.template.coords},
+                name='coefficients')
+        return self._coefficients
+
+
+    def evaluate(self, time, dtype=None):
+        """
+        Climatology at the given times.
+
+        Parameters:
+        ----------
+        time : xarray.DataArray
+            Time coordinate. If it is dask-backed or comes with 'chunks' from a dask-backed field
+            the result stays lazy.
+        dtype : numpy.dtype, optional
+            dtype of the result. Default is float64.
+
+        Returns:
+        -------
+        xarray.DataArray
+            Climatology (time, ...).
+        """
+        basis = xr.DataArray(_harmonic_basis(_year_phase(time), self.n_harmonics), dims=(time.dims[0], 'coefficient'),
+                             coords={time.dims[0]: time.values, 'coefficient': _coefficient_names(self.n_harmonics)})
+        coefficients = self.coefficients()
+        if dtype is not None:
+            basis, coefficients = basis.astype(dtype), coefficients.astype(dtype)
+        return xr.dot(basis, coefficients, dim='coefficient').rename('climatology')
+
+
+    def climatology(self):
+        """
+        Climatology on the 366 days of a leap year, indexed by 'dayofyear' like
+        groupby('time.dayofyear').mean(), e.g. for calculate_anomaly_from.
+        """
+        time = xr.DataArray(np.arange('2000-01-01', '2001-01-01', dtype='datetime64[D]').astype('datetime64[ns]'),
+                            dims='time')
+        climatology = self.evaluate(time).assign_coords(dayofyear=('time', np.arange(1, 367)))
+        return climatology.swap_dims(time='dayofyear').drop_vars('time')
+
+
+    def anomaly(self, data):
+        """
+        Subtract the climatology from 'data' at its own times. Dask-backed data stay lazy and are
+        processed chunk by chunk.
+        """
+        dtype = data.dtype if np.issubdtype(data.dtype, np.floating) else np.float64
+        climatology = self.evaluate(data[self.time_dim], dtype=dtype)
+        if data.chunks is not None:
+            axis = data.get_axis_num(self.time_dim)
+            climatology = climatology.chunk({self.time_dim: data.chunks[axis]})
+        return data - climatology
+
+
+    def to_dataset(self):
+        """Return the coefficient maps as an xarray.Dataset (see save)."""
+        ds = self.coefficients().to_dataset()
+        ds.attrs = {'format_version': CLIMATOLOGY_FORMAT, 'n_harmonics': self.n_harmonics, 'time_dim': self.time_dim}
+        if self.clim_start is not None:
+            ds.attrs.update(clim_start=int(self.clim_start), clim_end=int(self.clim_end))
+        return ds
+
+
+    @classmethod
+    def from_dataset(cls, ds):
+        """Rebuild a climatology from the output of to_dataset. It can be evaluated but not updated."""
+        clim_start = ds.attrs.get('clim_start')
+        clim_end = ds.attrs.get('clim_end')
+        climatology = cls(int(ds.attrs['n_harmonics']), None if clim_start is None else int(clim_start),
+                          None if clim_end is None else int(clim_end), ds.attrs.get('time_dim', 'time'))
+        coefficients = ds['coefficients']
+        climatology.template = coefficients.isel(coefficient=0, drop=True)
+        climatology._coefficients = coefficients
+        return climatology
+
+
+    def save(self, path, complevel=4):
+        """
+        Write the coefficient maps to a compressed netCDF file.
+
+        Parameters:
+        ----------
+        path : str
+            Output file.
+        complevel : int, optional
+            zlib compression level. Default is 4.
+        """
+        self.to_dataset().to_netcdf(path, encoding={'coefficients': {'zlib': True, 'complevel': complevel}})
+
+
+def load_harmonic_climatology(path):
+    """
+    Load a HarmonicClimatology written by HarmonicClimatology.save.
+
+    Parameters:
+    ----------
+    path : str
+        File written by HarmonicClimatology.save.
+
+    Returns:
+    -------
+    HarmonicClimatology
+    """
+    with xr.open_dataset(path) as ds:
+        ds = ds.load()
+    if ds.attrs.get('format_version', 0) > CLIMATOLOGY_FORMAT:
+        raise ValueError(f"{path} was written by a newer version of xIndices.")
+    return HarmonicClimatology.from_dataset(ds)
+
+
+def load_climatology_accumulator(path):
+    """
+    Load a ClimatologyAccumulator written by ClimatologyAccumulator.save.
+
+    Parameters:
+    ----------
+    path : str
+        File written by ClimatologyAccumulator.save.
+
+    Returns:
+    -------
+    ClimatologyAccumulator
+    """
+    with xr.open_dataset(path) as ds:
+        ds = ds.load()
+    if ds.attrs.get('format_version', 0) > CLIMATOLOGY_FORMAT:
+        raise ValueError(f"{path} was written by a newer version of xIndices.")
+    return ClimatologyAccumulator.from_dataset(ds)
+
+
+def calculate_anomaly_from(data, climatology, freq='month', time_dim='time'):
+    """
+    Anomalies of 'data' with respect to a finished climatology.
+
+    Parameters:
+    data (xarray.DataArray): Field with the time dimension; dask-backed data stay lazy and are
+                             processed chunk by chunk.
+    climatology (xarray.DataArray): Climatology with a 'month' or 'dayofyear' dimension, e.g. from
+                                    ClimatologyAccumulator.climatology.
+    freq (str, optional): 'month' or 'dayofyear'. Default is 'month'.
+    time_dim (str, optional): Time dimension. Default is 'time'.
+
+    Returns:
+    xarray.DataArray: The anomalies.
+    """
+    return data.groupby(f'{time_dim}.{freq}') - climatology
+
+
+def accumulate_climatology(paths, var=None, freq='month', clim_start=None, clim_end=None, chunks=None):
+    """
+    Climatology accumulator over a list of files, reading one file (or one time chunk) at a time.
+
+    Parameters:
+    paths (list of str or str): Files in any order, or a glob pattern.
+    var (str, optional): Variable to read.
+    freq (str, optional): 'month' or 'dayofyear'. Default is 'month'.
+    clim_start (int, optional): First year of the base period.
+    clim_end (int, optional): Last year of the base period.
+    chunks (dict, optional): Dask chunks for reading each file, e.g. {'time': 120}, to bound the
+                             memory within a file.
+
+    Returns:
+    ClimatologyAccumulator: The filled accumulator.
+    """
+    import glob
+    from .preprocess_data import load_data
+
+    if isinstance(paths, str):
+        paths = sorted(glob.glob(paths))
+    accumulator = ClimatologyAccumulator(freq=freq, clim_start=clim_start, clim_end=clim_end)
+    for path in paths:
+        accumulator.update(load_data(path, var=var, chunks=chunks))
+    return accumulator
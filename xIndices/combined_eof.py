@@ -0,0 +1,342 @@
+# combined_eof.py
+
+import numpy as np
+import xarray as xr
+
+from .instrumentation import instrumented, stage
+
+
+NORMALIZATIONS = (None, 'field', 'point')
+
+
+def _named_variables(variables, drop_dims=()):
+    """(name, DataArray) pairs of a list, tuple, dict or Dataset of variables."""
+    if isinstance(variables, xr.Dataset):
+        pairs = [(name, variables[name]) for name in variables.data_vars]
+    elif isinstance(variables, dict):
+        pairs = list(variables.items())
+    else:
+        pairs = [(var.name if var.name is not None else f'var{i}', var) for i, var in enumerate(variables)]
+    if len(drop_dims) > 0:
+        pairs = [(name, var.drop_vars(drop_dims, errors='ignore')) for name, var in pairs]
+    return pairs
+
+
+def _block_slices(data, time_dim, block_size):
+    """
+    Slices of the first spatial dimension holding about 'block_size' values each, so a block
+    (time, points) of a variable is read, centred and weighted without copying the variable.
+    """
+    space_dim = [dim for dim in data.dims if dim != time_dim][0]
+    n_rows = data.sizes[space_dim]
+    row_size = max(1, data.size // max(1, n_rows))
+    step = max(1, block_size // row_size)
+    return space_dim, [slice(start, start + step) for start in range(0, n_rows, step)]
+
+
+class CombinedEOF:
+    """
+    Combined (multivariate) EOFs of several fields sharing the time axis, without concatenating them.
+
+    The fields are the column blocks of one virtual (time, point) matrix. Each block is centred,
+    optionally normalized and weighted by the square root of the cosine of latitude one slab of
+    rows at a time, and only its Gram matrix X X^T (time x time) is kept. The decomposition is the
+    eigendecomposition of the weighted sum of these Gram matrices, and the patterns of every
+    variable come back from a second pass over its blocks, X^T U / s. Peak memory is the input
+    fields plus one block and two time x time matrices, instead of the concatenated (and
+    standardized) copies built by stack_vars and standardize_data. This suits gridded fields with
+    fewer time steps than grid points (monthly records up to a few thousand steps).
+
+    Points with a missing value at any time step (e.g. land) are left out, as xeofs does.
+
+    Parameters:
+    ----------
+    n_modes : int, optional
+        Number of modes. Default is 10.
+    normalize : str or None, optional
+        How the variables are made comparable. Default is 'field'.
+        - 'field': each variable is divided by the square root of its total (weighted) variance,
+          so every variable contributes the same variance whatever its units and grid size.
+        - 'point': each grid point is divided by its standard deviation (standardize_data).
+        - None: raw anomalies (all variables in the same units).
+    use_coslat : bool, optional
+        Weight points by the square root of the cosine of latitude. Default is True.
+    weights : dict or list of float, optional
+        Extra weight of each variable's variance, by name or in order. Default is 1 for all.
+    time_dim : str, optional
+        Time dimension shared by the variables. Default is 'time'.
+    lat_dim : str, optional
+        Latitude coordinate used for the cosine weights. Default is 'lat'.
+    block_size : int, optional
+        Number of values read per block. Default is 2**24 (128 MiB in float64).
+
+    Examples:
+    --------
+    >>> model = CombinedEOF(n_modes=5).fit({'sst': sst_anom, 'slp': slp_anom, 'z500': z500_anom})
+    >>> patterns = model.components()          # {'sst': (mode, lat, lon), 'slp': ..., 'z500': ...}
+    >>> model.scores().sel(mode=1)
+    >>> model.variable_variance_fraction()     # share of each variable's variance per mode
+    """
+
+    def __init__(self, n_modes=10, normalize='field', use_coslat=True, weights=None, time_dim='time',
+                 lat_dim='lat', block_size=2 ** 24):
+        if normalize not in NORMALIZATIONS:
+            raise ValueError(f"Invalid normalize '{normalize}'. Choose one of {NORMALIZATIONS}.")
+        self.n_modes = n_modes
+        self.normalize = normalize
+        self.use_coslat = use_coslat
+        self.weights = weights
+        self.time_dim = time_dim
+        self.lat_dim = lat_dim
+        self.block_size = block_size
+
+
+    def _variable_weight(self, name, i):
+        if self.weights is None:
+            return 1.0
+        if isinstance(self.weights, dict):
+            return float(self.weights.get(name, 1.0))
+        return float(self.weights[i])
+
+
+    def _blocks(self, data):
+        """
+        Yield (rows, valid, block, mean, scale) for every slab of rows of 'data' (time first):
+        the preprocessed (time, valid point) block in float64, centred, normalized per point and
+        coslat weighted, and the mean and scale of its valid points.
+        """
+        space_dim, slices = _block_slices(data, self.time_dim, self.block_size)
+        for rows in slices:
+            slab = data.isel({space_dim: rows})
+            values = np.asarray(slab.values, dtype=np.float64).reshape(slab.sizes[self.time_dim], -1)
+            valid = np.isfinite(values).all(axis=0)
+            block = values[:, valid]
+            mean = block.mean(axis=0)
+            block -= mean
+            scale = np.ones(block.shape[1])
+            if self.normalize == 'point':
+                std = block.std(axis=0, ddof=1)
+                scale = np.where(std > 0, 1 / np.where(std > 0, std, 1), 0)
+            if self.use_coslat and self.lat_dim in slab.coords:
+                coslat = np.cos(np.deg2rad(slab[self.lat_dim])).clip(0, None) ** 0.5
+                coslat = coslat.broadcast_like(slab.isel({self.time_dim: 0}, drop=True))
+                scale = scale * np.asarray(coslat.transpose(*slab.dims[1:]).values, dtype=np.float64).ravel()[valid]
+            block *= scale
+            yield rows, valid, block, mean, scale
+
+
+    def _unblock(self, rows_out, template, space_dim, name, extra_dims=(), extra_coords=None):
+        """Assemble per-slab (..., points) arrays back into a DataArray on the grid of 'template'."""
+        axis = len(extra_dims) + template.dims.index(space_dim)
+        return xr.DataArray(np.concatenate(rows_out, axis=axis), dims=tuple(extra_dims) + template.dims,
+                            coords={**(extra_coords or {}), **template.coords}, name=name)
+
+
+    @instrumented(name='combined_eof_fit')
+    def fit(self, variables, drop_dims=[]):
+        """
+        Fit the combined EOFs.
+
+        Parameters:
+        ----------
+        variables : list, dict or xarray.Dataset of xarray.DataArray
+            Anomaly fields (time, ...) on any grids, with identical time coordinates, as passed to
+            stack_vars. Dask-backed fields are read one block at a time.
+        drop_dims : list of str, optional
+            Coordinates dropped from each variable first, as in stack_vars.
+
+        Returns:
+        -------
+        CombinedEOF
+            self, fitted.
+        """
+        pairs = [(name, var.transpose(self.time_dim, ...)) for name, var in _named_variables(variables, drop_dims)]
+        if len(pairs) == 0:
+            raise ValueError("No variables to decompose.")
+        time = pairs[0][1][self.time_dim]
+        for name, var in pairs[1:]:
+            if not np.array_equal(var[self.time_dim].values, time.values):
+                raise ValueError(f"Variable '{name}' does not share the time coordinate of '{pairs[0][0]}'.")
+        n_time = time.size
+
+        # Pass 1: one Gram matrix per variable, added with the variable's normalization factor
+        gram = np.zeros((n_time, n_time))
+        self.factors, self._traces, self._preprocessing = {}, {}, {}
+        for i, (name, var) in enumerate(pairs):
+            with stage('gram', data=var, variable=name):
+                block_gram = np.zeros((n_time, n_time))
+                means, scales = [], []
+                for _, valid, block, mean, scale in self._blocks(var):
+                    block_gram += block @ block.T
+                    means.append(np.where(valid, 0.0, np.nan))
+                    means[-1][valid] = mean
+                    scales.append(np.zeros(valid.size))
+                    scales[-1][valid] = scale
+                self._preprocessing[name] = (means, scales)
+            total = np.trace(block_gram)
+            factor = self._variable_weight(name, i)
+            if self.normalize == 'field':
+                factor = factor * (n_time - 1) / total if total > 0 else 0.0
+            self.factors[name] = factor
+            self._traces[name] = factor * total
+            gram += factor * block_gram
+            del block_gram
+
+        n_modes = min(self.n_modes, n_time)
+        eigenvalues, U = np.linalg.eigh(gram)
+        order = np.argsort(eigenvalues)[::-1][:n_modes]
+        s = np.sqrt(np.clip(eigenvalues[order], 0, None))
+        U = U[:, order]
+        modes = np.arange(1, n_modes + 1)
+
+        # Pass 2: the patterns of every variable, X^T U / s, block by block
+        patterns = {}
+        for name, var in pairs:
+            with stage('patterns', data=var, variable=name):
+                space_dim, _ = _block_slices(var, self.time_dim, self.block_size)
+                template = var.isel({self.time_dim: 0}, drop=True)
+                rows_out = []
+                for rows, valid, block, _, _ in self._blocks(var):
+                    out = np.full((n_modes, valid.size), np.nan)
+                    with np.errstate(divide='ignore', invalid='ignore'):
+                        out[:, valid] = np.where(s[:, np.newaxis] > 0,
+                                                 np.sqrt(self.factors[name]) * (U.T @ block) / s[:, np.newaxis], 0)
+                    rows_out.append(out.reshape((n_modes,) + template.isel({space_dim: rows}).shape))
+                patterns[name] = self._unblock(rows_out, template, space_dim, name, ('mode',), {'mode': modes})
+
+        # Deterministic signs: the largest loading over all variables of each mode is positive
+        largest = np.zeros(n_modes)
+        for pattern in patterns.values():
+            flat = np.nan_to_num(pattern.values.reshape(n_modes, -1))
+            if flat.shape[1] > 0:
+                candidate = flat[np.arange(n_modes), np.abs(flat).argmax(axis=1)]
+                largest = np.where(np.abs(candidate) > np.abs(largest), candidate, largest)
+        sign = xr.DataArray(np.where(largest < 0, -1.0, 1.0), dims='mode', coords={'mode': modes})
+
+        self.names = [name for name, _ in pairs]
+        self.n_samples = n_time
+        self.patterns_ = {name: (pattern * sign).rename(name) for name, pattern in patterns.items()}
+        self.singular_values_ = xr.DataArray(s, dims='mode', coords={'mode': modes}, name='singular_values')
+        self.scores_ = (xr.DataArray(U.T, dims=('mode', self.time_dim), coords={'mode': modes, self.time_dim: time.values})
+                        * sign).rename('scores')
+        self.total_variance_ = np.trace(gram) / (n_time - 1)
+        return self
+
+
+    def components(self, normalized=True):
+        """
+        Patterns of every variable, split back out of the combined vector.
+
+        Parameters:
+        ----------
+        normalized : bool, optional
+            Unit-norm patterns over all variables together, in the weighted and normalized space
+            (True, default), or scaled by the singular values.
+
+        Returns:
+        -------
+        dict
+            {name: xarray.DataArray (mode, ...)} in the order of the variables, NaN at left-out points.
+        """
+        if normalized:
+            return dict(self.patterns_)
+        return {name: pattern * self.singular_values_ for name, pattern in self.patterns_.items()}
+
+
+    def scores(self, normalized=False):
+        """Principal components (mode, time), unit norm if 'normalized', else scaled by the singular values."""
+        return self.scores_ if normalized else (self.scores_ * self.singular_values_).rename('scores')
+
+
+    def singular_values(self):
+        return self.singular_values_
+
+
+    def explained_variance(self):
+        return (self.singular_values_ ** 2 / (self.n_samples - 1)).rename('explained_variance')
+
+
+    def explained_variance_ratio(self):
+        """Fraction of the combined (weighted, normalized) variance explained by each mode."""
+        return (self.explained_variance() / self.total_variance_).rename('explained_variance_ratio')
+
+
+    def variable_variance_fraction(self):
+        """
+        Fraction of each variable's own (weighted, normalized) variance explained by each mode.
+
+        Returns:
+        -------
+        xarray.DataArray
+            (variable, mode).
+        """
+        s2 = self.singular_values_.values ** 2
+        fractions = [np.nansum(self.patterns_[name].values.reshape(s2.size, -1) ** 2, axis=1) * s2
+                     / self._traces[name] if self._traces[name] > 0 else np.full(s2.size, np.nan)
+                     for name in self.names]
+        return xr.DataArray(np.array(fractions), dims=('variable', 'mode'),
+                            coords={'variable': self.names, 'mode': self.singular_values_.mode.values},
+                            name='variable_variance_fraction')
+
+
+    def transform(self, variables, drop_dims=[]):
+        """
+        Project new anomaly fields of the same variables and grids onto the combined patterns,
+        with the means and scales of the fit.
+
+        Returns:
+        -------
+        xarray.DataArray
+            Unnormalized scores (mode, time), equal to scores() for the fitted data.
+        """
+        pairs = dict((name, var.transpose(self.time_dim, ...)) for name, var in _named_variables(variables, drop_dims))
+        missing = [name for name in self.names if name not in pairs]
+        if missing:
+            raise ValueError(f"Missing variables: {missing}.")
+        n_modes = self.singular_values_.size
+        projection = None
+        for name in self.names:
+            var = pairs[name]
+            space_dim, slices = _block_slices(var, self.time_dim, self.block_size)
+            means, scales = self._preprocessing[name]
+            pattern = self.patterns_[name].transpose('mode', *var.dims[1:]).values.reshape(n_modes, -1)
+            start = 0
+            for rows, mean, scale in zip(slices, means, scales):
+                slab = var.isel({space_dim: rows})
+                values = np.asarray(slab.values, dtype=np.float64).reshape(slab.sizes[self.time_dim], -1)
+                valid = np.isfinite(mean)
+                block = (values[:, valid] - mean[valid]) * (scale[valid] * np.sqrt(self.factors[name]))
+                part = block @ pattern[:, start:start + mean.size][:, valid].T
+                projection = part if projection is None else projection + part
+                start += mean.size
+        time = pairs[self.names[0]][self.time_dim]
+        return xr.DataArray(projection.T, dims=('mode', self.time_dim),
+                            coords={'mode': self.singular_values_.mode.values, self.time_dim: time.values},
+                            name='scores')
+
+
+def combined_eofs(variables, n_modes=10, normalize='field', use_coslat=True, weights=None, drop_dims=[],
+    time_dim='time', lat_dim='lat', block_size=2 ** 24):
+    """
+    Combined EOFs of several anomaly fields without stacking them (see CombinedEOF).
+
+    A memory-lean alternative to stack_vars + standardize_data + compute_rotated_eofs: the
+    variables are weighted and normalized inside the solver and never concatenated.
+
+    Parameters:
+    variables (list, dict or xarray.Dataset): Anomaly fields (time, ...) with identical time coordinates.
+    n_modes (int, optional): Number of modes. Default is 10.
+    normalize (str or None, optional): 'field' (default), 'point' or None (see CombinedEOF).
+    use_coslat (bool, optional): Square-root cosine-latitude weighting. Default is True.
+    weights (dict or list, optional): Extra weight of each variable's variance. Default is equal weights.
+    drop_dims (list of str, optional): Coordinates dropped from each variable, as in stack_vars.
+    time_dim (str, optional): Time dimension. Default is 'time'.
+    lat_dim (str, optional): Latitude coordinate. Default is 'lat'.
+    block_size (int, optional): Number of values read per block, the bound on the working memory.
+                                Default is 2**24 (128 MiB in float64).
+
+    Returns:
+    CombinedEOF: The fitted model; components() returns the patterns per variable.
+    """
+    return CombinedEOF(n_modes=n_modes, normalize=normalize, use_coslat=use_coslat, weights=weights,
+                       time_dim=time_dim, lat_dim=lat_dim, block_size=block_size).fit(variables, drop_dims=drop_dims)
@@ -0,0 +1,228 @@
+# compaction.py
+
+import numpy as np
+import xarray as xr
+
+from .utils import calculate_anomaly
+
+
+def valid_mask(data, sample_dim='time'):
+    """
+    Mask of the grid points holding at least one valid value along 'sample_dim'.
+
+    Parameters:
+    data (xarray.DataArray): Gridded field, e.g. (time, lat, lon).
+    sample_dim (str, optional): Dimension along which values are collected. Default is 'time'.
+
+    Returns:
+    xarray.DataArray: Boolean mask over the remaining (spatial) dimensions, False over land.
+    """
+    return data.notnull().any(sample_dim)
+
+
+class CompactField:
+    """
+    Dense (time, point) matrix of the valid points of a gridded field.
+
+    Land (all-NaN) points are dropped once when packing, so that anomalies, area-weighted means
+    and regressions only touch ocean points. Results are scattered back onto the (lat, lon)
+    grid with 'unpack' when they are returned.
+
+    Points without any gap come first, points with some missing time steps last, so that the
+    kernels run plain matrix products on the leading block and NaN-aware code on the rest.
+
+    Parameters:
+    ----------
+    values : numpy.ndarray
+        Matrix (time, point) of the valid points.
+    index : numpy.ndarray
+        Flat indices of the valid points in the spatial grid.
+    n_complete : int
+        Number of leading points without missing values.
+    template : xarray.DataArray
+        Spatial grid (e.g. lat, lon) the points come from; only its coordinates are used.
+    sample : xarray.DataArray
+        Coordinate of the sample dimension (usually time).
+    name : str, optional
+        Name of the field.
+    """
+
+    def __init__(self, values, index, n_complete, template, sample, name=None):
+        self.values = values
+        self.index = index
+        self.n_complete = int(n_complete)
+        self.template = template
+        self.sample = sample
+        self.name = name
+
+
+    @classmethod
+    def pack(cls, data, mask=None, sample_dim='time'):
+        """
+        Pack a gridded DataArray into a CompactField.
+
+        Parameters:
+        ----------
+        data : xarray.DataArray
+            Field with 'sample_dim' and spatial dimensions. Dask-backed data are computed.
+        mask : xarray.DataArray, optional
+            Boolean mask of the points to keep, e.g. cached from an earlier call to valid_mask.
+            Computed from 'data' if not given.
+        sample_dim : str, optional
+            Sample dimension. Default is 'time'.
+        """
+        spatial_dims = [dim for dim in data.dims if dim != sample_dim]
+        data = data.transpose(sample_dim, *spatial_dims)
+        template = data.isel({sample_dim: 0}, drop=True)
+        values = np.asarray(data.values).reshape(data.sizes[sample_dim], -1)
+
+        # One cheap reduction separates complete points from land and gappy points
+        complete = np.isfinite(np.add.reduce(values, axis=0))
+        if mask is None:
+            partial = np.flatnonzero(~complete)
+            partial = partial[np.isfinite(values[:, partial]).any(axis=0)]
+        else:
+            keep = np.asarray(mask.transpose(*spatial_dims).values).ravel()
+            complete &= keep
+            partial = np.flatnonzero(keep & ~complete)
+
+        packed = np.compress(complete, values, axis=1)
+        if partial.size:
+            packed = np.concatenate([packed, values[:, partial]], axis=1)
+        index = np.concatenate([np.flatnonzero(complete), partial])
+        return cls(packed, index, complete.sum(), template, data[sample_dim], name=data.name)
+
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+
+    @property
+    def sample_dim(self):
+        return self.sample.dims[0]
+
+
+    @property
+    def n_points(self):
+        return self.index.size
+
+
+    @property
+    def mask(self):
+        """Boolean mask of the valid points on the spatial grid."""
+        keep = np.zeros(self.template.size, dtype=bool)
+        keep[self.index] = True
+        return self.template.copy(data=keep.reshape(self.template.shape)).rename('mask')
+
+
+    def point_coords(self, name):
+        """Values of the spatial coordinate 'name' (e.g. 'lat') at every valid point."""
+        coord = self.template[name].broadcast_like(self.template).transpose(*self.template.dims)
+        return coord.values.ravel()[self.index]
+
+
+    def unpack(self, values, dims=None, coords=None, name=None):
+        """
+        Scatter a (..., point) array back onto the spatial grid, NaN over land.
+
+        Parameters:
+        ----------
+        values : numpy.ndarray
+            Array whose last axis runs over the valid points.
+        dims : sequence of str, optional
+            Names of the leading dimensions. Default is (sample_dim,) when the leading axis
+            matches the number of samples, no leading dimension otherwise.
+        coords : dict, optional
+            Coordinates of the leading dimensions.
+        name : str, optional
+            Name of the output DataArray.
+        """
+        values = np.asarray(values)
+        leading = values.shape[:-1]
+        if dims is None:
+            dims = (self.sample_dim,) if leading == (self.sample.size,) else ()
+            if coords is None and dims:
+                coords = dict(self.sample.coords)
+        dtype = values.dtype if np.issubdtype(values.dtype, np.floating) else np.float64
+        grid = np.full(leading + (self.template.size,), np.nan, dtype=dtype)
+        grid[..., self.index] = values
+
+        out_coords = dict(self.template.coords)
+        out_coords.update(coords or {})
+        return xr.DataArray(grid.reshape(leading + self.template.shape), dims=tuple(dims) + self.template.dims,
+                            coords=out_coords, name=name)
+
+
+    def to_dataarray(self):
+        """The packed field on its original grid."""
+        return self.unpack(self.values, name=self.name)
+
+
+    def _as_dataarray(self):
+        """The packed matrix as a (time, point) DataArray, sharing memory."""
+        return xr.DataArray(self.values, dims=(self.sample_dim, 'point'),
+                            coords=dict(self.sample.coords), name=self.name)
+
+
+    def anomaly(self, clim_start=None, clim_end=None, freq='month'):
+        """
+        Anomalies of the packed field (see calculate_anomaly), computed on valid points only.
+
+        Returns:
+        -------
+        CompactField
+        """
+        anomaly = calculate_anomaly(self._as_dataarray(), clim_start=clim_start, clim_end=clim_end, freq=freq)
+        return CompactField(np.asarray(anomaly.values), self.index, self.n_complete, self.template,
+                            anomaly[self.sample_dim], name=self.name)
+
+
+    def weighted_mean(self, lat_name='lat'):
+        """
+        Cosine-latitude weighted mean over the valid points at every time step.
+
+        Equal to data.weighted(compute_weights(data)).mean(('lat', 'lon')) on the original grid:
+        NaN values are skipped and the weights renormalized.
+        """
+        weights = np.cos(np.deg2rad(self.point_coords(lat_name)))
+        n = self.n_complete
+        total = self.values[:, :n] @ weights[:n]
+        norm = np.full(total.shape, weights[:n].sum())
+        if n < self.n_points:
+            gappy = self.values[:, n:]
+            finite = np.isfinite(gappy)
+            total += np.where(finite, gappy, 0) @ weights[n:]
+            norm += finite @ weights[n:]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / norm
+        return xr.DataArray(mean, dims=(self.sample_dim,), coords=dict(self.sample.coords))
+
+
+    def covariance(self, series, ddof=1):
+        """
+        Covariance of every valid point with a time series, on the original grid.
+
+        Matches xr.cov(field, series, dim='time'): time steps where either side is NaN are left
+        out pairwise. Gap-free points, usually nearly all of them, take a single matrix-vector
+        product.
+        """
+        y = np.asarray(series.transpose(self.sample_dim).values, dtype=np.float64)
+        finite_y = np.isfinite(y)
+        n = self.n_complete
+        Xv, yv = (self.values, y) if finite_y.all() else (self.values[finite_y], y[finite_y])
+
+        cov = np.empty(self.n_points)
+        if n:
+            # sum((x - mean(x)) (y - mean(y))) == (y - mean(y)) . x, one matrix-vector product
+            cov[:n] = ((yv - yv.mean()) @ Xv[:, :n]) / (yv.size - ddof)
+        if n < self.n_points:
+            Xg = Xv[:, n:]
+            valid = np.isfinite(Xg)
+            count = valid.sum(axis=0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                x_mean = np.where(valid, Xg, 0).sum(axis=0) / count
+                y_mean = (valid * yv[:, np.newaxis]).sum(axis=0) / count
+                products = np.where(valid, (Xg - x_mean) * (yv[:, np.newaxis] - y_mean), 0)
+                cov[n:] = np.where(count > ddof, products.sum(axis=0) / (count - ddof), np.nan)
+        return self.unpack(cov)
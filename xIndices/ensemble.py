@@ -0,0 +1,233 @@
+# ensemble.py
+
+import glob
+import os
+import traceback
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+import multiprocessing
+
+import numpy as np
+import xarray as xr
+
+from .indices import compute_indices
+from .results import IndexResult
+
+
+# Environment variables read by the BLAS/OpenMP runtimes when they are first loaded
+BLAS_THREAD_VARIABLES = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'BLIS_NUM_THREADS',
+                         'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+# Keeps the threadpoolctl limits of a worker process alive
+_THREAD_LIMITS = None
+
+
+def ensemble_members(paths, members=None):
+    """
+    Normalize the member inputs of run_ensemble to a {member: path} mapping.
+
+    Parameters:
+    paths (str, list or dict): Glob pattern with one file per member, list of paths (an item may itself
+                               be a list of files of one member), or a {member: path} mapping.
+    members (list of str, optional): Member names for a glob or list, in the same order. Default is the
+                                     file name without extension.
+
+    Returns:
+    dict: Mapping from member name to the path(s) passed to load_data.
+    """
+    if isinstance(paths, dict):
+        return dict(paths)
+    if isinstance(paths, (str, os.PathLike)):
+        paths = sorted(glob.glob(os.fspath(paths)))
+        if not paths:
+            raise ValueError("The glob pattern does not match any file.")
+    paths = list(paths)
+
+    if members is None:
+        members = []
+        for path in paths:
+            first = path if isinstance(path, (str, os.PathLike)) else sorted(path)[0]
+            members.append(os.path.splitext(os.path.basename(first))[0])
+    if len(members) != len(paths) or len(set(members)) != len(members):
+        raise ValueError("Give one unique member name per path.")
+    return dict(zip(members, paths))
+
+
+@contextmanager
+def _blas_threads_env(threads):
+    """Set the BLAS thread variables while worker processes are started, restore them afterwards."""
+    saved = {name: os.environ.get(name) for name in BLAS_THREAD_VARIABLES}
+    os.environ.update({name: str(threads) for name in BLAS_THREAD_VARIABLES})
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _init_worker(blas_threads, max_memory):
+    """Pin BLAS threads, cap the address space and keep dask single-threaded in a worker."""
+    global _THREAD_LIMITS
+    try:
+        # Covers runtimes that were already loaded when the environment was read
+        from threadpoolctl import threadpool_limits
+        _THREAD_LIMITS = threadpool_limits(limits=blas_threads)
+    except ImportError:
+        pass
+
+    if max_memory:
+        try:
+            import resource
+            resource.setrlimit(resource.RLIMIT_AS, (max_memory, max_memory))
+        except (ImportError, ValueError, OSError) as e:
+            warnings.warn(f"Could not cap worker memory: {e}")
+
+    import dask
+    dask.config.set(scheduler='synchronous')
+
+
+def _as_variables(name, index, result, desired):
+    """Outputs of one index result: {output name: DataArray}."""
+    if isinstance(result, IndexResult):
+        items = result.items()
+    else:
+        items = [(desired[0] if desired else name, result)]
+
+    variables = {}
+    for output, value in items:
+        if isinstance(value, (int, float, np.number)):
+            value = xr.DataArray(value)
+        if not isinstance(value, xr.DataArray):
+            continue   # e.g. the fitted EOFModel
+        variables[output if name == index else f'{name}_{output}'] = value.load()
+    return variables
+
+
+def _run_member(member, path, var, specs, load_kwargs):
+    """
+    Worker task: load one member and compute its indices.
+    Returns (member, {output name: DataArray} or None, None or (error message, traceback)).
+    """
+    try:
+        bundle = compute_indices(specs, path=path, var=var, **load_kwargs)
+        variables = {}
+        for spec in specs:
+            spec = {'index': spec} if isinstance(spec, str) else spec
+            name = spec.get('name', spec['index'])
+            variables.update(_as_variables(name, spec['index'], bundle[name], spec.get('desired')))
+        return member, variables, None
+    except Exception as e:
+        return member, None, (f"{type(e).__name__}: {e}", traceback.format_exc())
+
+
+def _run_pool(tasks, max_workers, blas_threads, max_memory, max_tasks_per_child, mp_context, callback):
+    """Run the member tasks on one process pool. Returns the members lost to a broken pool."""
+    context = multiprocessing.get_context(mp_context)
+    pool_kwargs = {}
+    if max_tasks_per_child and context.get_start_method() != 'fork':
+        pool_kwargs['max_tasks_per_child'] = max_tasks_per_child
+
+    broken = []
+    with _blas_threads_env(blas_threads), \
+            ProcessPoolExecutor(max_workers=max_workers, mp_context=context, initializer=_init_worker,
+                                initargs=(blas_threads, max_memory), **pool_kwargs) as executor:
+        futures = {executor.submit(_run_member, *task): task for task in tasks}
+        for future in as_completed(futures):
+            try:
+                callback(*future.result())
+            except BrokenProcessPool:
+                broken.append(futures[future])
+    return broken
+
+
+def run_ensemble(paths, specs, var, members=None, max_workers=None, blas_threads=1, max_memory=None,
+    max_tasks_per_child=None, mp_context='spawn', member_dim='member', **load_kwargs):
+    """
+    Compute a set of indices for every member of an ensemble on a pool of processes.
+
+    Every member runs its own load_data -> compute_indices pipeline in a worker process. A member
+    that fails, runs out of memory or kills its worker is reported and left out; the others are
+    not affected. Workers started by a pool that broke are retried, each in a fresh one-worker
+    pool, so that only the member at fault is lost.
+
+    Every output keeps its own grid (e.g. the PDO and NAO patterns), and the members of an output
+    must share it: a member on another grid or time axis raises instead of being padded with NaN.
+
+    With the default 'spawn' start method the calling script needs an
+    ``if __name__ == '__main__':`` guard.
+
+    Parameters:
+    ----------
+    paths : str, list or dict
+        Glob pattern (one file per member), list of paths or {member: path} mapping (see ensemble_members).
+    specs : list of str or dict
+        Index specifications, as for compute_indices.
+    var : str
+        Name of the variable to load from each file.
+    members : list of str, optional
+        Member names for a glob or list of paths. Default is the file name without extension.
+    max_workers : int, optional
+        Number of worker processes. Default is the number of CPUs divided by 'blas_threads'.
+    blas_threads : int, optional
+        BLAS/OpenMP threads per worker, so that workers * blas_threads does not oversubscribe
+        the cores. Default is 1.
+    max_memory : int or str, optional
+        Address-space limit per worker in bytes, or a string like '4GB' (Unix only). A member
+        exceeding it fails with a MemoryError. Default is no limit.
+    max_tasks_per_child : int, optional
+        Replace a worker after this many members, returning its memory to the system.
+        Default is to keep the workers.
+    mp_context : str, optional
+        Start method of the worker processes. Default is 'spawn'.
+    member_dim : str, optional
+        Name of the ensemble dimension of the output. Default is 'member'.
+    **load_kwargs
+        Passed to compute_indices for loading, e.g. start_time, end_time or chunks.
+
+    Returns:
+    -------
+    tuple
+        (dict mapping each index output to an xarray.DataArray with a 'member_dim' dimension,
+        dict mapping each failed member to its error traceback).
+
+    Examples:
+    --------
+    >>> outputs, failed = run_ensemble('cmip6/tos_*.nc', ['pdo', {'index': 'amo', 'desired': ['amo_index']}],
+    ...                                var='tos', max_workers=16, max_memory='6GB')
+    >>> outputs['pdo_index'].sel(member='tos_r1i1p1f1')
+    """
+    members = ensemble_members(paths, members)
+    if isinstance(max_memory, str):
+        from dask.utils import parse_bytes
+        max_memory = parse_bytes(max_memory)
+    if max_workers is None:
+        max_workers = max(1, (os.cpu_count() or 1) // blas_threads)
+    max_workers = min(max_workers, len(members))
+
+    results, failures = {}, {}
+
+    def collect(member, outputs, error):
+        if error is None:
+            results[member] = outputs
+        else:
+            message, failures[member] = error
+            print(f"Error for member {member}: {message}")
+
+    tasks = [(member, path, var, specs, load_kwargs) for member, path in members.items()]
+    broken = _run_pool(tasks, max_workers, blas_threads, max_memory, max_tasks_per_child, mp_context, collect)
+    for task in broken:
+        if _run_pool([task], 1, blas_threads, max_memory, None, mp_context, collect):
+            message = "BrokenProcessPool: the worker process terminated abruptly."
+            collect(task[0], None, (message, message))
+
+    order = [member for member in members if member in results]
+    outputs = {}
+    for name in (results[order[0]] if order else {}):
+        outputs[name] = xr.concat([results[member][name] for member in order], dim=member_dim, join='exact',
+                                  coords='minimal', compat='override').assign_coords({member_dim: order})
+    return outputs, failures
@@ -0,0 +1,511 @@
+# eof_model.py
+
+import numpy as np
+import xarray as xr
+
+from .utils import project_data_onto_eofs, compute_weights
+from .preprocess_data import rename_dims_to_standard, adjust_longitude, adjust_latitude
+
+
+EOF_MODEL_FORMAT = 1
+_METADATA_KEYS = ('index', 'region', 'to_range', 'clim_start', 'clim_end', 'freq', 'remove_global_mean',
+                  'index_mode')
+
+
+class EOFModel:
+    """
+    Fitted EOF decomposition reduced to plain arrays, independent of the xeofs solver.
+
+    The model keeps what is needed to serve and extend an index: the patterns, the norms, the
+    scores of the fitted record, the preprocessing of xeofs (mean, optional standard deviation
+    and square-root cosine-latitude weights) and a projection matrix mapping a preprocessed
+    field onto the scores. New data are projected with project_data_onto_eofs, so computing an
+    index for new months never refits the decomposition.
+
+    Rotated (Varimax/Promax) models also keep the unrotated basis they were derived from,
+    which is what 'update' tracks to report pattern drift.
+
+    Models requested from the index functions with desired=['eof_model'] also carry the
+    climatology of the base period and the preprocessing metadata, so that after a save/load
+    round trip 'transform' and 'index' turn raw fields into indices by projection alone.
+
+    Parameters:
+    ----------
+    patterns : xarray.DataArray
+        Unit-norm spatial patterns (mode, lat, lon) in the weighted space of xeofs,
+        NaN at masked points.
+    norms : xarray.DataArray
+        Singular values (pseudo-norms for rotated models) per mode.
+    scores : xarray.DataArray
+        Unnormalized scores (mode, time) of the fitted record.
+    projection : xarray.DataArray
+        Matrix (mode, lat, lon) mapping a preprocessed field onto unnormalized scores.
+    mean : xarray.DataArray
+        Mean removed from the data before the decomposition.
+    explained_variance : xarray.DataArray
+        Variance explained by each mode.
+    total_variance : float
+        Total variance of the preprocessed data.
+    n_samples : int
+        Number of time steps the decomposition is based on.
+    std : xarray.DataArray, optional
+        Standard deviation the data were divided by (standardize=True).
+    weights : xarray.DataArray, optional
+        Square-root cosine-latitude weights (use_coslat=True).
+    rotation : str, optional
+        None, 'Varimax' or 'Promax'.
+    basis, basis_norms : xarray.DataArray, optional
+        Unrotated patterns and singular values of a rotated model.
+    climatology : xarray.DataArray, optional
+        Climatology (month or dayofyear, lat, lon) of the base period over the model region.
+    global_mean_climatology : xarray.DataArray, optional
+        Area-weighted global mean of the climatology, for models fitted on anomalies with the
+        global mean SST removed (remove_trend=True).
+    metadata : dict, optional
+        Preprocessing metadata: 'index', 'region' (lat_s, lat_e, lon_s, lon_e), 'to_range',
+        'clim_start', 'clim_end', 'freq', 'remove_global_mean' and 'index_mode'.
+    """
+
+    def __init__(self, patterns, norms, scores, projection, mean, explained_variance, total_variance,
+                 n_samples, std=None, weights=None, rotation=None, basis=None, basis_norms=None,
+                 climatology=None, global_mean_climatology=None, metadata=None):
+        self.patterns = patterns
+        self.norms = norms
+        self.scores_ = scores
+        self.projection = projection
+        self.mean = mean
+        self.explained_variance_ = explained_variance
+        self.total_variance = float(total_variance)
+        self.n_samples = int(n_samples)
+        self.std = std
+        self.weights = weights
+        self.rotation = rotation
+        self.basis = patterns if basis is None else basis
+        self.basis_norms = norms if basis_norms is None else basis_norms
+        self.climatology = climatology
+        self.global_mean_climatology = global_mean_climatology
+        self.metadata = dict(metadata or {})
+
+
+    @classmethod
+    def from_solver(cls, solver, rotation=None, climatology=None, global_mean_climatology=None, metadata=None):
+        """
+        Build an EOFModel from a fitted xeofs.single.EOF or xeofs.single.EOFRotator.
+
+        Parameters:
+        ----------
+        solver : xeofs.single.EOF or xeofs.single.EOFRotator
+            Model returned by compute_rotated_eofs.
+        rotation : str, optional
+            Name of the rotation ('Varimax' or 'Promax') for rotated models. Inferred from the
+            rotator power if not given.
+        climatology, global_mean_climatology, metadata : optional
+            Preprocessing needed to serve the model from raw fields (see EOFModel).
+        """
+        import xeofs
+
+        preprocessor = solver.preprocessor
+        scaler = preprocessor.scaler.transformers[0]
+        params = scaler.get_params()
+        mean = scaler.mean_ if params['with_center'] else None
+        std = scaler.std_ if params['with_std'] else None
+        weights = scaler.coslat_weights_ if params['with_coslat'] else None
+
+        patterns = solver.components(normalized=True)
+        norms = solver.data['norms']
+        if isinstance(solver, xeofs.single.EOFRotator):
+            from .rotation import _inverse_transpose
+
+            solver_params = solver.get_params()
+            n_modes = solver_params['n_modes']
+            if rotation is None:
+                rotation = 'Varimax' if solver_params['power'] == 1 else 'Promax'
+            basis = solver.model_data['components'].sel(mode=slice(1, n_modes))
+            basis_norms = solver.model_data['singular_values'].sel(mode=slice(1, n_modes))
+
+            # The rotator's transform is linear in the data: unrotated projection scaled by the
+            # singular values, inverse-transposed rotation, variance ordering, pseudo-norms and signs
+            rotation_inv_t = _inverse_transpose(solver.data['rotation_matrix'], solver_params['power'])
+            projection = xr.dot((basis / basis_norms).rename({'mode': 'mode_m'}),
+                                rotation_inv_t.rename({'mode_n': 'mode'}), dims='mode_m')
+            if solver.sorted:
+                projection = projection.isel(mode=solver.data['idx_modes_sorted'].values).assign_coords(
+                    mode=projection.mode)
+            projection = projection * norms * solver.data['modes_sign']
+            projection = preprocessor.inverse_transform_components(projection)
+            basis = preprocessor.inverse_transform_components(basis)
+        else:
+            rotation = None
+            basis = basis_norms = None
+            projection = patterns
+
+        return cls(
+            patterns=patterns, norms=norms, scores=solver.scores(normalized=False), projection=projection,
+            mean=mean, std=std, weights=weights, explained_variance=solver.data['explained_variance'],
+            total_variance=solver.data['total_variance'], n_samples=solver.data['scores'].sizes['sample'],
+            rotation=rotation, basis=basis, basis_norms=basis_norms, climatology=climatology,
+            global_mean_climatology=global_mean_climatology, metadata=metadata
+        )
+
+
+    @property
+    def n_modes(self):
+        return self.norms.sizes['mode']
+
+
+    def components(self, normalized=True):
+        """Spatial patterns, scaled by the norms if 'normalized' is False (as in xeofs)."""
+        return self.patterns if normalized else self.patterns * self.norms
+
+
+    def scores(self, normalized=False):
+        """Scores of the fitted (and updated) record, divided by the norms if 'normalized' is True."""
+        return self.scores_ / self.norms if normalized else self.scores_
+
+
+    def singular_values(self):
+        return self.norms
+
+
+    def explained_variance(self):
+        return self.explained_variance_
+
+
+    def explained_variance_ratio(self):
+        return self.explained_variance_ / self.total_variance
+
+
+    def preprocess(self, data):
+        """
+        Select the grid of the fitted model from new data and apply its preprocessing (centering,
+        scaling, coslat weights). Larger fields, e.g. global anomalies for a regional model, are cut
+        to the model region.
+        """
+        data = data.sel({dim: self.basis[dim] for dim in self.basis.dims if dim != 'mode'})
+        if self.mean is not None:
+            data = data - self.mean
+        if self.std is not None:
+            data = data / self.std
+        if self.weights is not None:
+            data = data * self.weights
+        return data
+
+
+    def project(self, data, normalized=False):
+        """
+        Scores of new data on the frozen patterns of the model.
+
+        Parameters:
+        ----------
+        data : xarray.DataArray
+            Anomalies with a time dimension, on the grid of the model or a larger one.
+        normalized : bool, optional
+            Divide the scores by the norms. Default is False.
+
+        Returns:
+        -------
+        xarray.DataArray
+            Scores (mode, time).
+        """
+        field = self.preprocess(data).fillna(0)
+        scores = project_data_onto_eofs(field, self.projection.fillna(0)).transpose('mode', ...)
+        return scores / self.norms if normalized else scores
+
+
+    def _valid(self):
+        """Boolean (lat, lon) mask of the points the decomposition is defined on."""
+        return np.isfinite(self.basis.isel(mode=0)).values
+
+
+    def update(self, data, method='project'):
+        """
+        Extend the model by new time steps without refitting the full record.
+
+        Both methods run a Brand-style incremental SVD: the new rows are split into their
+        projection onto the current basis and a residual, and only the small (k + m) square core
+        matrix is decomposed, for k modes and m new time steps. The cost therefore scales with
+        the new data, plus a k x k rotation of the stored scores.
+
+        Parameters:
+        ----------
+        data : xarray.DataArray
+            New anomalies (time, lat, lon) on the grid of the model or a larger one, computed with the same
+            climatology as the fitted record. The stored mean is kept fixed.
+        method : str, optional
+            'project' (default) keeps the patterns frozen and appends the projected scores.
+            'svd' replaces patterns, norms and scores by the updated decomposition. Rotated
+            models only support 'project'.
+
+        Returns:
+        -------
+        model : EOFModel
+            The extended model.
+        drift : xarray.Dataset
+            Per mode, 'pattern_correlation' (absolute correlation between the current and the
+            updated pattern) and 'subspace_angle' (largest principal angle in degrees between
+            the spaces spanned by modes 1..k); 'residual_variance_fraction', the fraction of the
+            variance of the new data outside the current patterns.
+        """
+        if method not in ('project', 'svd'):
+            raise ValueError("Invalid method. Choose 'project' or 'svd'.")
+        if method == 'svd' and self.rotation is not None:
+            raise ValueError("Rotated models can only be updated with method='project'.")
+
+        valid = self._valid()
+        spatial_dims = [dim for dim in self.basis.dims if dim != 'mode']
+        field = self.preprocess(data).transpose('time', *spatial_dims)
+        A = field.values.reshape(field.sizes['time'], -1)[:, valid.ravel()]
+        A = np.nan_to_num(A)
+        V = self.basis.transpose('mode', *spatial_dims).values.reshape(self.n_modes, -1)[:, valid.ravel()].T
+        s = self.basis_norms.values
+
+        # Brand (2006): [S V^T; A] = [[S, 0], [A V, R^T]] [V Q]^T with A - A V V^T = (Q R)^T
+        P = A @ V
+        residual = A - P @ V.T
+        Q, R = np.linalg.qr(residual.T)
+        k, m = len(s), A.shape[0]
+        core = np.zeros((k + m, k + m))
+        core[:k, :k] = np.diag(s)
+        core[k:, :k] = P
+        core[k:, k:] = R.T
+        Uc, s_new, Vc_t = np.linalg.svd(core)
+        Uc, s_new = Uc[:, :k], s_new[:k]
+        V_new = np.hstack([V, Q]) @ Vc_t[:k].T
+
+        # Singular vectors are defined up to sign: keep the orientation of the current patterns
+        signs = np.sign(np.sum(V_new * V, axis=0))
+        signs[signs == 0] = 1
+        V_new *= signs
+        Uc *= signs
+
+        overlap = V.T @ V_new
+        angles = np.empty(k)
+        for i in range(1, k + 1):
+            cosines = np.linalg.svd(overlap[:i, :i], compute_uv=False)
+            angles[i - 1] = np.degrees(np.arccos(np.clip(cosines.min(), -1, 1)))
+        total_new = float(np.sum(A**2))
+        drift = xr.Dataset(
+            {
+                'pattern_correlation': ('mode', np.abs(np.diag(overlap))),
+                'subspace_angle': ('mode', angles),
+                'residual_variance_fraction': np.sum(residual**2) / total_new if total_new > 0 else 0.0,
+            },
+            coords={'mode': self.basis_norms.mode.values},
+        )
+
+        n_samples = self.n_samples + m
+        total_variance = (self.total_variance * (self.n_samples - 1) + total_new) / (n_samples - 1)
+        times = data['time']
+
+        if method == 'project':
+            new_scores = self.project(data)
+            scores = xr.concat([self.scores_, new_scores.assign_coords(time=times)], dim='time')
+            return EOFModel(
+                patterns=self.patterns, norms=self.norms, scores=scores, projection=self.projection,
+                mean=self.mean, std=self.std, weights=self.weights,
+                explained_variance=self.explained_variance_, total_variance=self.total_variance,
+                n_samples=self.n_samples, rotation=self.rotation, basis=self.basis,
+                basis_norms=self.basis_norms, climatology=self.climatology,
+                global_mean_climatology=self.global_mean_climatology, metadata=self.metadata
+            ), drift
+
+        # Updated scores: the old left singular vectors rotated by the top block of the core's
+        # left singular vectors, followed by its bottom block for the new time steps
+        old_u = (self.scores_ / self.norms).transpose('time', 'mode').values
+        u_new = np.vstack([old_u @ Uc[:k], Uc[k:]])
+        pattern_values = np.full((k, valid.size), np.nan)
+        pattern_values[:, valid.ravel()] = V_new.T
+        basis = self.basis.transpose('mode', *spatial_dims)
+        patterns = basis.copy(data=pattern_values.reshape(basis.shape))
+        norms = self.norms.copy(data=s_new)
+        scores = xr.DataArray(
+            (u_new * s_new).T, dims=('mode', 'time'),
+            coords={'mode': self.norms.mode.values,
+                    'time': np.concatenate([self.scores_['time'].values, times.values])},
+            name=self.scores_.name
+        )
+        return EOFModel(
+            patterns=patterns, norms=norms, scores=scores, projection=patterns, mean=self.mean,
+            std=self.std, weights=self.weights,
+            explained_variance=self.explained_variance_.copy(data=s_new**2 / (n_samples - 1)),
+            total_variance=total_variance, n_samples=n_samples, climatology=self.climatology,
+            global_mean_climatology=self.global_mean_climatology, metadata=self.metadata
+        ), drift
+
+
+    def anomaly(self, data):
+        """
+        Anomalies of a raw field with respect to the stored climatology.
+
+        The field goes through the same standardization as in the index functions (dimension
+        names, 'to_range' longitudes, descending latitudes) and is cut to the model region. If the
+        model was fitted with the global mean SST removed, the global mean anomaly of the field is
+        subtracted as well, which requires a global field.
+        """
+        if self.climatology is None:
+            raise ValueError("The model has no climatology; pass anomalies to 'project' instead.")
+        freq = self.metadata.get('freq', 'month')
+        data = adjust_latitude(adjust_longitude(rename_dims_to_standard(data).copy(deep=False),
+                                                to_range=self.metadata.get('to_range', '0_360')))
+        spatial = {dim: self.climatology[dim] for dim in self.climatology.dims if dim != freq}
+        anomaly = data.sel(spatial).groupby(f'time.{freq}') - self.climatology
+
+        if self.metadata.get('remove_global_mean'):
+            weighted = data.weighted(compute_weights(data, lat_dim='lat')).mean(dim=['lat', 'lon'])
+            global_mean = weighted.groupby(f'time.{freq}') - self.global_mean_climatology
+            anomaly = anomaly - global_mean
+        return anomaly
+
+
+    def transform(self, data, normalized=False):
+        """
+        Scores of a raw field (time, lat, lon): anomalies with respect to the stored climatology,
+        projected onto the frozen patterns. No EOF refit takes place.
+        """
+        return self.project(self.anomaly(data), normalized=normalized)
+
+
+    def index(self, data, mode=None):
+        """
+        Index time series for a raw field, scaled like the output of the index functions.
+
+        Parameters:
+        ----------
+        data : xarray.DataArray
+            Raw field with a time dimension.
+        mode : int, optional
+            Mode of the index. Default is the mode the index function used ('index_mode').
+
+        Returns:
+        -------
+        xarray.DataArray
+            Scores of the mode divided by the standard deviation of its fitted scores. (The
+            regional_timeseries of compute_regional_eof_modes share one standard deviation across
+            modes, so they differ from this by a constant factor.)
+        """
+        return self.index_from_anomaly(self.anomaly(data), mode=mode)
+
+
+    def index_from_anomaly(self, anomaly, mode=None):
+        """
+        Index time series (see index) for anomalies already computed with the stored climatology.
+        """
+        mode = mode if mode is not None else self.metadata.get('index_mode', 1)
+        reference = self.scores_.sel(mode=mode)
+        return (self.project(anomaly).sel(mode=mode) / reference.std()).squeeze()
+
+
+    def to_dataset(self):
+        """
+        Return the model as an xarray.Dataset (see save).
+        """
+        variables = {
+            'patterns': self.patterns, 'norms': self.norms, 'scores': self.scores_,
+            'explained_variance': self.explained_variance_,
+        }
+        if self.rotation is not None:
+            variables.update(projection=self.projection, basis=self.basis, basis_norms=self.basis_norms)
+        optional = {'mean': self.mean, 'std': self.std, 'weights': self.weights,
+                    'climatology': self.climatology, 'global_mean_climatology': self.global_mean_climatology}
+        variables.update({name: value for name, value in optional.items() if value is not None})
+
+        ds = xr.Dataset()
+        for name, value in variables.items():
+            value = value.drop_vars([coord for coord in value.coords if coord not in value.dims])
+            # Give the unrotated basis its own mode dimension, it can hold more modes
+            if name in ('basis', 'basis_norms'):
+                value = value.rename({'mode': 'basis_mode'})
+            ds[name] = value.rename(None).assign_attrs({})
+        # xeofs attaches its (non-serializable) fit parameters as attributes
+        for name in ds.variables:
+            ds[name].attrs = {}
+
+        attrs = {'format_version': EOF_MODEL_FORMAT, 'total_variance': self.total_variance,
+                 'n_samples': self.n_samples}
+        if self.rotation is not None:
+            attrs['rotation'] = self.rotation
+        for key, value in self.metadata.items():
+            if value is None:
+                continue
+            if key == 'region':
+                value = [np.nan if bound is None else float(bound) for bound in value]
+            elif isinstance(value, bool):
+                value = int(value)
+            attrs[key] = value
+        return ds.assign_attrs(attrs)
+
+
+    @classmethod
+    def from_dataset(cls, ds):
+        """
+        Rebuild a model from the output of to_dataset.
+        """
+        def get(name):
+            return ds[name] if name in ds else None
+
+        metadata = {}
+        for key in _METADATA_KEYS:
+            if key in ds.attrs:
+                value = ds.attrs[key]
+                if key == 'region':
+                    value = tuple(None if np.isnan(bound) else float(bound) for bound in np.atleast_1d(value))
+                elif key == 'remove_global_mean':
+                    value = bool(value)
+                elif isinstance(value, np.generic):
+                    value = value.item()
+                metadata[key] = value
+
+        rotation = ds.attrs.get('rotation')
+        patterns = ds['patterns']
+        basis = get('basis')
+        basis_norms = get('basis_norms')
+        if basis is not None:
+            basis = basis.rename({'basis_mode': 'mode'})
+            basis_norms = basis_norms.rename({'basis_mode': 'mode'})
+        return cls(
+            patterns=patterns, norms=ds['norms'], scores=ds['scores'],
+            projection=get('projection') if rotation is not None else patterns, mean=get('mean'),
+            explained_variance=ds['explained_variance'], total_variance=ds.attrs['total_variance'],
+            n_samples=ds.attrs['n_samples'], std=get('std'), weights=get('weights'), rotation=rotation,
+            basis=basis, basis_norms=basis_norms, climatology=get('climatology'),
+            global_mean_climatology=get('global_mean_climatology'), metadata=metadata
+        )
+
+
+    def save(self, path, complevel=4):
+        """
+        Write the model to a compressed netCDF file.
+
+        Parameters:
+        ----------
+        path : str
+            Output file.
+        complevel : int, optional
+            zlib compression level. Default is 4.
+        """
+        ds = self.to_dataset()
+        encoding = {name: {'zlib': True, 'complevel': complevel} for name in ds.data_vars}
+        ds.to_netcdf(path, encoding=encoding)
+
+
+def load_eof_model(path):
+    """
+    Load an EOFModel written by EOFModel.save.
+
+    The file is read into memory and closed, so the model can serve indices by projection
+    without xeofs or the original data.
+
+    Parameters:
+    ----------
+    path : str
+        File written by EOFModel.save.
+
+    Returns:
+    -------
+    EOFModel
+    """
+    with xr.open_dataset(path) as ds:
+        ds = ds.load()
+    if ds.attrs.get('format_version', 0) > EOF_MODEL_FORMAT:
+        raise ValueError(f"{path} was written by a newer version of xIndices.")
+    return EOFModel.from_dataset(ds)
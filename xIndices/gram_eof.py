@@ -0,0 +1,51 @@
+# gram_eof.py
+
+import xeofs
+from xeofs.linalg.decomposer import Decomposer
+from xeofs.utils.xarray_utils import total_variance
+
+from .utils import _gram_svd
+
+
+class _GramDecomposer(Decomposer):
+    """
+    xeofs Decomposer that runs _gram_svd where the exact solver would run np.linalg.svd.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['solver'] = 'full'
+        super().__init__(**kwargs)
+
+    def _svd(self, X, dims, func, kwargs):
+        return super()._svd(X, dims, _gram_svd, {'n_components': self.n_modes_precompute})
+
+
+class GramEOF(xeofs.single.EOF):
+    """
+    xeofs.single.EOF fitted through the Gram matrix of the data (solver='gram').
+
+    Suited to fields with far more grid points than time steps. Results, rotation and projection
+    behave exactly like those of xeofs.single.EOF.
+    """
+
+    def _fit_algorithm(self, X):
+        sample_name = self.sample_name
+        feature_name = self.feature_name
+
+        decomposer = _GramDecomposer(**self._decomposer_kwargs)
+        decomposer.fit(X, dims=(sample_name, feature_name))
+
+        scores = decomposer.U_ * decomposer.s_
+        scores.name = "scores"
+        exp_var = decomposer.s_**2 / (X.coords[sample_name].size - 1)
+        exp_var.name = "explained_variance"
+
+        self.data.add(X, "input_data", allow_compute=False)
+        self.data.add(decomposer.V_, "components")
+        self.data.add(scores, "scores")
+        self.data.add(decomposer.s_, "norms")
+        self.data.add(exp_var, "explained_variance")
+        self.data.add(total_variance(X, dim=sample_name), "total_variance")
+
+        self.data.set_attrs(self.attrs)
+        return self
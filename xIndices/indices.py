@@ -1,31 +1,80 @@
 # eof_calculations.py
 
+import functools
 import numpy as np
 from .utils import calculate_anomaly, compute_weights, compute_rotated_eofs
 import xarray as xr
-from .preprocess_data import load_data, rename_dims_to_standard, adjust_longitude, regridding, adjust_latitude
+from .preprocess_data import regridding
+from .session import IndexSession, _select_region
+from .eof_model import EOFModel
+from .results import desired_outputs
+from .compaction import CompactField
+from .significance import regression_significance, explained_variance_significance
+from .instrumentation import instrumented
 
 
 
-def calculate_global_mean_sst(data, lat_name='lat', lon_name='lon'):
+def _variance_significance_kwargs(significance_kwargs):
+    """
+    significance_kwargs without the options of regression_significance only: the variance
+    intervals always come from the block bootstrap, so they take no 'method'.
+    """
+    return {key: value for key, value in (significance_kwargs or {}).items() if key != 'method'}
+
+
+@instrumented
+def calculate_global_mean_sst(data, lat_name='lat', lon_name='lon', is_anomaly=False, mask=None):
     """
     Calculate the global mean sea surface temperature (SST) anomaly.
 
+    In-memory DataArrays are packed to their valid (ocean) points first (see CompactField), so
+    land points do not enter the weighted mean.
+
     Parameters:
     data (xarray.DataArray): Input data array containing SST values.
     lat_name (str, optional): Name of the latitude coordinate in the data array. Default is 'lat'.
     lon_name (str, optional): Name of the longitude coordinate in the data array. Default is 'lon'.
+    is_anomaly (bool, optional): If True, 'data' already holds anomalies and the climatology is not removed again. Default is False.
+    mask (xarray.DataArray, optional): Precomputed valid-point mask (see valid_mask). Default is to derive it from the data.
 
     Returns:
     xarray.DataArray: The global mean SST anomaly.
     """
-    return calculate_anomaly(data).weighted(compute_weights(data)).mean(dim=[lat_name, lon_name])
+    data_anom = data if is_anomaly else calculate_anomaly(data)
+    if isinstance(data_anom, xr.DataArray) and data_anom.chunks is None and 'time' in data_anom.dims \
+            and set(data_anom.dims) == {'time', lat_name, lon_name}:
+        return CompactField.pack(data_anom, mask=mask).weighted_mean(lat_name=lat_name)
+    return data_anom.weighted(compute_weights(data, lat_dim=lat_name)).mean(dim=[lat_name, lon_name])
+
+
+
+def _eof_model(solver, session, index, to_range, clim_start=None, clim_end=None, region=None, index_mode=1,
+    remove_global_mean=False):
+    """
+    Wrap a fitted solver into an EOFModel carrying the climatology and preprocessing metadata
+    needed to serve the index from raw fields.
+    """
+    climatology = _select_region(session.climatology(to_range, clim_start=clim_start, clim_end=clim_end), region)
+    global_mean_climatology = None
+    if remove_global_mean:
+        # The global mean SST is always taken from anomalies relative to the full period
+        global_mean_climatology = calculate_global_mean_sst(session.climatology(to_range), lat_name='lat',
+                                                            lon_name='lon', is_anomaly=True)
+    metadata = {
+        'index': index, 'region': region, 'to_range': to_range, 'clim_start': clim_start,
+        'clim_end': clim_end, 'freq': 'month', 'remove_global_mean': remove_global_mean,
+        'index_mode': index_mode,
+    }
+    return EOFModel.from_solver(solver, climatology=climatology, global_mean_climatology=global_mean_climatology,
+                                metadata=metadata)
 
 
 
+@instrumented
 def global_sst_trend_and_enso(data=None, path=None, var=None, clim_start=None, clim_end=None, desired=None, 
-    start_time=None, end_time=None, to_range='0_360', standardize=False, 
-    normalize_pattern=True, normalize_index=False):
+    start_time=None, end_time=None, to_range='0_360', standardize=False,
+    normalize_pattern=True, normalize_index=False, session=None, chunks=None,
+    solver='auto', solver_kwargs=None, random_state=None, significance_kwargs=None):
     """
     Calculate global SST warming trend and ENSO patterns using EOF analysis.
 
@@ -50,7 +99,12 @@ def global_sst_trend_and_enso(data=None, path=None, var=None, clim_start=None, c
         Desired outputs, which can include:
         ['sst_trend_pattern', 'sst_trend_timeseries', 'variance_fraction_trend', 
         'enso_pattern', 'enso_index', 'variance_fraction_enso']. 
-        Default is to return all.
+        Default is to return all. 'eof_model' additionally returns the fitted decomposition as an
+        EOFModel, e.g. to extend the indices with EOFModel.update. 'sst_trend_pattern_significance'
+        and 'enso_pattern_significance' return the regression of the anomalies on the index with its
+        p-value and confidence interval (see regression_significance); 'variance_fraction_trend_ci'
+        and 'variance_fraction_enso_ci' the bootstrap confidence interval of the variance fraction
+        (see explained_variance_significance).
     start_time : int, optional
         Start year for loading data.
     end_time : int, optional
@@ -63,10 +117,27 @@ def global_sst_trend_and_enso(data=None, path=None, var=None, clim_start=None, c
         Whether to normalize spatial components (patterns) with singular values.
     normalize_index : bool, optional, default False
         Whether to normalize time series (scores) with singular values.
+    session : IndexSession, optional
+        Shared preprocessing session. If given, 'data', 'path', 'var', 'start_time' and
+        'end_time' are ignored and the cached fields of the session are reused.
+    chunks : int, dict or 'auto', optional
+        Dask chunk sizes for loading from 'path' (see load_data). The computation then stays
+        lazy until the EOF fit.
+    solver : str, optional
+        EOF solver backend: 'auto' (default), 'full', 'randomized' or 'gram' (see compute_rotated_eofs).
+        'randomized' and 'gram' make global EOFs on high-resolution grids fast.
+    solver_kwargs : dict, optional
+        Options of the randomized solver, e.g. {'n_oversamples': 20, 'n_iter': 7}.
+    random_state : int, optional
+        Seed of the randomized solver.
+    significance_kwargs : dict, optional
+        Options of the significance outputs, e.g. {'n_surrogates': 1000, 'method': 'block', 'seed': 0}
+        (see regression_significance). The variance intervals take no 'method' and always use the
+        block bootstrap.
 
     Returns:
     -------
-    List containing the desired outputs: SST trend pattern, trend timeseries,
+    IndexResult (lazy, list-like) with the desired outputs: SST trend pattern, trend timeseries,
     variance fraction of the trend, ENSO pattern, ENSO index, and variance fraction of ENSO.
     """
 
@@ -78,52 +149,57 @@ def global_sst_trend_and_enso(data=None, path=None, var=None, clim_start=None, c
         ]
     
 
-    if data is not None:
-        data = adjust_latitude(adjust_longitude(rename_dims_to_standard(data.sel(time=slice(start_time, end_time))), to_range=to_range))
-    elif path and var:
-        data = adjust_longitude(
-            rename_dims_to_standard(
-                load_data(
-                    path, var, start_time=start_time, end_time=end_time
-                )
-            ),
-            to_range=to_range
-        )
-    else:
-        print("No valid data !!!")
-    
+    if session is None:
+        session = IndexSession(data=data, path=path, var=var, start_time=start_time, end_time=end_time,
+                               chunks=chunks)
+
 
-    data_anom = calculate_anomaly(data, clim_start=clim_start, clim_end=clim_end)
+    data_anom = session.anomaly(to_range, clim_start=clim_start, clim_end=clim_end)
 
 
     solver = compute_rotated_eofs(
-        data_anom, rotated=False, n_modes=2, standardize=standardize, use_coslat=True
+        data_anom, rotated=False, n_modes=2, standardize=standardize, use_coslat=True,
+        solver=solver, solver_kwargs=solver_kwargs, random_state=random_state
     )
     
 
-    eofs_ = solver.components(normalized=normalize_pattern)
-    pcs_ = solver.scores(normalized=normalize_index)
-    var_frac_ = solver.explained_variance_ratio()
-
-
-    result_dict = {
-        'sst_trend_pattern': eofs_[0].squeeze(),
-        'sst_trend_timeseries': (pcs_[0] / pcs_[0].std()).squeeze(),
-        'variance_fraction_trend': var_frac_[0].squeeze(),
-        'enso_pattern': eofs_[1].squeeze(),
-        'enso_index': (pcs_[1] / pcs_[1].std()).squeeze(),
-        'variance_fraction_enso': var_frac_[1].squeeze()
+    # Outputs are computed on first access only (see IndexResult)
+    eofs_ = functools.cache(lambda: solver.components(normalized=normalize_pattern))
+    pcs_ = functools.cache(lambda: solver.scores(normalized=normalize_index))
+    var_frac_ = functools.cache(solver.explained_variance_ratio)
+    variance_ci_ = functools.cache(lambda: explained_variance_significance(
+        data_anom, n_modes=2, standardize=standardize, use_coslat=True,
+        **_variance_significance_kwargs(significance_kwargs)))
+
+
+    outputs = {
+        'sst_trend_pattern': lambda: eofs_()[0].squeeze(),
+        'sst_trend_timeseries': lambda: (pcs_()[0] / pcs_()[0].std()).squeeze(),
+        'variance_fraction_trend': lambda: var_frac_()[0].squeeze(),
+        'enso_pattern': lambda: eofs_()[1].squeeze(),
+        'enso_index': lambda: (pcs_()[1] / pcs_()[1].std()).squeeze(),
+        'variance_fraction_enso': lambda: var_frac_()[1].squeeze(),
+        'eof_model': lambda: _eof_model(solver, session, 'sst_trend_and_enso', to_range, clim_start, clim_end,
+                                        index_mode=2),
+        'sst_trend_pattern_significance': lambda: regression_significance(
+            data_anom, outputs['sst_trend_timeseries'](), **(significance_kwargs or {})),
+        'variance_fraction_trend_ci': lambda: variance_ci_().sel(mode=1),
+        'enso_pattern_significance': lambda: regression_significance(
+            data_anom, outputs['enso_index'](), **(significance_kwargs or {})),
+        'variance_fraction_enso_ci': lambda: variance_ci_().sel(mode=2),
     }
 
-    return_desired = [result_dict[key] for key in desired if key in result_dict]
-    return return_desired[0] if len(return_desired) == 1 else return_desired
+    return desired_outputs(outputs, desired)
 
 
 
+@instrumented
 def compute_regional_eof_modes(data=None, path=None, var=None, clim_start=None, clim_end=None, desired=None, 
     start_time=None, end_time=None, lat_s=90, lat_e=-90, lon_s=0, lon_e=360, 
     to_range='0_360', n_modes=1, remove_trend=False, rotated=None, 
-    use_coslat=True, standardize=False, normalize_pattern=True, normalize_index=False):
+    use_coslat=True, standardize=False, normalize_pattern=True, normalize_index=False, session=None, chunks=None,
+    solver='auto', solver_kwargs=None, random_state=None, significance_kwargs=None, n_rotated=None,
+    initial_rotation=None):
     """
     Calculate regional EOF (Empirical Orthogonal Functions) modes from gridded SST data.
 
@@ -145,7 +221,11 @@ def compute_regional_eof_modes(data=None, path=None, var=None, clim_start=None,
         Climatology end year (if both None, the entire period is used for climatology).
     desired : list, optional
         Desired outputs, which can be ['regional_patterns', 'regional_timeseries', 
-        'variance_fractions_regional']. Default is all three.
+        'variance_fractions_regional']. Default is all three. 'eof_model' additionally returns
+        the fitted decomposition as an EOFModel. 'regional_patterns_significance' returns the
+        regression of the anomalies on the timeseries with p-values and confidence intervals (see
+        regression_significance); without rotation, 'variance_fractions_regional_ci' returns the
+        bootstrap confidence intervals of the variance fractions.
     start_time : int, optional
         Start year for loading data.
     end_time : int, optional
@@ -166,6 +246,8 @@ def compute_regional_eof_modes(data=None, path=None, var=None, clim_start=None,
         Whether to remove the global trend before calculating EOFs. Default is False.
     rotated : str, optional
         Whether to apply Varimax or Promax rotation to the EOFs. Default is False.
+        Rotations fit 10 unrotated modes, which are reused by later calls on the same anomalies
+        (see compute_rotated_eofs).
     use_coslat : bool, optional
         Whether to use cosine latitude weighting. Default is True.
     standardize : bool, optional
@@ -174,41 +256,46 @@ def compute_regional_eof_modes(data=None, path=None, var=None, clim_start=None,
         Whether to normalize spatial components (patterns) with singular values. Default is True.
     normalize_index : bool, optional
         Whether to normalize the time series (scores) with singular values. Default is False.
+    session : IndexSession, optional
+        Shared preprocessing session. If given, 'data', 'path', 'var', 'start_time' and
+        'end_time' are ignored and the cached fields of the session are reused.
+    chunks : int, dict or 'auto', optional
+        Dask chunk sizes for loading from 'path' (see load_data). The computation then stays
+        lazy until the EOF fit.
+    solver : str, optional
+        EOF solver backend: 'auto' (default), 'full', 'randomized' or 'gram' (see compute_rotated_eofs).
+        'randomized' and 'gram' make global EOFs on high-resolution grids fast.
+    solver_kwargs : dict, optional
+        Options of the randomized solver, e.g. {'n_oversamples': 20, 'n_iter': 7}.
+    random_state : int, optional
+        Seed of the randomized solver.
+    significance_kwargs : dict, optional
+        Options of the significance outputs, e.g. {'n_surrogates': 1000, 'method': 'block', 'seed': 0}
+        (see regression_significance). The variance intervals take no 'method' and always use the
+        block bootstrap.
+    n_rotated : int, optional
+        Number of leading modes rotated when 'rotated' is set. Default is all 10.
+    initial_rotation : xeofs.single.EOFRotator or numpy.ndarray, optional
+        Warm start of the rotation, e.g. a previously rotated solver (see compute_rotated_eofs).
 
     Returns:
     -------
-    List containing the desired outputs: regional patterns, timeseries, and/or variance fractions.
+    IndexResult (lazy, list-like) with the desired outputs: regional patterns, timeseries, and/or variance fractions.
     """
 
     if desired is None:
         desired = ['regional_patterns', 'regional_timeseries', 'variance_fractions_regional']
     
-    if data is not None:
-        if start_time!=None and end_time!=None:
-            data = adjust_latitude(adjust_longitude(rename_dims_to_standard(data.sel(time=slice(start_time, end_time))), to_range=to_range))
-        else:
-            data = adjust_latitude(adjust_longitude(rename_dims_to_standard(data), to_range=to_range))
-    elif path and var:
-        data = adjust_longitude(
-            rename_dims_to_standard(
-                load_data(
-                    path, var, start_time=start_time, end_time=end_time
-                )
-            ),
-            to_range=to_range
-        )
-    else:
-        print("No valid data !!!")
+    if session is None:
+        session = IndexSession(data=data, path=path, var=var, start_time=start_time, end_time=end_time,
+                               chunks=chunks)
 
 
 
-    
-
-    data_anom_1 = calculate_anomaly(data, clim_start=clim_start, clim_end=clim_end)
-    data_anom = data_anom_1.sel(lat=slice(lat_s, lat_e), lon=slice(lon_s, lon_e))
+    data_anom = session.anomaly(to_range, clim_start=clim_start, clim_end=clim_end, region=(lat_s, lat_e, lon_s, lon_e))
     if remove_trend:
-        global_mean_sst = calculate_global_mean_sst(data_anom_1, lat_name='lat', lon_name='lon')
-        data_anom -= global_mean_sst
+        # Not in place: the regional anomaly is shared through the session cache
+        data_anom = data_anom - session.global_mean_sst(to_range)
 
 
     if rotated is not None:
@@ -218,28 +305,44 @@ def compute_regional_eof_modes(data=None, path=None, var=None, clim_start=None,
 
     solver = compute_rotated_eofs(
         data_anom, rotated=rotated, n_modes=n_modes, 
-        standardize=standardize, use_coslat=use_coslat
+        standardize=standardize, use_coslat=use_coslat,
+        solver=solver, solver_kwargs=solver_kwargs, random_state=random_state,
+        n_rotated=n_rotated, initial_rotation=initial_rotation
     )
 
 
-    result_dict = {
-        'regional_patterns': solver.components(normalized=normalize_pattern).squeeze(),
-        'regional_timeseries': (solver.scores(normalized=normalize_index) / 
-                                solver.scores(normalized=normalize_index).std()).squeeze(),
-        'variance_fractions_regional': solver.explained_variance_ratio().squeeze()
+    def regional_timeseries():
+        scores = solver.scores(normalized=normalize_index)
+        return (scores / scores.std()).squeeze()
+
+
+    outputs = {
+        'regional_patterns': lambda: solver.components(normalized=normalize_pattern).squeeze(),
+        'regional_timeseries': regional_timeseries,
+        'variance_fractions_regional': lambda: solver.explained_variance_ratio().squeeze(),
+        'eof_model': lambda: _eof_model(solver, session, 'regional_eof_modes', to_range, clim_start, clim_end,
+                                        region=(lat_s, lat_e, lon_s, lon_e), remove_global_mean=remove_trend),
+        'regional_patterns_significance': lambda: regression_significance(
+            data_anom, regional_timeseries(), **(significance_kwargs or {})),
     }
+    if rotated is None:
+        # The bootstrap resamples the unrotated decomposition only
+        outputs['variance_fractions_regional_ci'] = lambda: explained_variance_significance(
+            data_anom, n_modes=n_modes, standardize=standardize, use_coslat=use_coslat,
+            **_variance_significance_kwargs(significance_kwargs)).squeeze()
 
 
-    return_desired = [result_dict[key] for key in desired if key in result_dict]
-    return return_desired[0] if len(return_desired) == 1 else return_desired
+    return desired_outputs(outputs, desired)
 
 
 
 
+@instrumented
 def compute_pdo(data=None, path=None, var=None, clim_start=None, clim_end=None, desired=None, 
     start_time=None, end_time=None, to_range='0_360', standardize=False, 
     normalize_pattern=True, normalize_index=False, lat_s=70, lat_e=20, lon_s=110, 
-    lon_e=260, remove_trend=False):
+    lon_e=260, remove_trend=False, session=None, chunks=None,
+    solver='auto', solver_kwargs=None, random_state=None, significance_kwargs=None):
     """
     Calculate the PDO (Pacific Decadal Oscillation) index and pattern.
 
@@ -261,8 +364,11 @@ def compute_pdo(data=None, path=None, var=None, clim_start=None, clim_end=None,
     clim_end : int, optional
         Climatology end year (if both None, whole period will be chosen for climatology).
     desired : list, optional
-        Desired outputs, which can be ['pdo_pattern', 'pdo_index', 'variance_fraction_pdo']. 
-        Default is all three.
+        Desired outputs, which can be ['pdo_pattern', 'pdo_index', 'variance_fraction_pdo', 'eof_model', 
+        'pdo_pattern_significance', 'variance_fraction_pdo_ci']. Default is the first three. 
+        'pdo_pattern_significance' is the regression of the anomalies on the PDO index with its p-value 
+        and confidence interval (see regression_significance), 'variance_fraction_pdo_ci' the bootstrap 
+        confidence interval of the variance fraction (see explained_variance_significance).
     start_time : int, optional
         Start year for loading data.
     end_time : int, optional
@@ -276,12 +382,29 @@ def compute_pdo(data=None, path=None, var=None, clim_start=None, clim_end=None,
     normalize_index : bool, optional
         Whether to normalize the time series (scores) with singular values. Default is False.
     remove_trend : bool, optional
-        Whether to remove the global trend. Default is False, in which case mode 2 is used. 
+        Whether to remove the global trend. Default is False, in which case mode 2 is used.
         If True, mode 1 is used.
+    session : IndexSession, optional
+        Shared preprocessing session. If given, 'data', 'path', 'var', 'start_time' and
+        'end_time' are ignored and the cached fields of the session are reused.
+    chunks : int, dict or 'auto', optional
+        Dask chunk sizes for loading from 'path' (see load_data). The computation then stays
+        lazy until the EOF fit.
+    solver : str, optional
+        EOF solver backend: 'auto' (default), 'full', 'randomized' or 'gram' (see compute_rotated_eofs).
+        'randomized' and 'gram' make global EOFs on high-resolution grids fast.
+    solver_kwargs : dict, optional
+        Options of the randomized solver, e.g. {'n_oversamples': 20, 'n_iter': 7}.
+    random_state : int, optional
+        Seed of the randomized solver.
+    significance_kwargs : dict, optional
+        Options of the significance outputs, e.g. {'n_surrogates': 1000, 'method': 'block', 'seed': 0}
+        (see regression_significance). The variance intervals take no 'method' and always use the
+        block bootstrap.
 
     Returns:
     -------
-    List containing the desired outputs: PDO pattern, PDO index, and/or variance fraction.
+    IndexResult (lazy, list-like) with the desired outputs: PDO pattern, PDO index, and/or variance fraction.
     """
 
     if desired is None:
@@ -291,55 +414,53 @@ def compute_pdo(data=None, path=None, var=None, clim_start=None, clim_end=None,
     n_modes = 1 if remove_trend else 2
     
 
-    if data is not None:
-        if start_time!=None and end_time!=None:
-            data = adjust_latitude(adjust_longitude(rename_dims_to_standard(data.sel(time=slice(start_time, end_time))), to_range=to_range))
-        else:
-            data = adjust_latitude(adjust_longitude(rename_dims_to_standard(data), to_range=to_range))
-    elif path and var:
-        data = adjust_longitude(
-            rename_dims_to_standard(
-                load_data(
-                    path, var, start_time=start_time, end_time=end_time
-                )
-            ),
-            to_range=to_range
-        )
-    else:
-        print("No valid data !!!")
-
+    if session is None:
+        session = IndexSession(data=data, path=path, var=var, start_time=start_time, end_time=end_time,
+                               chunks=chunks)
 
-    data_anomaly = calculate_anomaly(data)
-    data_pdo = data_anomaly.sel(lat=slice(lat_s, lat_e), lon=slice(lon_s, lon_e))
-    
 
+    region = (lat_s, lat_e, lon_s, lon_e)
     if remove_trend:
-        data_pdo_anomaly = data_pdo - calculate_global_mean_sst(data_anomaly, lat_name='lat', lon_name='lon')
+        data_pdo_anomaly = session.anomaly(to_range, region=region) - session.global_mean_sst(to_range)
     else:
-        data_pdo_anomaly = calculate_anomaly(data_pdo, clim_start=clim_start, clim_end=clim_end)
-    
+        data_pdo_anomaly = session.anomaly(to_range, clim_start=clim_start, clim_end=clim_end, region=region)
+
 
     solver = compute_rotated_eofs(
         data_pdo_anomaly, rotated=False, n_modes=n_modes, 
-        standardize=standardize, use_coslat=True
+        standardize=standardize, use_coslat=True,
+        solver=solver, solver_kwargs=solver_kwargs, random_state=random_state
     )
     
 
-    result_dict = {
-        'pdo_pattern': solver.components()[n_modes - 1].squeeze(),
-        'pdo_index': (solver.scores()[n_modes - 1] / solver.scores()[n_modes - 1].std()).squeeze(),
-        'variance_fraction_pdo': solver.explained_variance_ratio()[n_modes - 1].squeeze()
+    def pdo_index():
+        scores = solver.scores()[n_modes - 1]
+        return (scores / scores.std()).squeeze()
+
+
+    base = (None, None) if remove_trend else (clim_start, clim_end)
+    outputs = {
+        'pdo_pattern': lambda: solver.components()[n_modes - 1].squeeze(),
+        'pdo_index': pdo_index,
+        'variance_fraction_pdo': lambda: solver.explained_variance_ratio()[n_modes - 1].squeeze(),
+        'eof_model': lambda: _eof_model(solver, session, 'pdo', to_range, *base, region=region,
+                                        index_mode=n_modes, remove_global_mean=remove_trend),
+        'pdo_pattern_significance': lambda: regression_significance(
+            data_pdo_anomaly, pdo_index(), **(significance_kwargs or {})),
+        'variance_fraction_pdo_ci': lambda: explained_variance_significance(
+            data_pdo_anomaly, n_modes=n_modes, standardize=standardize, use_coslat=True,
+            **_variance_significance_kwargs(significance_kwargs)).sel(mode=n_modes),
     }
     
 
-    return_desired = [result_dict[key] for key in desired if key in result_dict]
-    return return_desired[0] if len(return_desired) == 1 else return_desired
+    return desired_outputs(outputs, desired)
 
 
 
+@instrumented
 def compute_amo(data=None, path=None, var=None, clim_start=None, clim_end=None, desired=None, 
-    start_time=None, end_time=None, lat_s=70, lat_e=0, lon_s=280, lon_e=360, 
-    to_range='0_360'):
+    start_time=None, end_time=None, lat_s=70, lat_e=0, lon_s=280, lon_e=360,
+    to_range='0_360', session=None, chunks=None, significance_kwargs=None):
     """
     Calculate the AMO (Atlantic Multidecadal Oscillation) index and pattern.
 
@@ -366,7 +487,9 @@ def compute_amo(data=None, path=None, var=None, clim_start=None, clim_end=None,
     clim_end : int, optional
         Climatology end year (if both None, whole period will be chosen for climatology).
     desired : list, optional
-        Desired outputs, which can be ['amo_pattern', 'amo_index']. Default is both.
+        Desired outputs, which can be ['amo_pattern', 'amo_index', 'amo_pattern_significance']. 
+        Default is the first two. 'amo_pattern_significance' holds the p-value and confidence 
+        interval of every point of the AMO pattern (see regression_significance).
     lat_s : float, optional
         Start latitude for the region. Default is 70 (North).
     lat_e : float, optional
@@ -377,71 +500,83 @@ def compute_amo(data=None, path=None, var=None, clim_start=None, clim_end=None,
         End longitude for the region. Default is 360.
     to_range : str, optional
         Target longitude range. Default is '0_360'. Use '-180_180' if needed.
+    session : IndexSession, optional
+        Shared preprocessing session. If given, 'data', 'path', 'var', 'start_time' and
+        'end_time' are ignored and the cached fields of the session are reused.
+    chunks : int, dict or 'auto', optional
+        Dask chunk sizes for loading from 'path' (see load_data). The computation then stays
+        lazy until the EOF fit.
+    significance_kwargs : dict, optional
+        Options of the significance outputs, e.g. {'n_surrogates': 1000, 'method': 'block', 'seed': 0}
+        (see regression_significance).
 
     Returns:
     -------
-    List containing the desired outputs: AMO pattern and/or AMO index.
+    IndexResult (lazy, list-like) with the desired outputs: AMO pattern and/or AMO index.
     """
 
     if desired is None:
         desired = ['amo_pattern', 'amo_index']
 
 
-    if data is not None:
-        if start_time!=None and end_time!=None:
-            data = adjust_latitude(adjust_longitude(rename_dims_to_standard(data.sel(time=slice(start_time, end_time))), to_range=to_range))
-        else:
-            data = adjust_latitude(adjust_longitude(rename_dims_to_standard(data), to_range=to_range))
-    elif path and var:
-        data = adjust_longitude(
-            rename_dims_to_standard(
-                load_data(
-                    path, var, start_time=start_time, end_time=end_time
-                )
-            ),
-            to_range=to_range
-        )
-    else:
-        print("No valid data !!!")
+    if session is None:
+        session = IndexSession(data=data, path=path, var=var, start_time=start_time, end_time=end_time,
+                               chunks=chunks)
 
 
-    north_atlantic_sst = data.sel(lat=slice(lat_s, lat_e), lon=slice(lon_s, lon_e))
-    
+    # Nothing is computed before an output is requested; in-memory input takes the packed path
+    in_memory = session.standardized(to_range).chunks is None
 
-    data_anomalies = calculate_anomaly(
-        north_atlantic_sst, clim_start=clim_start, clim_end=clim_end
-    )
-    
 
-    global_mean_data = calculate_global_mean_sst(data, lat_name='lat', lon_name='lon')
+    @functools.cache
+    def amo_index():
+        global_mean_data = session.global_mean_sst(to_range)
+        if in_memory:
+            regional_mean = session.compact(to_range, clim_start=clim_start, clim_end=clim_end,
+                                            region=(lat_s, lat_e, lon_s, lon_e)).weighted_mean()
+        else:
+            data_anomalies = session.anomaly(to_range, clim_start=clim_start, clim_end=clim_end,
+                                             region=(lat_s, lat_e, lon_s, lon_e))
+            regional_mean = data_anomalies.weighted(compute_weights(data_anomalies)).mean(('lat', 'lon'))
+        return regional_mean - global_mean_data
     
 
-    amo_index = (
-        data_anomalies.weighted(compute_weights(data_anomalies)).mean(('lat', 'lon')) 
-        - global_mean_data
-    )
+    # The full-globe covariance map is only computed when the pattern is requested,
+    # on the ocean points only when the anomalies are held in memory
+    def amo_pattern():
+        if in_memory:
+            covariance = session.compact(to_range).covariance(amo_index())
+        else:
+            covariance = xr.cov(session.anomaly(to_range), amo_index(), dim='time')
+        return covariance / amo_index().var()
     
 
-    amo_pattern = (
-        xr.cov(calculate_anomaly(data), amo_index, dim='time') 
-        / amo_index.var()
-    )
-    
+    def amo_pattern_significance():
+        # Shares the packed anomaly of the session with amo_pattern
+        result = regression_significance(session.compact(to_range), amo_index(), **(significance_kwargs or {}))
+        # amo_pattern divides the covariance by the population variance of the index
+        n_time = int(amo_index().count())
+        return result.assign({name: result[name] * n_time / (n_time - 1)
+                              for name in ('regression', 'ci_lower', 'ci_upper')})
+
 
-    result_dict = {
+    outputs = {
         'amo_pattern': amo_pattern,
-        'amo_index': amo_index
+        'amo_index': amo_index,
+        'amo_pattern_significance': amo_pattern_significance,
     }
     
 
-    return_desired = [result_dict[key] for key in desired if key in result_dict]
-    return return_desired[0] if len(return_desired) == 1 else return_desired
+    return desired_outputs(outputs, desired)
 
 
 
+@instrumented
 def compute_nao(data=None, path=None, var=None, clim_start=None, clim_end=None, desired=None, \
     lat_s=None, lat_e=None, use_coslat=None, standardize=None, to_range=None, n_modes=10, nao_mode=None, \
-    start_time=None, end_time=None, rotated='Varimax'):
+    start_time=None, end_time=None, rotated='Varimax', session=None, chunks=None,
+    solver='auto', solver_kwargs=None, random_state=None, significance_kwargs=None, n_rotated=None,
+    initial_rotation=None):
     '''
     This function calculates the NAO index, NAO pattern, and variance fraction.
     It is calculated as the second EOF mode of 500mb geopotential height 
@@ -465,6 +600,9 @@ def compute_nao(data=None, path=None, var=None, clim_start=None, clim_end=None,
     
     - desired : list, optional
         List of desired outputs, e.g., ['nao_pattern', 'nao_index', 'variance_fraction_nao'].
+        'eof_model' returns the fitted (rotated) decomposition as an EOFModel.
+        'nao_pattern_significance' returns the regression of the anomalies on the NAO index with
+        its p-value and confidence interval (see regression_significance).
     
     - lat_s : float, optional
         Start latitude for selecting the northern region.
@@ -489,6 +627,34 @@ def compute_nao(data=None, path=None, var=None, clim_start=None, clim_end=None,
     
     - rotated : str, optional
         Rotation method for EOFs. Options: None, 'Varimax', 'Promax'. Default is 'Varimax'.
+        The unrotated fit is reused by later calls on the same anomalies, so trying other
+        rotations costs no new SVD (see compute_rotated_eofs).
+
+    - n_rotated : int, optional
+        Number of leading modes to rotate. Default is n_modes.
+
+    - initial_rotation : xeofs.single.EOFRotator or numpy.ndarray, optional
+        Warm start of the rotation, e.g. a previously rotated solution (see compute_rotated_eofs).
+
+    - session : IndexSession, optional
+        Shared preprocessing session. If given, 'data', 'path', 'var', 'start_time' and
+        'end_time' are ignored and the cached fields of the session are reused.
+
+    - chunks : int, dict or 'auto', optional
+        Dask chunk sizes for loading from 'path' (see load_data). The computation then stays
+        lazy until the EOF fit.
+
+    - solver : str, optional
+        EOF solver backend: 'auto' (default), 'full', 'randomized' or 'gram' (see compute_rotated_eofs).
+
+    - solver_kwargs : dict, optional
+        Options of the randomized solver, e.g. {'n_oversamples': 20, 'n_iter': 7}.
+
+    - random_state : int, optional
+        Seed of the randomized solver.
+
+    - significance_kwargs : dict, optional
+        Options of 'nao_pattern_significance', e.g. {'n_surrogates': 1000, 'seed': 0} (see regression_significance).
     '''
     
 
@@ -500,49 +666,115 @@ def compute_nao(data=None, path=None, var=None, clim_start=None, clim_end=None,
     nao_mode = nao_mode if nao_mode is not None else 1
 
 
-    if data is not None:
-        if start_time!=None and end_time!=None:
-            data = adjust_latitude(adjust_longitude(rename_dims_to_standard(data.sel(time=slice(start_time, end_time))), to_range=to_range))
-        else:
-            data = adjust_latitude(adjust_longitude(rename_dims_to_standard(data), to_range=to_range))
-    elif path and var:
-        data = adjust_longitude(
-            rename_dims_to_standard(
-                load_data(
-                    path, var, start_time=start_time, end_time=end_time
-                )
-            ),
-            to_range=to_range
-        )
-    else:
-        print("No valid data !!!")
+    if session is None:
+        session = IndexSession(data=data, path=path, var=var, start_time=start_time, end_time=end_time,
+                               chunks=chunks)
 
 
-    if data is None:
-        raise ValueError("Data must be provided either directly or via path and var.")
-
-    north_geop = data.sel(lat=slice(lat_s, lat_e))
-    
+    data_anomalies = session.anomaly(to_range, clim_start=clim_start, clim_end=clim_end, region=(lat_s, lat_e, None, None))
 
-    data_anomalies = calculate_anomaly(north_geop, clim_start=clim_start, clim_end=clim_end)
-    
 
     eofs_result = compute_rotated_eofs(
         data_anomalies, rotated=rotated, n_modes=n_modes, 
-        standardize=standardize, use_coslat=use_coslat
+        standardize=standardize, use_coslat=use_coslat,
+        solver=solver, solver_kwargs=solver_kwargs, random_state=random_state,
+        n_rotated=n_rotated, initial_rotation=initial_rotation
     )
 
 
-    nao_index = eofs_result.scores()[nao_mode-1] / eofs_result.scores()[nao_mode-1].std()
-    nao_pattern = eofs_result.components()[nao_mode-1]
-    variance_fraction_nao = eofs_result.explained_variance_ratio()[nao_mode-1]
+    def nao_index():
+        scores = eofs_result.scores()[nao_mode-1]
+        return (scores / scores.std()).squeeze()
     
-    result_dict = {
-        'nao_pattern': nao_pattern.squeeze(),
-        'nao_index': nao_index.squeeze(),
-        'variance_fraction_nao': variance_fraction_nao.squeeze(),
+    outputs = {
+        'nao_pattern': lambda: eofs_result.components()[nao_mode-1].squeeze(),
+        'nao_index': nao_index,
+        'variance_fraction_nao': lambda: eofs_result.explained_variance_ratio()[nao_mode-1].squeeze(),
+        'eof_model': lambda: _eof_model(eofs_result, session, 'nao', to_range, clim_start, clim_end,
+                                        region=(lat_s, lat_e, None, None), index_mode=nao_mode),
+        'nao_pattern_significance': lambda: regression_significance(
+            data_anomalies, nao_index(), **(significance_kwargs or {})),
     }
     
 
-    return_desired = [result_dict[key] for key in desired if key in result_dict]
-    return return_desired[0] if len(return_desired) == 1 else return_desired
\ No newline at end of file
+    return desired_outputs(outputs, desired)
+
+
+INDEX_FUNCTIONS = {
+    'sst_trend_and_enso': global_sst_trend_and_enso,
+    'regional_eof_modes': compute_regional_eof_modes,
+    'pdo': compute_pdo,
+    'amo': compute_amo,
+    'nao': compute_nao,
+}
+
+
+
+@instrumented
+def compute_indices(specs, data=None, path=None, var=None, start_time=None, end_time=None, 
+    session=None, max_bytes=None, chunks=None):
+    """
+    Compute several indices from one input field in a single job.
+
+    The input is loaded and standardized once, and every index shares the cached anomaly 
+    fields and global mean SST series of one IndexSession. Each EOF problem is still fitted 
+    on its own regional subset.
+
+    Parameters:
+    ----------
+    specs : list of str or dict
+        Indices to compute. A string names an entry of INDEX_FUNCTIONS ('sst_trend_and_enso', 
+        'regional_eof_modes', 'pdo', 'amo', 'nao'). A dict must hold the key 'index' with such 
+        a name, an optional 'name' under which the result is returned (needed when the same 
+        index is requested twice), and any keyword arguments of the index function, 
+        e.g. {'index': 'pdo', 'clim_start': 1981, 'clim_end': 2010, 'desired': ['pdo_index']}.
+    data : xarray.DataArray or xarray.Dataset, optional
+        Gridded data with dimensions (time, lat, lon).
+    path : str, optional
+        Path to the data. Used together with 'var' if 'data' is not provided.
+    var : str, optional
+        Name of the variable to load from the dataset.
+    start_time : int, optional
+        Start year for loading data.
+    end_time : int, optional
+        End year for loading data.
+    session : IndexSession, optional
+        Existing session to reuse. If given, 'data', 'path', 'var', 'start_time', 'end_time' 
+        and 'max_bytes' are ignored, and its share_anomaly setting is kept.
+    max_bytes : int, optional
+        Memory bound of the cache of the session created for this call. Fields larger than
+        the bound are not shared (each index recomputes its anomaly).
+    chunks : int, dict or 'auto', optional
+        Dask chunk sizes for loading from 'path' (see load_data).
+
+    Returns:
+    -------
+    dict
+        Mapping from index name to the output of the corresponding index function.
+
+    Examples:
+    --------
+    >>> bundle = compute_indices(
+    ...     ['sst_trend_and_enso', 'pdo', 'amo'], path='sst.mnmean.nc', var='sst')
+    >>> pdo_pattern, pdo_index, variance_fraction_pdo = bundle['pdo']
+    """
+
+    requests = []
+    for spec in specs:
+        spec = {'index': spec} if isinstance(spec, str) else dict(spec)
+        index = spec.pop('index', None)
+        if index not in INDEX_FUNCTIONS:
+            raise ValueError(f"Unknown index {index!r}. Choose from {list(INDEX_FUNCTIONS)}.")
+        name = spec.pop('name', index)
+        if any(name == other for other, _, _ in requests):
+            raise ValueError(f"Duplicate index name {name!r}. Give each spec a unique 'name'.")
+        requests.append((name, index, spec))
+
+    if session is None:
+        # With several indices, the regional anomalies become cuts of one global anomaly field,
+        # computed when the first index needs it
+        session = IndexSession(data=data, path=path, var=var, start_time=start_time,
+                               end_time=end_time, max_bytes=max_bytes, chunks=chunks,
+                               share_anomaly=len(requests) > 1)
+
+    return {name: INDEX_FUNCTIONS[index](session=session, **kwargs) for name, index, kwargs in requests}
@@ -0,0 +1,344 @@
+# instrumentation.py
+
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import numbers
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Enables instrumentation at import time: 'log' for a LoggingSink, anything else is a JSON-lines path
+ENVIRONMENT_VARIABLE = 'XINDICES_INSTRUMENTATION'
+
+# Active sinks; instrumentation is disabled while the list is empty
+_SINKS = []
+
+# Path of the enclosing stages, e.g. ('compute_pdo', 'compute_rotated_eofs')
+_PATH = contextvars.ContextVar('xindices_stage_path', default=())
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _rss():
+    """Current resident set size in bytes, or None where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _peak_rss():
+    """High-water mark of the resident set size of the process in bytes, or None."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _describe(value):
+    """Size, shape and dtype of an array-like value; empty for anything else."""
+    nbytes = getattr(value, 'nbytes', None)
+    if not isinstance(nbytes, numbers.Integral):
+        return {}
+    info = {'nbytes': int(nbytes)}
+    shape = getattr(value, 'shape', None)
+    if shape is not None:
+        info['shape'] = list(shape)
+    dtype = getattr(value, 'dtype', None)
+    if dtype is not None:
+        info['dtype'] = str(dtype)
+    info['lazy'] = bool(getattr(value, 'chunks', None))
+    return info
+
+
+class _Stage:
+    """An active stage: measures on entry and emits one event to every sink on exit."""
+
+    def __init__(self, name, data=None, parent=None, **fields):
+        self.name = name
+        self.parent = parent
+        self.fields = fields
+        self.fields.update({f'input_{key}': value for key, value in _describe(data).items()})
+        self._token = None
+
+
+    def set_output(self, value):
+        """Record the size of the value produced by the stage."""
+        self.fields.update({f'output_{key}': item for key, item in _describe(value).items()})
+        return value
+
+
+    def __enter__(self):
+        parent = _PATH.get() if self.parent is None else tuple(self.parent)
+        self.path = parent + (self.name,)
+        self._token = _PATH.set(self.path)
+        self._rss = _rss()
+        self._peak = _peak_rss()
+        self._start = time.time()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        _PATH.reset(self._token)
+        rss, peak = _rss(), _peak_rss()
+        event = {
+            'stage': self.name,
+            'path': '/'.join(self.path),
+            'depth': len(self.path) - 1,
+            'start': self._start,
+            'wall_time': wall,
+            'cpu_time': cpu,
+            'rss': rss,
+            'rss_change': None if rss is None or self._rss is None else rss - self._rss,
+            'peak_rss': peak,
+            'peak_rss_increase': None if peak is None else peak - self._peak,
+            'pid': os.getpid(),
+            'error': None if exc_type is None else exc_type.__name__,
+        }
+        event.update(self.fields)
+        _emit(event)
+        return False
+
+
+class _NullStage:
+    """Stand-in returned by stage() while instrumentation is disabled."""
+
+    def set_output(self, value):
+        return value
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def _emit(event):
+    for sink in list(_SINKS):
+        try:
+            if hasattr(sink, 'emit'):
+                sink.emit(event)
+            else:
+                sink(event)
+        except Exception as e:
+            print(f"Error in instrumentation sink {sink!r}: {e}")
+
+
+def stage(name, data=None, parent=None, **fields):
+    """
+    Context manager timing one stage of a computation.
+
+    On exit one event is sent to every active sink, with the wall and CPU time, the resident
+    set size (current and high-water mark, with their changes over the stage), the size of
+    'data' and of the value passed to set_output, and the path of the enclosing stages. While
+    instrumentation is disabled a shared no-op object is returned.
+
+    Parameters:
+    name (str): Name of the stage, e.g. 'rotation'.
+    data (optional): Input of the stage; its nbytes, shape and dtype are recorded if it has them.
+    parent (tuple of str, optional): Path of the enclosing stages. Default is the current path.
+    **fields: Extra JSON-serializable fields added to the event.
+
+    Examples:
+    >>> with stage('rotation', data=anomaly) as s:
+    ...     model = s.set_output(rotator.fit(model))
+    """
+    if not _SINKS:
+        return _NULL_STAGE
+    return _Stage(name, data=data, parent=parent, **fields)
+
+
+def current_path():
+    """Path (tuple of stage names) of the stages enclosing the caller."""
+    return _PATH.get()
+
+
+def instrumented(func=None, *, name=None):
+    """
+    Decorator recording every call of a function as a stage (see stage).
+
+    The first positional argument (or 'data') is described as the input and the return value as
+    the output. When instrumentation is disabled the wrapper only checks whether a sink is
+    active before calling the function.
+
+    Parameters:
+    func (callable): Function to wrap. The decorator can also be used as @instrumented(name=...).
+    name (str, optional): Stage name. Default is the name of the function.
+    """
+    if func is None:
+        return functools.partial(instrumented, name=name)
+    stage_name = name or func.__name__
+    module = func.__module__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _SINKS:
+            return func(*args, **kwargs)
+        data = args[0] if args else kwargs.get('data')
+        with _Stage(stage_name, data=data, module=module) as record:
+            return record.set_output(func(*args, **kwargs))
+
+    return wrapper
+
+
+class MemorySink:
+    """
+    Keep events in memory, e.g. to inspect one run in a notebook.
+
+    Examples:
+    >>> sink = MemorySink()
+    >>> with profile_stages(sink):
+    ...     compute_pdo(data=sst)
+    >>> sink.to_dataframe().sort_values('wall_time', ascending=False).head()
+    """
+
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def clear(self):
+        with self._lock:
+            self.events.clear()
+
+    def to_dataframe(self):
+        """Events as a pandas.DataFrame, one row per stage in the order they finished."""
+        import pandas as pd
+        return pd.DataFrame(self.events)
+
+    def summary(self, by='stage'):
+        """Total wall and CPU time, number of calls and largest peak RSS increase per stage."""
+        frame = self.to_dataframe()
+        if frame.empty:
+            return frame
+        return frame.groupby(by).agg(calls=('wall_time', 'size'), wall_time=('wall_time', 'sum'),
+                                     cpu_time=('cpu_time', 'sum'),
+                                     peak_rss_increase=('peak_rss_increase', 'max'),
+                                     ).sort_values('wall_time', ascending=False)
+
+
+class JSONLinesSink:
+    """
+    Append every event as one JSON line to a file. Several processes may share the file.
+
+    Parameters:
+    path (str): Output file, created if needed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        line = json.dumps(event, default=str) + '\n'
+        with self._lock, open(self.path, 'a') as f:
+            f.write(line)
+
+    def __repr__(self):
+        return f"JSONLinesSink({self.path!r})"
+
+
+class LoggingSink:
+    """
+    Log every event through the logging module; the event dict is attached as 'xindices_event'.
+
+    Parameters:
+    logger (logging.Logger or str, optional): Logger or its name. Default is 'xIndices.instrumentation'.
+    level (int, optional): Log level. Default is logging.INFO.
+    """
+
+    def __init__(self, logger='xIndices.instrumentation', level=logging.INFO):
+        self.logger = logging.getLogger(logger) if isinstance(logger, str) else logger
+        self.level = level
+
+    def emit(self, event):
+        if not self.logger.isEnabledFor(self.level):
+            return
+        memory = '' if event['peak_rss'] is None else f", peak RSS {event['peak_rss'] / 1024**2:.0f} MiB"
+        size = '' if 'input_nbytes' not in event else f", input {event['input_nbytes'] / 1024**2:.1f} MiB"
+        self.logger.log(self.level, "%s: %.3f s wall, %.3f s CPU%s%s", event['path'], event['wall_time'],
+                        event['cpu_time'], memory, size, extra={'xindices_event': event})
+
+
+def enable_instrumentation(*sinks):
+    """
+    Start sending stage events to the given sinks (in addition to any active ones).
+
+    Parameters:
+    *sinks: Objects with an emit(event) method (MemorySink, JSONLinesSink, LoggingSink) or
+            plain callables taking the event dict. Default is a LoggingSink.
+
+    Returns:
+    tuple: The added sinks.
+    """
+    sinks = sinks or (LoggingSink(),)
+    _SINKS.extend(sinks)
+    return sinks
+
+
+def disable_instrumentation(*sinks):
+    """Stop sending events to the given sinks, or to every sink if none is given."""
+    if not sinks:
+        _SINKS.clear()
+    for sink in sinks:
+        if sink in _SINKS:
+            _SINKS.remove(sink)
+
+
+def is_instrumentation_enabled():
+    """Whether at least one sink is active."""
+    return bool(_SINKS)
+
+
+@contextlib.contextmanager
+def profile_stages(*sinks):
+    """
+    Enable instrumentation for a block of code.
+
+    Parameters:
+    *sinks: As for enable_instrumentation. Default is a new MemorySink.
+
+    Yields:
+    The sink, or the tuple of sinks if several are given.
+
+    Examples:
+    >>> with profile_stages() as sink:
+    ...     nao = compute_nao(path='slp.nc', var='slp')
+    >>> sink.summary()
+    """
+    sinks = sinks or (MemorySink(),)
+    enable_instrumentation(*sinks)
+    try:
+        yield sinks[0] if len(sinks) == 1 else sinks
+    finally:
+        disable_instrumentation(*sinks)
+
+
+def _from_environment():
+    target = os.environ.get(ENVIRONMENT_VARIABLE)
+    if target:
+        enable_instrumentation(LoggingSink() if target == 'log' else JSONLinesSink(target))
+
+
+_from_environment()
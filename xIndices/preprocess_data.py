@@ -1,10 +1,16 @@
 #preprocess_data.py
 
+import hashlib
+import os
+from collections import OrderedDict
+
 import xarray as xr
-import xesmf as xe
 import numpy as np
 
+from .instrumentation import instrumented
+
 
+@instrumented
 def rename_dims_to_standard(ds):
     """
     Rename the dimensions of an xarray Dataset to standard names ('lon', 'lat', 'time') based on their units.
@@ -51,6 +57,7 @@ def rename_dims_to_standard(ds):
     return ds
 
 
+@instrumented
 def adjust_latitude(ds, lat_name='lat'):
     """
     Adjusts the latitude coordinates of an xarray Dataset to be in descending order.
@@ -66,6 +73,7 @@ def adjust_latitude(ds, lat_name='lat'):
     return ds.sortby(lat_name, ascending=False)
 
 
+@instrumented
 def adjust_longitude(ds, lon_name='lon', to_range='0_360'):
     """
     Adjusts the longitude values in the given dataset to the specified range.
@@ -101,14 +109,21 @@ def adjust_longitude(ds, lon_name='lon', to_range='0_360'):
 
 
 
-def load_data(path, var=None, start_time=None, end_time=None, lat_s=None, lat_e=None, lon_s=None, lon_e=None):
+@instrumented
+def load_data(path, var=None, start_time=None, end_time=None, lat_s=None, lat_e=None, lon_s=None, lon_e=None,
+    chunks=None, parallel=False):
     """
     Load variables from NetCDF files as xarray.DataArray or Dataset.
+
+    A single file is opened without dask as before. Passing 'chunks', a list of files or a glob 
+    pattern switches to the lazy, dask-backed mode: files are opened with open_mfdataset and 
+    the time/lat/lon selection is applied to each file before anything is read, so memory 
+    scales with the chunk size rather than with the archive size.
     
     Parameters:
     -----------
-    path : str
-        Path to the NetCDF file.
+    path : str or list of str
+        Path to the NetCDF file, a glob pattern (e.g. 'sst_*.nc') or a list of files.
     var : str, optional
         Variable name to extract from the file. If None, the entire dataset is returned.
     start_time : str, optional
@@ -123,6 +138,11 @@ def load_data(path, var=None, start_time=None, end_time=None, lat_s=None, lat_e=
         Start longitude for spatial selection. If None, the full longitude range is selected.
     lon_e : float, optional
         End longitude for spatial selection. If None, the full longitude range is selected.
+    chunks : int, dict or 'auto', optional
+        Dask chunk sizes, e.g. {'time': 120, 'lat': -1, 'lon': -1}. If None and several files 
+        are given, every file becomes one chunk.
+    parallel : bool, optional
+        Open and preprocess the files in parallel with dask.delayed. Default is False.
 
     Returns:
     --------
@@ -131,18 +151,12 @@ def load_data(path, var=None, start_time=None, end_time=None, lat_s=None, lat_e=
     """
     
 
-    ds = rename_dims_to_standard(xr.open_dataset(path))
-    
-
-    if var:
-        ds = ds[var]
-    
-
+    time_selection = {}
     selection = {}
 
 
     if start_time and end_time:
-        selection['time'] = slice(f'{start_time}-01-01', f'{end_time}-12-31')
+        time_selection['time'] = slice(f'{start_time}-01-01', f'{end_time}-12-31')
 
 
     if lat_s is not None and lat_e is not None:
@@ -153,33 +167,349 @@ def load_data(path, var=None, start_time=None, end_time=None, lat_s=None, lat_e=
         selection['lon'] = slice(lon_s, lon_e)
 
 
-    if selection:
-        ds = ds.sel(**selection)
+    def _select(ds):
+        ds = rename_dims_to_standard(ds)
+        if var:
+            ds = ds[[var]]
+        return ds.sel(**selection) if selection else ds
+
+
+    multi_file = not isinstance(path, str) or any(char in path for char in '*?[')
+
+    if multi_file:
+        # Spatial subsetting happens per file; files outside the time window would come out
+        # empty, so the time selection is applied to the (still lazy) combined dataset.
+        ds = xr.open_mfdataset(path, chunks=chunks if chunks is not None else {}, preprocess=_select,
+                               combine='by_coords', parallel=parallel)
+    else:
+        ds = _select(xr.open_dataset(path, chunks=chunks))
+
+    if time_selection:
+        ds = ds.sel(**time_selection)
+    
+
+    if var:
+        ds = ds[var]
     
     return ds
 
 
 
-def write_netcdf(data, file_path):
+# Name xarray gives an unnamed DataArray on disk, so that open_dataarray restores name=None
+DATAARRAY_VARIABLE = '__xarray_dataarray_variable__'
+
+
+def _as_dataset(data):
+    """Dataset view of 'data', naming an unnamed DataArray the way DataArray.to_netcdf does."""
+    if isinstance(data, xr.DataArray):
+        return data.to_dataset(name=data.name if data.name is not None else DATAARRAY_VARIABLE)
+    return data
+
+
+def _zarr_compressor(complevel):
+    """Blosc/zstd compression settings for zarr stores of either format."""
+    import zarr
+    if int(zarr.__version__.split('.')[0]) >= 3:
+        from zarr.codecs import BloscCodec
+        return {'compressors': (BloscCodec(cname='zstd', clevel=complevel, shuffle='shuffle'),)}
+    from numcodecs import Blosc
+    return {'compressor': Blosc(cname='zstd', clevel=complevel, shuffle=Blosc.SHUFFLE)}
+
+
+@instrumented
+def output_encoding(data, complevel=4, dtype='float32', chunks=None, engine='netcdf4', encoding=None):
+    """
+    Build the per-variable encoding used by write_netcdf and write_zarr.
+
+    Compression, on-disk dtype and chunk sizes apply to the data variables; coordinates keep
+    xarray's defaults.
+
+    Parameters:
+    data (xarray.Dataset or xarray.DataArray): The data to be saved.
+    complevel (int, optional): Compression level from 1 to 9; 0 or None disables compression. Default is 4.
+    dtype (str, optional): On-disk dtype of the floating-point variables, e.g. 'float32'. None keeps the 
+                           in-memory dtype. Default is 'float32'.
+    chunks (dict, optional): On-disk chunk size per dimension, e.g. {'time': 12, 'lat': 90, 'lon': 180}. 
+                             Dimensions not listed are stored in one chunk. Default is None (backend default).
+    engine (str, optional): 'netcdf4' or 'zarr'. Default is 'netcdf4'.
+    encoding (dict, optional): Per-variable settings {var: {key: value}} taking precedence over the above.
+
+    Returns:
+    dict: Encoding to pass to to_netcdf or to_zarr.
+    """
+    if engine not in ('netcdf4', 'zarr'):
+        raise ValueError("Invalid engine. Use 'netcdf4' or 'zarr'.")
+
+    ds = _as_dataset(data)
+    compression = {}
+    if complevel:
+        compression = _zarr_compressor(complevel) if engine == 'zarr' else \
+            {'zlib': True, 'complevel': complevel, 'shuffle': True}
+
+    var_encoding = {}
+    for name, var in ds.data_vars.items():
+        settings = dict(compression)
+        if dtype is not None and np.issubdtype(var.dtype, np.floating):
+            settings['dtype'] = dtype
+        if chunks and var.ndim:
+            sizes = tuple(min(chunks.get(dim, size), size) for dim, size in zip(var.dims, var.shape))
+            settings['chunks' if engine == 'zarr' else 'chunksizes'] = sizes
+        settings.update((encoding or {}).get(name, {}))
+        var_encoding[name] = settings
+    return var_encoding
+
+
+@instrumented
+def write_netcdf(data, file_path, complevel=None, dtype=None, chunks=None, encoding=None, compute=True):
     """
     Save the given data to a NetCDF file.
 
+    Without any of the optional arguments the file is written with xarray's default encoding, 
+    as before. Dask-backed data are computed chunk by chunk in parallel while writing.
+
     Parameters:
     data (xarray.Dataset or xarray.DataArray): The data to be saved.
     file_path (str): The path where the NetCDF file will be saved.
+    complevel (int, optional): zlib compression level from 1 to 9. Default is None (no compression).
+    dtype (str, optional): On-disk dtype of the floating-point variables, e.g. 'float32'. Default is None.
+    chunks (dict, optional): HDF5 chunk size per dimension, e.g. {'time': 12}. Default is None.
+    encoding (dict, optional): Per-variable encoding overrides {var: {key: value}}. Default is None.
+    compute (bool, optional): If False, return a dask.delayed object that writes the file when computed. 
+                              Default is True.
 
     Returns:
-    None
+    None, or dask.delayed.Delayed if compute is False.
     """
 
-    data.to_netcdf(file_path)
+    if complevel is None and dtype is None and chunks is None and encoding is None:
+        delayed = data.to_netcdf(file_path, compute=compute)
+    else:
+        ds = _as_dataset(data)
+        delayed = ds.to_netcdf(file_path, compute=compute,
+                               encoding=output_encoding(ds, complevel=complevel, dtype=dtype, chunks=chunks,
+                                                        engine='netcdf4', encoding=encoding))
+    if not compute:
+        return delayed
     print(f"Data saved to {file_path}")
 
 
-import xarray as xr
-import xesmf as xe
+def _append_chunks(length, offset, chunk):
+    """
+    Dask chunks along the append dimension that line up with the zarr chunks of a store
+    already holding 'offset' steps: the first chunk fills the partly written last one.
+    """
+    first = min(length, chunk - offset % chunk)
+    rest = length - first
+    return (first,) + (chunk,) * (rest // chunk) + ((rest % chunk,) if rest % chunk else ())
+
+
+@instrumented
+def write_zarr(data, store, append_dim=None, complevel=4, dtype='float32', chunks=None, encoding=None,
+               compute=True, consolidated=None):
+    """
+    Save the given data to a Zarr store, or append new steps to an existing one.
+
+    A new store is written with compression, on-disk dtype and chunking (see output_encoding). 
+    With 'append_dim' set and the store present, only the new steps are written along that 
+    dimension, using the encoding already in the store; nothing is rewritten. Dask-backed data 
+    are rechunked to the on-disk chunks and written in parallel, one task per chunk.
+
+    Parameters:
+    data (xarray.Dataset or xarray.DataArray): The data to be saved.
+    store (str or MutableMapping): Path or mapping of the Zarr store.
+    append_dim (str, optional): Dimension to append along, e.g. 'time'. If None, the store is overwritten.
+    complevel (int, optional): Blosc/zstd compression level from 1 to 9; 0 or None disables it. Default is 4.
+    dtype (str, optional): On-disk dtype of the floating-point variables. Default is 'float32'.
+    chunks (dict, optional): On-disk chunk size per dimension, e.g. {'time': 12, 'lat': 90, 'lon': 180}. 
+                             Default is None (the dask chunks, or a single chunk).
+    encoding (dict, optional): Per-variable encoding overrides {var: {key: value}}. Default is None.
+    compute (bool, optional): If False, return a dask.delayed object that writes the data when computed. 
+                              Default is True.
+    consolidated (bool, optional): Passed on to xarray's to_zarr. Default is None.
 
-def regridding(ds, ds_out=None, var=None, method=None, to_range=None, x_s=None, x_e=None, x_i=None, y_s=None, y_e=None, y_i=None):
+    Returns:
+    None, or dask.delayed.Delayed if compute is False.
+
+    Raises:
+    ValueError: If steps to append are not all later than the last step in the store.
+    """
+    ds = _as_dataset(data)
+    exists = os.path.exists(store) if isinstance(store, (str, os.PathLike)) else len(store) > 0
+
+    if append_dim is not None and exists:
+        existing = xr.open_zarr(store, consolidated=consolidated)
+        if append_dim in existing.coords and append_dim in ds.coords \
+                and ds[append_dim].min().values <= existing[append_dim].max().values:
+            raise ValueError(f"The store already holds {append_dim} values up to "
+                             f"{existing[append_dim].max().values}; only later steps can be appended.")
+
+        if ds.chunks:
+            # Dask chunks must not straddle the zarr chunks of the store
+            rechunk = {}
+            for name, var in existing.data_vars.items():
+                if name in ds.data_vars:
+                    for dim, size in zip(var.dims, var.encoding.get('chunks', ())):
+                        rechunk[dim] = size
+            if append_dim in rechunk:
+                rechunk[append_dim] = _append_chunks(ds.sizes[append_dim], existing.sizes[append_dim],
+                                                     rechunk[append_dim])
+            ds = ds.chunk({dim: size for dim, size in rechunk.items() if dim in ds.dims})
+
+        delayed = ds.to_zarr(store, mode='a', append_dim=append_dim, compute=compute, consolidated=consolidated)
+        message = f"Appended {ds.sizes[append_dim]} {append_dim} steps to {store}"
+    else:
+        if chunks and ds.chunks:
+            ds = ds.chunk({dim: size for dim, size in chunks.items() if dim in ds.dims})
+        delayed = ds.to_zarr(store, mode='w', compute=compute, consolidated=consolidated,
+                             encoding=output_encoding(ds, complevel=complevel, dtype=dtype, chunks=chunks,
+                                                      engine='zarr', encoding=encoding))
+        message = f"Data saved to {store}"
+
+    if not compute:
+        return delayed
+    print(message)
+
+
+REGRIDDER_CACHE_SIZE = 8
+_REGRIDDERS = OrderedDict()
+
+
+@instrumented
+def regrid_cache_dir(cache_dir=None):
+    """
+    Directory holding the regridding weight files.
+
+    Parameters:
+    cache_dir (str, optional): Explicit directory. If None, the XINDICES_REGRID_CACHE environment 
+                               variable is used, falling back to ~/.cache/xindices/regrid.
+
+    Returns:
+    str: The cache directory.
+    """
+    if cache_dir is None:
+        cache_dir = os.environ.get('XINDICES_REGRID_CACHE',
+                                   os.path.join(os.path.expanduser('~'), '.cache', 'xindices', 'regrid'))
+    return cache_dir
+
+
+def _grid_fingerprint(ds, digest):
+    """
+    Feed the horizontal grid of 'ds' (lat/lon centres, bounds and mask) into 'digest'.
+
+    Only coordinates spanning the horizontal dimensions are used, so fields that differ in time,
+    member or level but share a grid hash to the same key.
+    """
+    grid_names = [name for name in ds.coords
+                  if name in ('lat', 'lon', 'latitude', 'longitude', 'nav_lat', 'nav_lon')
+                  or ds.coords[name].attrs.get('units', '') in ('degrees_north', 'degrees_east')]
+    grid_dims = set()
+    for name in grid_names:
+        grid_dims.update(ds.coords[name].dims)
+
+    variables = dict(ds.coords)
+    if isinstance(ds, xr.Dataset):
+        for name in ('mask', 'lat_b', 'lon_b'):
+            if name in ds.data_vars:
+                variables[name] = ds[name]
+
+    for name in sorted(variables):
+        values = variables[name]
+        if values.ndim == 0 or (not set(values.dims) <= grid_dims and name not in ('lat_b', 'lon_b')):
+            continue
+        array = np.ascontiguousarray(values.values)
+        digest.update(f'{name}{values.dims}{array.shape}{array.dtype}'.encode())
+        digest.update(array.tobytes())
+
+
+@instrumented
+def regrid_weights_key(ds, ds_out, method):
+    """
+    Hash of the source grid, target grid and method identifying a set of regridding weights.
+
+    Parameters:
+    ds (xarray.Dataset or xarray.DataArray): Source grid.
+    ds_out (xarray.Dataset or xarray.DataArray): Target grid.
+    method (str): Regridding method.
+
+    Returns:
+    str: Hexadecimal key.
+    """
+    digest = hashlib.sha1(method.encode())
+    _grid_fingerprint(ds, digest)
+    digest.update(b'->')
+    _grid_fingerprint(ds_out, digest)
+    return digest.hexdigest()
+
+
+@instrumented
+def get_regridder(ds, ds_out, method='bilinear', weights_cache=True):
+    """
+    Return an xesmf.Regridder for the pair of grids, reusing cached weights when possible.
+
+    Live regridders are kept in an in-process LRU of REGRIDDER_CACHE_SIZE entries. Weights are 
+    also written to a netCDF file named after regrid_weights_key, so other calls and other 
+    processes regridding between the same grids skip the weight generation.
+
+    Parameters:
+    ds (xarray.Dataset or xarray.DataArray): Source grid.
+    ds_out (xarray.Dataset or xarray.DataArray): Target grid.
+    method (str, optional): Regridding method. Default is 'bilinear'.
+    weights_cache (bool or str, optional): True uses regrid_cache_dir(), a string is used as the 
+                                           cache directory and False disables caching. Default is True.
+
+    Returns:
+    xesmf.Regridder: The regridder.
+    """
+    # xesmf loads ESMF, which is slow to import, so it is only imported once a regridder is needed
+    import xesmf as xe
+
+    if not weights_cache:
+        return xe.Regridder(ds, ds_out, method=method)
+
+    cache_dir = regrid_cache_dir(weights_cache if isinstance(weights_cache, str) else None)
+    key = regrid_weights_key(ds, ds_out, method)
+
+    if (cache_dir, key) in _REGRIDDERS:
+        _REGRIDDERS.move_to_end((cache_dir, key))
+        return _REGRIDDERS[(cache_dir, key)]
+
+    filename = os.path.join(cache_dir, f'{method}_{key}.nc')
+    if os.path.exists(filename):
+        regridder = xe.Regridder(ds, ds_out, method=method, filename=filename, reuse_weights=True)
+    else:
+        regridder = xe.Regridder(ds, ds_out, method=method)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # Write under a temporary name so concurrent processes never read a partial file
+            partial = f'{filename}.{os.getpid()}.tmp'
+            regridder.to_netcdf(filename=partial)
+            os.replace(partial, filename)
+        except Exception as e:
+            print(f"Could not cache regridding weights in {cache_dir}: {e}")
+
+    _REGRIDDERS[(cache_dir, key)] = regridder
+    while len(_REGRIDDERS) > REGRIDDER_CACHE_SIZE:
+        _REGRIDDERS.popitem(last=False)
+    return regridder
+
+
+@instrumented
+def clear_regrid_cache(disk=False, cache_dir=None):
+    """
+    Drop the in-process regridders and, if 'disk' is True, the weight files in the cache directory.
+    """
+    _REGRIDDERS.clear()
+    if disk:
+        cache_dir = regrid_cache_dir(cache_dir)
+        if os.path.isdir(cache_dir):
+            for name in os.listdir(cache_dir):
+                if name.endswith('.nc'):
+                    os.remove(os.path.join(cache_dir, name))
+
+
+@instrumented
+def regridding(ds, ds_out=None, var=None, method=None, to_range=None, x_s=None, x_e=None, x_i=None, y_s=None, y_e=None, y_i=None,
+    weights_cache=True):
     '''
     This function is useful for regridding rectilinear and curvilinear grids.
     
@@ -211,6 +541,11 @@ def regridding(ds, ds_out=None, var=None, method=None, to_range=None, x_s=None,
     y_e: end latitude'
     y_i: lat increment
 
+    weights_cache : bool or str, optional
+        Reuse regridding weights across calls and processes (see get_regridder). True stores 
+        them in regrid_cache_dir(), a string gives the directory, False recomputes them every call.
+        Default is True.
+
     To perform regridding from Curvilinear data to rectilinear data we suggest providing 
     Curvilinear as ds and rectilinear as ds_out.
     '''
@@ -245,7 +580,7 @@ def regridding(ds, ds_out=None, var=None, method=None, to_range=None, x_s=None,
     if method is None:
         method = 'bilinear'
     
-    regridder = xe.Regridder(ds, ds_out, method=method)
+    regridder = get_regridder(ds, ds_out, method=method, weights_cache=weights_cache)
 
     if isinstance(ds, xr.DataArray) and isinstance(ds_out, xr.DataArray):
         regridded = regridder(ds)
@@ -0,0 +1,147 @@
+# regression.py
+
+import numpy as np
+import xarray as xr
+
+from .compaction import CompactField
+
+
+def _index_matrix(indices, time, index_dim):
+    """Stack the index series into a (k, time) DataArray aligned with 'time' (NaN where missing)."""
+    if isinstance(indices, xr.Dataset):
+        indices = [indices[name].rename(name) for name in indices.data_vars]
+    elif isinstance(indices, dict):
+        indices = [series.rename(name) for name, series in indices.items()]
+    if isinstance(indices, (list, tuple)):
+        names = [series.name if series.name is not None else f'index_{i}' for i, series in enumerate(indices)]
+        indices = xr.concat([series.drop_vars([c for c in series.coords if c not in series.dims])
+                             for series in indices], dim=index_dim).assign_coords({index_dim: names})
+    elif index_dim not in indices.dims:
+        name = indices.name if indices.name is not None else 'index'
+        indices = indices.expand_dims({index_dim: [name]})
+    time_dim = time.dims[0]
+    return indices.reindex({time_dim: time.values}).transpose(index_dim, time_dim)
+
+
+def _shifted(y, lags):
+    """
+    Series (lag * k, time) with y shifted by every lag: row (l, k) at time t holds y_k(t - lag_l),
+    NaN where it falls outside the record. A positive lag has the index leading the field.
+    """
+    n_time = y.shape[-1]
+    out = np.full((len(lags),) + y.shape, np.nan)
+    for i, lag in enumerate(lags):
+        if lag >= 0:
+            out[i, :, lag:] = y[:, :n_time - lag]
+        else:
+            out[i, :, :n_time + lag] = y[:, -lag:]
+    return out.reshape(-1, n_time)
+
+
+def _moments(Y, M, X, finite=None):
+    """
+    Pairwise-complete regression slopes and correlations of every series (rows of Y, with
+    validity mask M and zeros where invalid) with every column of X (zeros where 'finite' is False).
+
+    All sums are matrix products over the time axis, e.g. sum_t y_i(t) x_j(t) = (Y @ X)[i, j].
+    """
+    if finite is None:
+        # Complete columns: counts, index sums and field sums per series only depend on M
+        n = M.sum(axis=1)[:, np.newaxis]
+        Sy = Y.sum(axis=1)[:, np.newaxis]
+        Syy = (Y * Y).sum(axis=1)[:, np.newaxis]
+        if M.all():
+            Sx = X.sum(axis=0)[np.newaxis, :]
+            Sxx = np.einsum('tp,tp->p', X, X)[np.newaxis, :]
+        else:
+            Sx = M @ X
+            Sxx = M @ (X * X)
+    else:
+        F = finite.astype(np.float64)
+        n = M @ F
+        Sy = Y @ F
+        Syy = (Y * Y) @ F
+        Sx = M @ X
+        Sxx = M @ (X * X)
+    Sxy = Y @ X
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = Sxy - Sx * Sy / n
+        var_y = Syy - Sy * Sy / n
+        var_x = Sxx - Sx * Sx / n
+        slope = np.where(n > 1, cov / var_y, np.nan)
+        corr = np.where(n > 1, cov / np.sqrt(var_x * var_y), np.nan)
+    return slope, corr
+
+
+def regression_maps(field, indices, lags=None, index_dim='index', lag_dim='lag', mask=None):
+    """
+    Regression and correlation maps of a field on K indices, optionally at several lags.
+
+    All K x L index series (K indices, L lags) are stacked into one matrix, so the maps come from
+    one matrix product with the packed (time, point) anomaly field instead of one full-field pass
+    per index. Pass an already computed anomaly, e.g. IndexSession.compact(), to reuse it; land
+    points are not touched. Time steps where an index (or a shifted index) is missing are left
+    out for that index only, and gappy points are handled pairwise, as xr.cov and xr.corr do.
+
+    Parameters:
+    ----------
+    field : xarray.DataArray or CompactField
+        Anomaly field (time, lat, lon), or its packed form.
+    indices : xarray.DataArray, xarray.Dataset, dict or list of xarray.DataArray
+        Index series with the time dimension of the field. A DataArray may carry 'index_dim'
+        for several series; Dataset variables, dict keys or DataArray names label the indices.
+    lags : int or list of int, optional
+        Lags in time steps. A positive lag regresses the field on the index 'lag' steps earlier
+        (index leads). Default is no lag dimension (lag 0).
+    index_dim : str, optional
+        Name of the index dimension of the output. Default is 'index'.
+    lag_dim : str, optional
+        Name of the lag dimension of the output. Default is 'lag'.
+    mask : xarray.DataArray, optional
+        Valid-point mask used when packing 'field' (see valid_mask).
+
+    Returns:
+    -------
+    xarray.Dataset
+        'regression' (field units per index unit) and 'correlation', with dimensions
+        (index_dim, [lag_dim,] lat, lon).
+
+    Examples:
+    --------
+    >>> session = IndexSession(data=sst)
+    >>> maps = regression_maps(session.compact(), {'nino34': nino34, 'pdo': pdo, 'amo': amo}, lags=[0, 3, 6])
+    >>> maps.correlation.sel(index='pdo', lag=3)
+    """
+    compact = field if isinstance(field, CompactField) else CompactField.pack(field.compute(), mask=mask)
+    series = _index_matrix(indices, compact.sample, index_dim)
+    lag_values = [0] if lags is None else list(np.atleast_1d(lags).astype(int))
+
+    Y = _shifted(np.asarray(series.values, dtype=np.float64), lag_values)
+    M = np.isfinite(Y)
+    # Moments are shift invariant; centring first keeps the one-pass sums accurate
+    with np.errstate(invalid='ignore', divide='ignore'):
+        Y = np.where(M, Y - np.nanmean(Y, axis=1, keepdims=True), 0)
+    M = M.astype(np.float64)
+
+    values = compact.values
+    n = compact.n_complete
+    slope = np.empty((Y.shape[0], compact.n_points))
+    corr = np.empty_like(slope)
+    complete = values[:, :n]
+    slope[:, :n], corr[:, :n] = _moments(Y, M, complete - complete.mean(axis=0))
+    if n < compact.n_points:
+        gappy = values[:, n:]
+        finite = np.isfinite(gappy)
+        with np.errstate(invalid='ignore'):
+            gappy = np.where(finite, gappy - np.nanmean(gappy, axis=0), 0)
+        slope[:, n:], corr[:, n:] = _moments(Y, M, gappy, finite=finite)
+
+    dims = (lag_dim, index_dim)
+    coords = {lag_dim: lag_values, index_dim: series[index_dim].values}
+    shape = (len(lag_values), series.sizes[index_dim], compact.n_points)
+    result = xr.Dataset({
+        'regression': compact.unpack(slope.reshape(shape), dims=dims, coords=coords),
+        'correlation': compact.unpack(corr.reshape(shape), dims=dims, coords=coords),
+    }).transpose(index_dim, lag_dim, ...)
+    return result.squeeze(lag_dim, drop=True) if lags is None else result
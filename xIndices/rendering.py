@@ -0,0 +1,407 @@
+# rendering.py
+
+import functools
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import multiprocessing
+
+import numpy as np
+import xarray as xr
+
+from .utils import area_weighted_coarsen, quicklook_factors
+
+
+# Map features of contour_plot: name -> drawing style. Ocean goes below the data, land and
+# coastlines above it.
+MAP_FEATURES = {
+    'ocean': {'facecolor': 'w', 'zorder': 0},
+    'land': {'facecolor': 'grey', 'zorder': 2},
+    'coastline': {'facecolor': 'none', 'edgecolor': 'k', 'linewidth': 0.5, 'zorder': 3},
+}
+
+# Renderer of a worker process, built on its first batch and reused for every later frame
+_RENDERER = None
+_RENDERER_CONFIG = None
+
+
+@functools.lru_cache(maxsize=None)
+def _feature(name, scale):
+    """
+    Natural Earth feature with its geometries read once per process.
+
+    cartopy re-reads the shapefile of a NaturalEarthFeature whenever it is drawn; a ShapelyFeature
+    over the loaded geometries also lets the artist reuse its projected paths between frames.
+    """
+    import cartopy.crs as ccrs
+    import cartopy.feature as cfeature
+
+    source = cfeature.NaturalEarthFeature('physical', name, scale)
+    return cfeature.ShapelyFeature(list(source.geometries()), ccrs.PlateCarree())
+
+
+@functools.lru_cache(maxsize=None)
+def _plate_carree(central_longitude=0.0):
+    import cartopy.crs as ccrs
+    return ccrs.PlateCarree(central_longitude=central_longitude)
+
+
+def _agg_figure(figsize, dpi):
+    """Figure drawn by the Agg canvas directly, without pyplot, a GUI backend or a figure manager."""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    figure = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(figure)
+    return figure
+
+
+class _MapRenderer:
+    """One figure with its projection, features and colorbar, reused for every frame."""
+
+    def __init__(self, lat, lon, levels, cmap=None, extend=None, projection=None, central_lon=0.0,
+                 features=tuple(MAP_FEATURES), feature_scale='110m', figsize=None, dpi=100, colorbar=True,
+                 ax_global=False, quicklook=False):
+        self.figure = _agg_figure(figsize, dpi)
+        projection = projection if projection is not None else _plate_carree(central_lon)
+        self.ax = self.figure.add_subplot(projection=projection)
+        if ax_global:
+            self.ax.set_global()
+        for name in features or ():
+            self.ax.add_feature(_feature(name, feature_scale), **MAP_FEATURES[name])
+
+        # Closes the seam of global fields, as add_cyclic_point in contour_plot; mesh cells span it anyway
+        self.quicklook = quicklook
+        self.mesh = None
+        self.cyclic = not quicklook and ((lon.min() <= -178 and lon.max() >= 178) or (lon.min() <= 2. and lon.max() >= 357.))
+        self.lon = np.append(lon, lon[0] + 360) if self.cyclic else lon
+        self.lat = lat
+        self.levels = levels
+        self.cmap = cmap
+        self.extend = extend if extend is not None else 'neither'
+        self.colorbar = colorbar
+        self.transform = _plate_carree()
+
+
+    def render(self, values, path, title):
+        if self.quicklook:
+            self._render_mesh(values, path, title)
+            return
+        if self.cyclic:
+            values = np.concatenate([values, values[:, :1]], axis=1)
+        filled = self.ax.contourf(self.lon, self.lat, values, levels=self.levels, cmap=self.cmap,
+                                  extend=self.extend, transform=self.transform, zorder=1)
+        if self.colorbar is True:
+            # The levels are shared by all frames, so the colorbar of the first frame stays valid
+            ticks = filled.levels[::2] if len(filled.levels) > 6 else None
+            self.colorbar = self.figure.colorbar(filled, ax=self.ax, orientation='horizontal', shrink=0.7, pad=0.05,
+                                                 ticks=ticks, format='%.3g')
+            self.colorbar.ax.tick_params(labelsize=8)
+        self.ax.set_title(title)
+        self.figure.savefig(path)
+        try:
+            filled.remove()
+        except AttributeError:  # matplotlib < 3.8
+            for collection in filled.collections:
+                collection.remove()
+
+
+    def _render_mesh(self, values, path, title):
+        # The mesh is built once; later frames only replace its colours
+        if self.mesh is None:
+            from matplotlib import colormaps
+            from matplotlib.colors import BoundaryNorm
+
+            cmap = colormaps[self.cmap] if isinstance(self.cmap, str) else self.cmap or colormaps['viridis']
+            levels = self.levels
+            norm = BoundaryNorm(levels, cmap.N, extend=self.extend)
+            self.mesh = self.ax.pcolormesh(self.lon, self.lat, values, cmap=cmap, norm=norm, shading='nearest',
+                                           transform=self.transform, zorder=1, rasterized=True)
+            if self.colorbar is True:
+                ticks = levels[::2] if len(levels) > 6 else None
+                self.colorbar = self.figure.colorbar(self.mesh, ax=self.ax, orientation='horizontal', shrink=0.7,
+                                                     pad=0.05, ticks=ticks, format='%.3g')
+                self.colorbar.ax.tick_params(labelsize=8)
+        else:
+            self.mesh.set_array(values)
+        self.ax.set_title(title)
+        self.figure.savefig(path)
+
+
+class _LineRenderer:
+    """One figure and one line, whose data are replaced for every frame."""
+
+    def __init__(self, color='k', figsize=(10, 3), dpi=100, ylim=None):
+        self.figure = _agg_figure(figsize, dpi)
+        self.ax = self.figure.add_subplot()
+        self.line, = self.ax.plot([], [], color=color or 'k', lw=1)
+        self.text = self.ax.text(0.01, 0.95, '', transform=self.ax.transAxes, va='top')
+        self.ylim = ylim
+        self.ax.set_xlabel('time')
+        self.figure.subplots_adjust(bottom=0.2)
+
+
+    def render(self, frame, path, title):
+        x, y, label, variance_fraction = frame
+        # Picks the date converter for datetime64 times, as plotting through xarray does
+        self.ax.xaxis.update_units(x)
+        self.line.set_data(x, y)
+        self.line.set_label(label)
+        self.ax.relim()
+        self.ax.autoscale_view()
+        if self.ylim is not None:
+            self.ax.set_ylim(*self.ylim)
+        self.text.set_text('' if variance_fraction is None else f'{label}_vf: {variance_fraction:.2f}')
+        self.ax.legend(frameon=False, loc='upper right')
+        self.ax.set_title(title)
+        self.figure.savefig(path)
+
+
+_RENDERERS = {'map': _MapRenderer, 'line': _LineRenderer}
+
+
+def _render_frames(renderer, frames):
+    """Render (frame, path, title) items. Returns (path, None or (message, traceback)) per frame."""
+    done = []
+    for frame, path, title in frames:
+        try:
+            renderer.render(frame, path, title)
+            done.append((path, None))
+        except Exception as e:
+            done.append((path, (f"{type(e).__name__}: {e}", traceback.format_exc())))
+    return done
+
+
+def _init_worker(kind, config):
+    """Keep workers headless and store the renderer configuration."""
+    global _RENDERER, _RENDERER_CONFIG
+    import matplotlib
+    matplotlib.use('Agg')
+    _RENDERER, _RENDERER_CONFIG = None, (kind, config)
+
+
+def _render_batch(frames):
+    """Worker task: render a batch of frames with the renderer of this process."""
+    global _RENDERER
+    if _RENDERER is None:
+        kind, config = _RENDERER_CONFIG
+        _RENDERER = _RENDERERS[kind](**config)
+    return _render_frames(_RENDERER, frames)
+
+
+def _batches(n_frames, max_workers, batch_size):
+    if batch_size is None:
+        # A few batches per worker balance the load without paying per-frame task overhead
+        batch_size = max(1, int(np.ceil(n_frames / (4 * max_workers))))
+    return [range(start, min(start + batch_size, n_frames)) for start in range(0, n_frames, batch_size)]
+
+
+def _render(kind, config, n_frames, frame_items, max_workers, batch_size, mp_context):
+    """
+    Render n_frames frames, in this process or on a pool. frame_items(indices) returns the
+    (frame, path, title) items of a batch; it runs in this process, so dask data are read batch by batch.
+    At most 2 * max_workers batches are loaded at a time. Returns the render report.
+    """
+    start = time.perf_counter()
+    max_workers = max_workers or os.cpu_count() or 1
+    max_workers = min(max_workers, n_frames) if n_frames else 1
+    batches = _batches(n_frames, max_workers, batch_size)
+    results = []
+
+    if max_workers == 1:
+        renderer = _RENDERERS[kind](**config)
+        for batch in batches:
+            results.extend(_render_frames(renderer, frame_items(batch)))
+    else:
+        context = multiprocessing.get_context(mp_context)
+        batch_results = [None] * len(batches)
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(kind, config)) as executor:
+            pending, queued = {}, iter(enumerate(batches))
+
+            def submit_next():
+                for number, batch in queued:
+                    frames = frame_items(batch)
+                    try:
+                        pending[executor.submit(_render_batch, frames)] = number, [path for _, path, _ in frames]
+                        return
+                    except Exception as e:
+                        # A broken pool refuses every later batch; report them instead of stopping
+                        error = (f"{type(e).__name__}: {e}", traceback.format_exc())
+                        batch_results[number] = [(path, error) for _, path, _ in frames]
+
+            for _ in range(2 * max_workers):
+                submit_next()
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    number, paths = pending.pop(future)
+                    try:
+                        batch_results[number] = future.result()
+                    except Exception as e:
+                        # e.g. BrokenProcessPool after a worker was killed: the frames of the batch are reported
+                        error = (f"{type(e).__name__}: {e}", traceback.format_exc())
+                        batch_results[number] = [(path, error) for path in paths]
+                    submit_next()
+        results = [item for batch in batch_results for item in batch]
+
+    seconds = time.perf_counter() - start
+    failures = {path: error for path, error in results if error is not None}
+    for path, (message, _) in failures.items():
+        print(f"Error while rendering {path}: {message}")
+    paths = [path for path, error in results if error is None]
+    report = {'paths': paths, 'failures': failures, 'frames': len(paths), 'seconds': seconds,
+              'frames_per_second': len(paths) / seconds if seconds > 0 else float('nan')}
+    print(f"Rendered {report['frames']} frames in {seconds:.1f} s ({report['frames_per_second']:.1f} frames/s)")
+    return report
+
+
+def _frame_labels(data, frame_dim):
+    values = data[frame_dim].values
+    if np.issubdtype(values.dtype, np.datetime64):
+        return list(np.datetime_as_string(values, unit='D'))
+    return [str(value) for value in values]
+
+
+def render_maps(data, directory, frame_dim='time', filename='{name}_{label}.png', title='{label}', levels=None,
+    cmap=None, extend=None, projection=None, central_lon=None, features=tuple(MAP_FEATURES), feature_scale='110m',
+    figsize=None, dpi=100, colorbar=True, ax_global=False, quicklook=False, max_workers=None, batch_size=None,
+    mp_context='spawn'):
+    """
+    Render one filled-contour map per frame straight to image files, headless and in parallel.
+
+    The maps look like those of contour_plot, but every worker process draws on one Agg figure
+    (no pyplot, no plt.show) whose projection, map features and colorbar are built once: the
+    Natural Earth geometries are read once per worker and only the contours change between
+    frames. All frames share the same levels, so they can be played as an animation.
+
+    Parameters:
+    data (xarray.DataArray): Field (frame_dim, lat, lon), e.g. monthly anomalies. Dask-backed data
+                             are read one batch of frames at a time.
+    directory (str): Output directory, created if needed.
+    frame_dim (str, optional): Dimension holding the frames. Default is 'time'.
+    filename (str, optional): File name template with the fields {name}, {label} (frame coordinate,
+                              dates as YYYY-MM-DD) and {index}. The extension selects the format.
+                              Default is '{name}_{label}.png'.
+    title (str, optional): Title template with the same fields. Default is '{label}'.
+    levels (list or int, optional): Contour levels, or their approximate number. Default is 10 levels
+                                    between the minimum and maximum over all frames.
+    cmap, extend (optional): As in contour_plot.
+    projection (cartopy.crs.Projection, optional): Map projection. Default is PlateCarree(central_lon).
+    central_lon (float, optional): Central longitude of the default projection. Default is 0.
+    features (tuple of str, optional): Map features among 'ocean', 'land' and 'coastline'. Default is all
+                                       three; None draws none (no Natural Earth data needed).
+    feature_scale (str, optional): Natural Earth scale, '110m', '50m' or '10m'. Default is '110m'.
+    figsize (tuple, optional): Figure size in inches.
+    dpi (int, optional): Resolution of the files. Default is 100.
+    colorbar (bool, optional): Draw a colorbar. Default is True.
+    ax_global (bool, optional): Show the whole globe. Default is False.
+    quicklook (bool, optional): Raster previews as in contour_plot(quicklook=True): frames are block-averaged
+                                to about one cell per pixel before they are sent to the workers, and every
+                                worker only recolours one mesh. Default is False.
+    max_workers (int, optional): Number of worker processes. Default is the number of CPUs; 1 renders
+                                 in this process.
+    batch_size (int, optional): Frames per task. Default gives about four tasks per worker.
+    mp_context (str, optional): Start method of the workers. Default is 'spawn'.
+
+    Returns:
+    dict: 'paths' (written files in frame order), 'failures' ({path: (message, traceback)}),
+          'frames', 'seconds' and 'frames_per_second'.
+
+    Examples:
+    >>> report = render_maps(sst_anomaly.sel(time='2023'), 'maps/', levels=np.arange(-3, 3.5, 0.5),
+    ...                      cmap='RdBu_r', extend='both', max_workers=8)
+    >>> report['frames_per_second']
+    """
+    data = data.transpose(frame_dim, ...)
+    if data.ndim != 3:
+        raise ValueError(f"Data must have the dimensions ({frame_dim}, lat, lon).")
+    lat_dim, lon_dim = data.dims[1:]
+    if levels is None or np.ndim(levels) == 0:
+        low, high = (float(value) for value in xr.concat([data.min(), data.max()], dim='bound').values)
+        if levels is None:
+            levels = list(np.linspace(low, high, 10))
+        else:
+            # The levels contourf would pick for this number, but from the range of all frames
+            from matplotlib.ticker import MaxNLocator
+            levels = list(MaxNLocator(levels + 1).tick_values(low, high))
+
+    os.makedirs(directory, exist_ok=True)
+    name = data.name if data.name is not None else 'map'
+    labels = _frame_labels(data, frame_dim)
+    fields = [{'name': name, 'label': label, 'index': index} for index, label in enumerate(labels)]
+
+    factors = (1, 1)
+    if quicklook:
+        import matplotlib
+        width, height = figsize if figsize is not None else matplotlib.rcParams['figure.figsize']
+        factors = quicklook_factors(data.sizes[lat_dim], data.sizes[lon_dim], width * dpi, height * dpi)
+    grid = area_weighted_coarsen(data.isel({frame_dim: 0}), *factors, lat_dim=lat_dim, lon_dim=lon_dim)
+
+    def frame_items(batch):
+        frames = data.isel({frame_dim: slice(batch.start, batch.stop)})
+        values = np.asarray(area_weighted_coarsen(frames, *factors, lat_dim=lat_dim, lon_dim=lon_dim).values)
+        return [(frame, os.path.join(directory, filename.format(**fields[index])), title.format(**fields[index]))
+                for frame, index in zip(values, batch)]
+
+    config = {
+        'lat': np.asarray(grid[lat_dim].values), 'lon': np.asarray(grid[lon_dim].values), 'levels': levels,
+        'cmap': cmap, 'extend': extend, 'projection': projection,
+        'central_lon': central_lon if central_lon is not None else 0.0, 'features': features,
+        'feature_scale': feature_scale, 'figsize': figsize, 'dpi': dpi, 'colorbar': colorbar, 'ax_global': ax_global,
+        'quicklook': quicklook,
+    }
+    return _render('map', config, len(labels), frame_items, max_workers, batch_size, mp_context)
+
+
+def render_lines(series, directory, frame_dim=None, filename='{name}.png', title='', variance_fraction=None,
+    color=None, figsize=(10, 3), dpi=100, share_ylim=False, max_workers=None, batch_size=None, mp_context='spawn'):
+    """
+    Render one time series plot per series straight to image files, headless and in parallel.
+
+    The plots look like those of line_plot; every worker process reuses one Agg figure and line.
+
+    Parameters:
+    series (xarray.DataArray, dict or list): 1-D series with a 'time' dimension: a dict {name: series}, a
+                                             list (named by their .name), or one DataArray with a
+                                             frame_dim, e.g. indices along 'member'.
+    directory (str): Output directory, created if needed.
+    frame_dim (str, optional): Dimension of a DataArray holding the series.
+    filename (str, optional): File name template with the fields {name} and {index}. Default is '{name}.png'.
+    title (str, optional): Title template with the same fields. Default is no title.
+    variance_fraction (dict or float, optional): Variance fraction shown on the plot, per name or for all.
+    color (str, optional): Line colour. Default is black.
+    figsize (tuple, optional): Figure size in inches. Default is (10, 3).
+    dpi (int, optional): Resolution of the files. Default is 100.
+    share_ylim (bool, optional): Use the same y range for every plot. Default is False.
+    max_workers, batch_size, mp_context (optional): As in render_maps.
+
+    Returns:
+    dict: As for render_maps.
+    """
+    if isinstance(series, xr.DataArray):
+        if frame_dim is None:
+            series = [series]
+        else:
+            series = {str(key): series.sel({frame_dim: key}) for key in series[frame_dim].values}
+    if not isinstance(series, dict):
+        series = {s.name if s.name is not None else f'series_{i}': s for i, s in enumerate(series)}
+
+    os.makedirs(directory, exist_ok=True)
+    names = list(series)
+    frames = []
+    for index, name in enumerate(names):
+        values = series[name].squeeze()
+        fraction = variance_fraction.get(name) if isinstance(variance_fraction, dict) else variance_fraction
+        fields = {'name': name, 'index': index}
+        frames.append(((np.asarray(values['time'].values), np.asarray(values.values), name,
+                        None if fraction is None else float(fraction)),
+                       os.path.join(directory, filename.format(**fields)), title.format(**fields)))
+
+    ylim = None
+    if share_ylim and frames:
+        ylim = (min(np.nanmin(frame[0][1]) for frame in frames), max(np.nanmax(frame[0][1]) for frame in frames))
+    config = {'color': color, 'figsize': figsize, 'dpi': dpi, 'ylim': ylim}
+    return _render('line', config, len(frames), lambda batch: [frames[index] for index in batch],
+                   max_workers, batch_size, mp_context)
@@ -0,0 +1,127 @@
+# results.py
+
+from collections.abc import Sequence
+
+from .instrumentation import current_path, stage
+
+
+class IndexResult(Sequence):
+    """
+    Lazy, list-like container for the outputs of an index function.
+
+    Each output is described by a function without arguments that is only called the first time
+    the output is accessed; the value is then kept and the function dropped, so once every output
+    is computed the result no longer keeps the session cache or the fitted solver alive. The
+    object behaves like the list the index functions used to return (indexing, slicing, len,
+    iteration and unpacking), and outputs can also be accessed by name.
+
+    Parameters:
+    ----------
+    outputs : dict
+        Mapping from output name to a function computing it, in the order of the outputs.
+
+    Examples:
+    --------
+    >>> result = compute_pdo(data=sst)              # nothing computed beyond the EOF fit
+    >>> pdo_index = result['pdo_index']             # computes the index only
+    >>> pdo_pattern, pdo_index, pdo_var_exp = result
+    """
+
+    def __init__(self, outputs):
+        self._outputs = dict(outputs)
+        self._names = list(self._outputs)
+        self._values = {}
+        # Outputs computed later are recorded under the function that returned the result
+        self._stage_path = current_path()
+
+
+    @property
+    def names(self):
+        """Names of the outputs, in order."""
+        return list(self._names)
+
+
+    def computed(self):
+        """Names of the outputs computed so far."""
+        return [name for name in self._names if name in self._values]
+
+
+    def get(self, name):
+        """Compute (once) and return the output called 'name'."""
+        if name not in self._values:
+            with stage(name, parent=self._stage_path) as record:
+                self._values[name] = record.set_output(self._outputs[name]())
+            # The functions close over the session and the solver; release them when no longer needed
+            del self._outputs[name]
+        return self._values[name]
+
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key not in self._names:
+                raise KeyError(key)
+            return self.get(key)
+        if isinstance(key, slice):
+            return [self.get(name) for name in self._names[key]]
+        return self.get(self._names[key])
+
+
+    def __len__(self):
+        return len(self._names)
+
+
+    def __iter__(self):
+        for name in self._names:
+            yield self.get(name)
+
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, tuple, IndexResult)):
+            return NotImplemented
+        if len(self) != len(other):
+            return False
+        return all(_same_output(a, b) for a, b in zip(self, other))
+
+
+    def keys(self):
+        return self.names
+
+
+    def items(self):
+        return [(name, self.get(name)) for name in self._names]
+
+
+    def __repr__(self):
+        status = ', '.join(f"{name}{'' if name in self._values else ' (pending)'}" for name in self._names)
+        return f"IndexResult([{status}])"
+
+
+def _same_output(a, b):
+    """DataArrays compare element-wise, so xarray outputs are compared with 'identical'."""
+    if hasattr(a, 'identical'):
+        return a.identical(b)
+    if hasattr(b, 'identical'):
+        return False
+    return bool(a == b)
+
+
+def desired_outputs(outputs, desired):
+    """
+    Build the return value of an index function from lazily computed outputs.
+
+    Parameters:
+    ----------
+    outputs : dict
+        Mapping from every output name the function knows to a function computing it.
+    desired : list of str
+        Requested outputs. Unknown names are ignored.
+
+    Returns:
+    -------
+    The value itself when exactly one output is requested (as before), otherwise an IndexResult
+    over the requested outputs in the requested order.
+    """
+    selected = {name: outputs[name] for name in desired if name in outputs}
+    if len(selected) == 1:
+        return next(iter(selected.values()))()
+    return IndexResult(selected)
@@ -0,0 +1,204 @@
+# rotation.py
+
+import numpy as np
+import xarray as xr
+import xeofs
+from xeofs.utils.xarray_utils import data_is_dask, get_deterministic_sign_multiplier
+
+
+def _orthogonal_start(initial, n_modes):
+    """
+    Orthogonal (n_modes, n_modes) starting rotation from a previous rotation matrix or rotator.
+
+    Matrices of another size are cut or padded with the identity (the extra modes start
+    unrotated), and oblique (Promax) matrices are replaced by their nearest orthogonal matrix.
+    """
+    if isinstance(initial, WarmStartRotator):
+        initial = initial.varimax_rotation
+    elif isinstance(initial, xeofs.single.EOFRotator):
+        initial = initial.data['rotation_matrix'].values
+    initial = np.asarray(initial, dtype=np.float64)
+    start = np.eye(n_modes)
+    k = min(n_modes, initial.shape[0])
+    start[:k, :k] = initial[:k, :k]
+    U, _, VT = np.linalg.svd(start)
+    return U @ VT
+
+
+def _varimax(X, initial=None, gamma=1, max_iter=1000, rtol=1e-8):
+    """
+    Varimax rotation of a (feature, mode) loading matrix, started from the rotation 'initial'.
+
+    Same iteration as xeofs (Kaiser normalization, SVD update of the rotation matrix), so a start
+    at the identity gives the xeofs result. Returns the rotated loadings, the rotation matrix and
+    the number of iterations.
+    """
+    n_features, n_modes = X.shape
+    if n_modes < 2:
+        raise ValueError(f"Cannot rotate {n_modes} modes (columns), but must be 2 or more.")
+    R = np.eye(n_modes) if initial is None else _orthogonal_start(initial, n_modes)
+
+    h = np.sqrt(np.sum(X * X, axis=1))
+    Xn = X / (h + np.finfo(X.dtype).eps)[:, np.newaxis]
+
+    delta = 0.0
+    alpha = gamma / n_features
+    for n_iter in range(1, max_iter + 1):
+        delta_old = delta
+        basis = Xn @ R
+        basis2 = basis * basis
+        U, svals, VT = np.linalg.svd(Xn.T @ (basis * (basis2 - alpha * basis2.sum(axis=0))))
+        R = U @ VT
+        delta = np.sum(svals)
+        if abs(delta - delta_old) / delta < rtol:
+            break
+    else:
+        raise RuntimeError("Rotation process did not converge.")
+    return X @ R, R, n_iter
+
+
+def _promax(X, power=1, initial=None, max_iter=1000, rtol=1e-8):
+    """
+    Promax rotation (Varimax for power=1) of a (feature, mode) loading matrix, as in xeofs.
+
+    Returns the rotated loadings, the rotation matrix, the correlation matrix of the rotated
+    modes, the Varimax rotation matrix (the warm start of later rotations) and the number of
+    Varimax iterations.
+    """
+    X, R, n_iter = _varimax(X, initial=initial, max_iter=max_iter, rtol=rtol)
+    varimax_rotation = R
+    if power == 1:
+        return X, R, np.eye(R.shape[0]), varimax_rotation, n_iter
+
+    h = np.sqrt(np.sum(X * X, axis=1))
+    X = X / (h + np.finfo(X.dtype).eps)[:, np.newaxis]
+    Xnorm = X / np.max(np.abs(X), axis=0)
+    P = Xnorm * np.abs(Xnorm) ** (power - 1)
+    L = np.linalg.inv(X.T @ X) @ X.T @ P
+    try:
+        sigma_inv = np.diag(np.diag(np.linalg.inv(L.T @ L)))
+    except np.linalg.LinAlgError:
+        sigma_inv = np.diag(np.diag(np.linalg.pinv(L.T @ L)))
+    L = L @ np.sqrt(sigma_inv)
+    X = h[:, np.newaxis] * (X @ L)
+    L_inv = np.linalg.inv(L)
+    return X, R @ L, L_inv @ L_inv.T, varimax_rotation, n_iter
+
+
+def _inverse_transpose(rotation_matrix, power):
+    """
+    Inverse transpose of a (mode_m, mode_n) rotation matrix, which maps unrotated onto rotated
+    scores. Varimax matrices are orthogonal, so they are returned as they are.
+    """
+    if power == 1:
+        return rotation_matrix
+    return rotation_matrix.copy(data=np.linalg.inv(rotation_matrix.values).T)
+
+
+class WarmStartRotator(xeofs.single.EOFRotator):
+    """
+    xeofs.single.EOFRotator whose Varimax iteration can start from a previous solution.
+
+    The rotation only works on the small (feature, mode) loading matrix of the unrotated fit.
+    Started from a nearby solution (another power, one mode more or less, slightly different
+    data) it converges in a few iterations instead of a few hundred. Results, projection and
+    serialization behave exactly like those of xeofs.single.EOFRotator, which this reproduces
+    when no start is given.
+
+    Parameters:
+    ----------
+    n_modes : int, optional
+        Number of leading modes to rotate. Default is 2.
+    power : int, optional
+        1 for Varimax, larger for Promax (the package uses 4). Default is 1.
+    max_iter : int, optional
+        Maximum number of Varimax iterations. Default is 1000.
+    rtol : float, optional
+        Relative tolerance of the Varimax criterion. Default is 1e-8.
+    initial_rotation : numpy.ndarray or xeofs.single.EOFRotator, optional
+        Starting rotation matrix, or a fitted rotator to continue from. Default is the identity.
+
+    Attributes:
+    ----------
+    varimax_rotation : numpy.ndarray
+        Orthogonal Varimax rotation matrix of the fit, to warm-start the next rotation.
+    n_iter : int
+        Number of Varimax iterations of the fit.
+    """
+
+    def __init__(self, n_modes=2, power=1, max_iter=1000, rtol=1e-8, initial_rotation=None):
+        super().__init__(n_modes=n_modes, power=power, max_iter=max_iter, rtol=rtol, compute=True)
+        self.initial_rotation = initial_rotation
+        self.varimax_rotation = None
+        self.n_iter = None
+
+
+    def compute(self, **kwargs):
+        # xeofs computes dask results through a serialization round trip of the whole model,
+        # which costs far more than the rotation itself; with in-memory results only the
+        # variance ordering is left to do
+        containers = (self.data, self.model_data)
+        if any(data_is_dask(container[key]) for container in containers for key in container.keys()
+               if key != 'input_data'):
+            return super().compute(**kwargs)
+        self._post_compute()
+
+
+    def _fit_algorithm(self, model):
+        self.preprocessor = model.preprocessor
+        self.sample_name = model.sample_name
+        self.feature_name = model.feature_name
+        self.sorted = False
+
+        params = self.get_params()
+        n_modes = params['n_modes']
+        feature_name = self.feature_name
+
+        components = model.data['components'].sel(mode=slice(1, n_modes))
+        expvar = model.explained_variance().sel(mode=slice(1, n_modes))
+        loadings = (components * np.sqrt(expvar)).transpose(feature_name, 'mode')
+
+        rotated, rot_matrix, phi_matrix, self.varimax_rotation, self.n_iter = _promax(
+            np.asarray(loadings.values, dtype=np.float64), power=params['power'],
+            initial=self.initial_rotation, max_iter=params['max_iter'], rtol=params['rtol'])
+
+        rot_loadings = loadings.copy(data=rotated.astype(loadings.dtype, copy=False))
+        modes = np.arange(1, n_modes + 1)
+        rot_matrix = xr.DataArray(rot_matrix, dims=('mode_m', 'mode_n'), coords={'mode_m': modes, 'mode_n': modes})
+        phi_matrix = xr.DataArray(phi_matrix, dims=('mode_m', 'mode_n'), coords={'mode_m': modes, 'mode_n': modes})
+
+        # The rest follows xeofs.single.EOFRotator: variance ordering, pseudo-norms, rotated scores
+        expvar = (abs(rot_loadings) ** 2).sum(feature_name)
+        idx_modes_sorted = expvar.copy(data=np.argsort(expvar.values)[::-1])
+        rot_components = rot_loadings / np.sqrt(expvar)
+
+        n_samples = model.data['input_data'].coords[self.sample_name].size
+        norms = (expvar * (n_samples - 1)) ** 0.5
+        norms.name = 'singular_values'
+
+        svals = model.data['norms'].sel(mode=slice(1, n_modes))
+        scores = model.data['scores'].sel(mode=slice(1, n_modes)) / svals
+        RinvT = _inverse_transpose(rot_matrix, params['power'])
+        scores = xr.dot(scores.rename({'mode': 'mode_m'}), RinvT.rename({'mode_n': 'mode'}), dim='mode_m')
+        scores = scores * norms
+
+        modes_sign = get_deterministic_sign_multiplier(rot_components, feature_name)
+        rot_components = rot_components * modes_sign
+        scores = scores * modes_sign
+
+        self.model_data.add(model.data['norms'], 'singular_values')
+        self.model_data.add(model.data['components'], 'components')
+
+        self.data.add(model.data['input_data'], 'input_data', allow_compute=False)
+        self.data.add(rot_components, 'components')
+        self.data.add(scores, 'scores')
+        self.data.add(norms, 'norms')
+        self.data.add(expvar, 'explained_variance')
+        self.data.add(model.data['total_variance'], 'total_variance')
+        self.data.add(idx_modes_sorted, 'idx_modes_sorted')
+        self.data.add(rot_matrix, 'rotation_matrix')
+        self.data.add(phi_matrix, 'phi_matrix')
+        self.data.add(modes_sign, 'modes_sign')
+
+        self.data.set_attrs(self.attrs)
+        return self
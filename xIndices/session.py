@@ -0,0 +1,272 @@
+# session.py
+
+from collections import OrderedDict
+
+from .utils import calculate_anomaly
+from .compaction import CompactField, valid_mask
+from .instrumentation import stage
+from .preprocess_data import load_data, rename_dims_to_standard, adjust_longitude, adjust_latitude
+
+
+DEFAULT_MAX_BYTES = 2 * 1024**3
+
+
+def _held_bytes(value):
+    """
+    Bytes held in memory by a cached field. Lazy dask-backed fields cost nothing until computed.
+    """
+    if getattr(value, 'chunks', None):
+        return 0
+    return getattr(value, 'nbytes', 0)
+
+
+def _select_region(data, region):
+    """
+    Select a (lat_s, lat_e, lon_s, lon_e) box from standardized data.
+
+    Bounds given as None are not applied, so (90, 20, None, None) keeps every longitude.
+    """
+    if region is None:
+        return data
+    lat_s, lat_e, lon_s, lon_e = region
+    selection = {}
+    if lat_s is not None or lat_e is not None:
+        selection['lat'] = slice(lat_s, lat_e)
+    if lon_s is not None or lon_e is not None:
+        selection['lon'] = slice(lon_s, lon_e)
+    return data.sel(**selection) if selection else data
+
+
+class IndexSession:
+    """
+    Shared preprocessing state for computing several indices from one input field.
+
+    The session wraps a single dataset (given directly or loaded from 'path' and 'var') and
+    runs the standardization chain (rename_dims_to_standard, adjust_longitude, adjust_latitude),
+    the anomaly calculation and the global mean SST only once per set of parameters. Intermediate
+    fields are memoized in a least-recently-used cache bounded by 'max_bytes'.
+
+    Parameters:
+    ----------
+    data : xarray.DataArray or xarray.Dataset, optional
+        Gridded data with dimensions (time, lat, lon).
+    path : str, optional
+        Path to the data. Used together with 'var' if 'data' is not provided.
+    var : str, optional
+        Name of the variable to load from the dataset.
+    start_time : int, optional
+        Start year for the time selection.
+    end_time : int, optional
+        End year for the time selection.
+    max_bytes : int, optional
+        Upper bound on the memory held by cached intermediate fields. Least recently used
+        fields are evicted first. Dask-backed fields stay lazy and do not count towards
+        the bound. Default is 2 GiB.
+    chunks : int, dict or 'auto', optional
+        Dask chunk sizes used when loading from 'path' (see load_data). Everything up to the
+        EOF fit then stays lazy.
+    share_anomaly : bool, optional
+        Compute a regional anomaly as a cut of the global anomaly field, which is computed on
+        first use and kept for the other regions (if it fits in 'max_bytes'). Pays off when
+        several indices share the session. Default is False (regions are computed on their own).
+
+    Examples:
+    --------
+    >>> session = IndexSession(path='sst.mnmean.nc', var='sst')
+    >>> enso_index = global_sst_trend_and_enso(session=session, desired=['enso_index'])
+    >>> pdo_index = compute_pdo(session=session, desired=['pdo_index'])
+    """
+
+    def __init__(self, data=None, path=None, var=None, start_time=None, end_time=None, max_bytes=None,
+                 chunks=None, share_anomaly=False):
+        if data is None and not (path and var):
+            raise ValueError("Data must be provided either directly or via path and var.")
+
+        self.path = path
+        self.var = var
+        self.start_time = start_time
+        self.end_time = end_time
+        self.chunks = chunks
+        self.share_anomaly = share_anomaly
+        self.max_bytes = max_bytes if max_bytes is not None else DEFAULT_MAX_BYTES
+
+        if data is not None and (start_time is not None or end_time is not None):
+            data = data.sel(time=slice(start_time, end_time))
+        self._source = data
+        self._cache = OrderedDict()
+        self._sizes = {}
+
+
+    @property
+    def nbytes(self):
+        """Number of bytes currently held by the cache."""
+        return sum(self._sizes.values())
+
+
+    def clear(self):
+        """Drop every cached intermediate field."""
+        self._cache.clear()
+        self._sizes.clear()
+
+
+    def _get(self, key):
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        return None
+
+
+    def _put(self, key, value):
+        size = _held_bytes(value)
+        if size > self.max_bytes:
+            return value
+        self._cache[key] = value
+        self._sizes[key] = size
+        while self.nbytes > self.max_bytes:
+            old_key, _ = self._cache.popitem(last=False)
+            del self._sizes[old_key]
+        return value
+
+
+    def source(self):
+        """
+        Return the raw input field, loading it on first use.
+        """
+        if self._source is None:
+            self._source = load_data(self.path, self.var, start_time=self.start_time, end_time=self.end_time,
+                                     chunks=self.chunks)
+        return self._source
+
+
+    def standardized(self, to_range='0_360'):
+        """
+        Return the input renamed to (time, lat, lon), with longitudes in 'to_range' and latitudes descending.
+        """
+        key = ('standardized', to_range)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+        # Shallow copy so adjust_longitude never rewrites the coordinates of the caller's object
+        data = rename_dims_to_standard(self.source()).copy(deep=False)
+        data = adjust_latitude(adjust_longitude(data, to_range=to_range))
+        return self._put(key, data)
+
+
+    def anomaly(self, to_range='0_360', clim_start=None, clim_end=None, freq='month', region=None):
+        """
+        Return the anomaly field for the given base period, optionally restricted to a region.
+
+        Parameters:
+        ----------
+        to_range : str, optional
+            Longitude range, '0_360' or '-180_180'. Default is '0_360'.
+        clim_start, clim_end : int, optional
+            Climatology base period (if both None, the entire period is used).
+        freq : str, optional
+            Climatology grouping, 'month' or 'dayofyear'. Default is 'month'.
+        region : tuple, optional
+            (lat_s, lat_e, lon_s, lon_e) box. None bounds are not applied.
+
+        Returns:
+        -------
+        xarray.DataArray or xarray.Dataset
+            Anomalies with respect to the climatology of the base period.
+        """
+        key = ('anomaly', to_range, clim_start, clim_end, freq, region)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+
+        if region is not None:
+            full = self._get(('anomaly', to_range, clim_start, clim_end, freq, None))
+            if full is None and self.share_anomaly and _held_bytes(self.source()) <= self.max_bytes:
+                full = self.anomaly(to_range, clim_start=clim_start, clim_end=clim_end, freq=freq)
+            if full is not None:
+                # Anomalies are point-wise, so a cached global field can simply be cut
+                return self._put(key, _select_region(full, region))
+            field = _select_region(self.standardized(to_range), region)
+        else:
+            field = self.standardized(to_range)
+
+        return self._put(key, calculate_anomaly(field, clim_start=clim_start, clim_end=clim_end, freq=freq))
+
+
+    def mask(self, to_range='0_360'):
+        """
+        Return the valid (ocean) point mask of the input field, computed once per longitude range.
+        """
+        key = ('mask', to_range)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+        return self._put(key, valid_mask(self.standardized(to_range)).compute())
+
+
+    def compact(self, to_range='0_360', clim_start=None, clim_end=None, freq='month', region=None):
+        """
+        Return the anomaly field packed to its valid points as a CompactField (time, point).
+
+        A full-grid anomaly already held by the session is packed as is; otherwise the input field
+        is packed and the anomaly computed on the valid points only, so no full-grid copy is made.
+        """
+        key = ('compact', to_range, clim_start, clim_end, freq, region)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+        mask = _select_region(self.mask(to_range), region)
+        anomaly = self._get(('anomaly', to_range, clim_start, clim_end, freq, region))
+        if anomaly is not None:
+            with stage('compact', data=anomaly):
+                compact = CompactField.pack(anomaly, mask=mask)
+        else:
+            field = _select_region(self.standardized(to_range), region)
+            with stage('compact', data=field):
+                compact = CompactField.pack(field, mask=mask).anomaly(clim_start=clim_start, clim_end=clim_end,
+                                                                      freq=freq)
+        return self._put(key, compact)
+
+
+    def regression_maps(self, indices, lags=None, to_range='0_360', clim_start=None, clim_end=None, freq='month',
+        region=None):
+        """
+        Regression and correlation maps of the cached anomaly field on several indices (see
+        regression.regression_maps), reusing the packed anomaly of the session.
+        """
+        from .regression import regression_maps
+        compact = self.compact(to_range, clim_start=clim_start, clim_end=clim_end, freq=freq, region=region)
+        return regression_maps(compact, indices, lags=lags)
+
+
+    def climatology(self, to_range='0_360', clim_start=None, clim_end=None, freq='month'):
+        """
+        Return the climatology (month or dayofyear, lat, lon) of the base period, as removed by 'anomaly'.
+        """
+        key = ('climatology', to_range, clim_start, clim_end, freq)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+        data = self.standardized(to_range)
+        if clim_start is not None:
+            data = data.sel(time=slice(f'{clim_start}-01-01', f'{clim_end}-12-31'))
+        return self._put(key, data.groupby(f'time.{freq}').mean('time'))
+
+
+    def global_mean_sst(self, to_range='0_360', clim_start=None, clim_end=None, freq='month'):
+        """
+        Return the area-weighted global mean of the anomaly field.
+        """
+        from .indices import calculate_global_mean_sst
+
+        key = ('global_mean_sst', to_range, clim_start, clim_end, freq)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+        if self.standardized(to_range).chunks is None:
+            # Shares the packed ocean points with the other compaction-based kernels
+            compact = self.compact(to_range, clim_start=clim_start, clim_end=clim_end, freq=freq)
+            with stage('global_mean_sst', data=compact):
+                global_mean = compact.weighted_mean()
+        else:
+            anomaly = self.anomaly(to_range, clim_start=clim_start, clim_end=clim_end, freq=freq)
+            global_mean = calculate_global_mean_sst(anomaly, lat_name='lat', lon_name='lon', is_anomaly=True)
+        return self._put(key, global_mean)
@@ -0,0 +1,330 @@
+# significance.py
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+import numpy as np
+import xarray as xr
+
+from .compaction import CompactField
+
+
+SURROGATE_METHODS = ('phase', 'block')
+
+# Largest number of surrogates drawn per random stream. Batches never depend on 'n_jobs', so
+# neither do the results
+SURROGATE_BATCH = 100
+
+# Approximate working memory of one regression batch (per thread) in bytes
+SURROGATE_BATCH_BYTES = 2**26
+
+
+def default_block_size(n_time):
+    """Block length of the moving block bootstrap, n**(1/3) rounded (at least 1)."""
+    return max(1, int(round(n_time ** (1 / 3))))
+
+
+def _batches(n_surrogates, seed, batch_size=SURROGATE_BATCH):
+    """(size, Generator) pairs with independent streams spawned from 'seed'."""
+    sizes = [batch_size] * (n_surrogates // batch_size)
+    if n_surrogates % batch_size:
+        sizes.append(n_surrogates % batch_size)
+    streams = np.random.SeedSequence(seed).spawn(len(sizes))
+    return [(size, np.random.default_rng(stream)) for size, stream in zip(sizes, streams)]
+
+
+def _block_indices(n_time, n_surrogates, block_size, rng):
+    """Time indices (surrogate, time) of a circular moving block bootstrap."""
+    n_blocks = -(-n_time // block_size)
+    starts = rng.integers(0, n_time, size=(n_surrogates, n_blocks, 1))
+    indices = (starts + np.arange(block_size)) % n_time
+    return indices.reshape(n_surrogates, -1)[:, :n_time]
+
+
+def _block_counts(n_time, n_surrogates, block_size, rng):
+    """How often every time step is drawn by each block bootstrap sample, (surrogate, time)."""
+    indices = _block_indices(n_time, n_surrogates, block_size, rng)
+    flat = (indices + n_time * np.arange(n_surrogates)[:, np.newaxis]).ravel()
+    return np.bincount(flat, minlength=n_surrogates * n_time).reshape(n_surrogates, n_time).astype(np.float64)
+
+
+def _phase_randomized(series, n_surrogates, rng):
+    """
+    Surrogates (surrogate, k, time) of the series (k, time) with the same power spectra.
+
+    All k series share the random phases, which keeps their cross-correlation.
+    """
+    n_time = series.shape[-1]
+    mean = series.mean(axis=-1, keepdims=True)
+    spectrum = np.fft.rfft(series - mean, axis=-1)
+    phases = rng.uniform(0, 2 * np.pi, size=(n_surrogates, 1, spectrum.shape[-1]))
+    phases[..., 0] = 0
+    if n_time % 2 == 0:
+        phases[..., -1] = 0
+    return np.fft.irfft(spectrum * np.exp(1j * phases), n=n_time, axis=-1) + mean
+
+
+def _null_series(series, n_surrogates, method, block_size, rng):
+    """Null surrogates (surrogate, k, time) that keep the autocorrelation of 'series'."""
+    if method == 'phase':
+        return _phase_randomized(series, n_surrogates, rng)
+    indices = _block_indices(series.shape[-1], n_surrogates, block_size, rng)
+    return np.moveaxis(series[:, indices], 0, 1)
+
+
+def _check_method(method, block_size, n_time):
+    if method not in SURROGATE_METHODS:
+        raise ValueError(f"Invalid method {method!r}. Use one of {SURROGATE_METHODS}.")
+    return default_block_size(n_time) if block_size is None else int(block_size)
+
+
+def surrogates(series, n_surrogates=1000, method='phase', block_size=None, seed=0):
+    """
+    Surrogate time series with the autocorrelation of 'series' but no relation to anything else.
+
+    Parameters:
+    series (xarray.DataArray): Index time series with dimension 'time', optionally with one more
+                               dimension (e.g. 'mode') for several series that keep their cross-correlation.
+    n_surrogates (int, optional): Number of surrogates. Default is 1000.
+    method (str, optional): 'phase' for phase randomization (same power spectrum) or 'block' for a
+                            circular moving block bootstrap. Default is 'phase'.
+    block_size (int, optional): Block length in time steps for 'block'. Default is n_time**(1/3).
+    seed (int, optional): Seed of the random streams. Default is 0.
+
+    Returns:
+    xarray.DataArray: Surrogates with a leading 'surrogate' dimension.
+    """
+    series = series.transpose('time', ...)
+    values = np.asarray(series.values, dtype=np.float64).reshape(series.sizes['time'], -1).T
+    block_size = _check_method(method, block_size, values.shape[-1])
+    out = np.concatenate([_null_series(values, size, method, block_size, rng)
+                          for size, rng in _batches(n_surrogates, seed)])
+    out = np.moveaxis(out, -1, 1).reshape((n_surrogates,) + series.shape)
+    return xr.DataArray(out, dims=('surrogate',) + series.dims, coords=series.coords, name=series.name)
+
+
+def _regression_batch_size(n_series, n_points):
+    """
+    Surrogates per regression batch, so that the (surrogate, k, point) buffers of a batch stay
+    within SURROGATE_BATCH_BYTES.
+    """
+    # Null slopes, resampled cross products and bootstrap slopes, all float64
+    per_surrogate = 3 * 8 * n_series * max(n_points, 1)
+    return int(np.clip(SURROGATE_BATCH_BYTES // per_surrogate, 1, SURROGATE_BATCH))
+
+
+def _slopes_batch(X, y, slope, size, rng, method, block_size):
+    """
+    Null exceedance counts and bootstrap slopes for one batch of surrogates.
+
+    X is the centred (time, point) field, y the centred (k, time) series and slope their
+    (k, point) regression.
+    """
+    # Null distribution: every surrogate series against the field, one matrix product
+    null = _null_series(y, size, method, block_size, rng)                 # (s, k, time)
+    null -= null.mean(axis=-1, keepdims=True)
+    k, n_time = y.shape
+    null_slopes = (null.reshape(size * k, n_time) @ X).reshape(size, k, -1)
+    null_slopes /= (null * null).sum(axis=-1)[..., np.newaxis]
+    exceed = (np.abs(null_slopes) >= np.abs(slope)).sum(axis=0)
+
+    # Confidence interval: paired block bootstrap written as resampling counts, so that each
+    # resampled regression is a handful of (s, time) @ (time, point) products
+    w = _block_counts(n_time, size, block_size, rng)                    # (s, time)
+    Sx = w @ X                                                             # (s, point)
+    Sy = w @ y.T                                                           # (s, k)
+    Syy = w @ (y * y).T
+    Sxy = ((w[:, np.newaxis, :] * y).reshape(size * k, n_time) @ X).reshape(size, k, -1)
+    boot = (Sxy - Sx[:, np.newaxis, :] * Sy[..., np.newaxis] / n_time) \
+        / (Syy - Sy * Sy / n_time)[..., np.newaxis]
+    return exceed, boot.astype(np.float32)
+
+
+def _thread_limits(n_jobs):
+    """Keep BLAS single-threaded while the surrogate batches run on several threads."""
+    if n_jobs == 1:
+        return nullcontext()
+    try:
+        from threadpoolctl import threadpool_limits
+        return threadpool_limits(limits=1, user_api='blas')
+    except ImportError:
+        return nullcontext()
+
+
+def regression_significance(field, index, n_surrogates=1000, method='phase', block_size=None, alpha=0.05,
+    seed=0, n_jobs=None, mask=None):
+    """
+    Significance and confidence intervals of the regression map of a field on one or more indices.
+
+    The regression slope cov(field, index) / var(index) at every grid point is tested against
+    surrogate indices without any relation to the field (phase randomization or block bootstrap,
+    both keeping the autocorrelation of the index). All surrogates of a batch are regressed
+    with one matrix product against the packed (time, point) field. Confidence intervals come
+    from a paired moving block bootstrap of (field, index), written as resampling counts so that
+    the field is never copied. Batches use fixed random streams spawned from 'seed' and run on
+    'n_jobs' threads; the result does not depend on 'n_jobs'. Batches are sized so that each
+    thread holds about SURROGATE_BATCH_BYTES of temporaries whatever the size of the field.
+
+    Points with missing values in time are left NaN.
+
+    Parameters:
+    ----------
+    field : xarray.DataArray or CompactField
+        Anomaly field (time, lat, lon), or an already packed field.
+    index : xarray.DataArray
+        Index series (time), or several series (time, k) such as PCs with a 'mode' dimension.
+    n_surrogates : int, optional
+        Number of surrogates and of bootstrap samples. Default is 1000.
+    method : str, optional
+        Null surrogates: 'phase' (default) or 'block'.
+    block_size : int, optional
+        Block length in time steps of the bootstraps. Default is n_time**(1/3).
+    alpha : float, optional
+        Confidence intervals cover 1 - alpha. Default is 0.05.
+    seed : int, optional
+        Seed of the random streams. Default is 0.
+    n_jobs : int, optional
+        Number of threads. Default is the number of CPUs.
+    mask : xarray.DataArray, optional
+        Valid-point mask used when packing 'field' (see valid_mask).
+
+    Returns:
+    -------
+    xarray.Dataset
+        'regression', 'p_value' (two-sided), 'ci_lower' and 'ci_upper' on the grid of the field,
+        with the extra dimension of 'index' if any.
+    """
+    compact = field if isinstance(field, CompactField) else CompactField.pack(field.compute(), mask=mask)
+    series = index.transpose(compact.sample_dim, ...)
+    extra_dims = series.dims[1:]
+    y = np.asarray(series.values, dtype=np.float64).reshape(series.shape[0], -1).T   # (k, time)
+
+    finite = np.isfinite(y).all(axis=0)
+    n = compact.n_complete
+    X = compact.values[finite, :n].astype(np.float64)
+    X -= X.mean(axis=0)
+    y = y[:, finite]
+    y -= y.mean(axis=-1, keepdims=True)
+    block_size = _check_method(method, block_size, y.shape[-1])
+
+    slope = (y @ X) / (y * y).sum(axis=-1, keepdims=True)
+    n_jobs = n_jobs or os.cpu_count() or 1
+    with _thread_limits(n_jobs), ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        results = list(executor.map(lambda batch: _slopes_batch(X, y, slope, *batch, method, block_size),
+                                    _batches(n_surrogates, seed, _regression_batch_size(*slope.shape))))
+
+    exceed = sum(result[0] for result in results)
+    boot = np.concatenate([result[1] for result in results])
+    lower, upper = np.quantile(boot, [alpha / 2, 1 - alpha / 2], axis=0)
+
+    def to_grid(values, name):
+        full = np.full(y.shape[:1] + (compact.n_points,), np.nan)
+        full[:, :n] = values
+        full = full.reshape(tuple(series.sizes[dim] for dim in extra_dims) + (compact.n_points,))
+        return compact.unpack(full, dims=extra_dims, coords={dim: series[dim] for dim in extra_dims
+                                                             if dim in series.coords}, name=name)
+
+    result = xr.Dataset({
+        'regression': to_grid(slope, 'regression'),
+        'p_value': to_grid((exceed + 1) / (n_surrogates + 1), 'p_value'),
+        'ci_lower': to_grid(lower, 'ci_lower'),
+        'ci_upper': to_grid(upper, 'ci_upper'),
+    })
+    result.attrs.update(n_surrogates=n_surrogates, method=method, block_size=block_size, alpha=alpha, seed=seed)
+    return result
+
+
+def explained_variance_significance(data, n_modes=10, n_surrogates=1000, block_size=None, alpha=0.05, seed=0,
+    use_coslat=True, standardize=False, n_jobs=None, mask=None):
+    """
+    Block-bootstrap confidence intervals of the explained variance ratios of unrotated EOFs.
+
+    The field is reduced once to its (time, time) Gram matrix. A resampled record then only
+    changes the weights of the time steps, so the leading eigenvalues of every bootstrap sample
+    follow from a small symmetric eigenproblem; the field is not decomposed again.
+
+    Modes within a near-degenerate (noise) part of the spectrum are biased upward by the
+    resampling, and their interval may not contain the estimate; 'bias' shows the size of
+    the effect. Such modes are not separated from their neighbours.
+
+    Parameters:
+    ----------
+    data : xarray.DataArray or CompactField
+        Anomaly field (time, lat, lon) as passed to compute_rotated_eofs.
+    n_modes : int, optional
+        Number of modes. Default is 10.
+    n_surrogates : int, optional
+        Number of bootstrap samples. Default is 1000.
+    block_size : int, optional
+        Block length in time steps. Default is n_time**(1/3).
+    alpha : float, optional
+        Confidence intervals cover 1 - alpha. Default is 0.05.
+    seed : int, optional
+        Seed of the random streams. Default is 0.
+    use_coslat : bool, optional
+        Weight by the square root of the cosine of latitude, as the EOF fit. Default is True.
+    standardize : bool, optional
+        Scale every point to unit variance, as the EOF fit. Default is False.
+    n_jobs : int, optional
+        Number of threads. Default is the number of CPUs.
+    mask : xarray.DataArray, optional
+        Valid-point mask used when packing 'data'.
+
+    Returns:
+    -------
+    xarray.Dataset
+        'explained_variance_ratio', 'ci_lower', 'ci_upper' and 'bias' (bootstrap mean minus
+        estimate) along 'mode' (1-based).
+    """
+    from scipy.linalg import eigh
+
+    compact = data if isinstance(data, CompactField) else CompactField.pack(data.compute(), mask=mask)
+    n = compact.n_complete
+    X = compact.values[:, :n].astype(np.float64)
+    X -= X.mean(axis=0)
+    if standardize:
+        # Constant points carry no variance; leave them at zero instead of dividing by it
+        std = X.std(axis=0)
+        X *= np.where(std > 0, 1 / np.where(std > 0, std, 1), 0)
+    if use_coslat:
+        X *= np.sqrt(np.cos(np.deg2rad(compact.point_coords('lat')[:n])))
+    n_time = X.shape[0]
+    block_size = default_block_size(n_time) if block_size is None else int(block_size)
+
+    # Factor F with F F^T = X X^T in the smaller of the two spaces
+    if X.shape[1] <= n_time:
+        F = X
+    else:
+        eigenvalues, eigenvectors = np.linalg.eigh(X @ X.T)
+        F = eigenvectors * np.sqrt(np.clip(eigenvalues, 0, None))
+    rank = F.shape[1]
+    n_modes = min(n_modes, rank)
+    gram_diagonal = (F * F).sum(axis=1)
+
+    def ratios(w):
+        # Resampled, re-centred covariance in factor space: F^T (diag(w) - w w^T / n) F
+        Fw = F.T @ w
+        M = (F.T * w) @ F - np.outer(Fw, Fw) / n_time
+        leading = eigh(M, eigvals_only=True, subset_by_index=[rank - n_modes, rank - 1])[::-1]
+        return leading / (w @ gram_diagonal - Fw @ Fw / n_time)
+
+    def batch(args):
+        size, rng = args
+        return np.array([ratios(w) for w in _block_counts(n_time, size, block_size, rng)])
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    with _thread_limits(n_jobs), ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        boot = np.concatenate(list(executor.map(batch, _batches(n_surrogates, seed))))
+
+    estimate = ratios(np.ones(n_time))
+    lower, upper = np.quantile(boot, [alpha / 2, 1 - alpha / 2], axis=0)
+    mode = np.arange(1, n_modes + 1)
+    result = xr.Dataset({
+        'explained_variance_ratio': ('mode', estimate),
+        'ci_lower': ('mode', lower),
+        'ci_upper': ('mode', upper),
+        'bias': ('mode', boot.mean(axis=0) - estimate),
+    }, coords={'mode': mode})
+    result.attrs.update(n_surrogates=n_surrogates, method='block', block_size=block_size, alpha=alpha, seed=seed)
+    return result
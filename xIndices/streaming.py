@@ -0,0 +1,154 @@
+# streaming.py
+
+import glob
+import os
+import time
+
+import xarray as xr
+
+from .preprocess_data import rename_dims_to_standard, adjust_longitude, adjust_latitude
+from .climatology import ClimatologyAccumulator, calculate_anomaly_from
+from .eof_model import EOFModel
+
+
+def watch_files(directory, pattern='*.nc', poll_interval=60.0, once=False, state_file=None, min_age=5.0,
+    timeout=None):
+    """
+    Yield the paths of new files in a directory as they appear, in name order.
+
+    A file is handed out once it has not been modified for 'min_age' seconds, so that files
+    still being written are skipped until the next poll. It counts as processed when the next
+    path is requested or the generator is closed (e.g. by breaking out of the loop after the
+    file is handled), and is then appended to 'state_file', so that a restarted pipeline
+    resumes where it stopped.
+
+    Parameters:
+    directory (str): Directory to watch.
+    pattern (str, optional): Glob pattern of the input files. Default is '*.nc'.
+    poll_interval (float, optional): Seconds between two scans. Default is 60.
+    once (bool, optional): Scan once and stop, e.g. from a cron job. Default is False.
+    state_file (str, optional): Text file with the processed paths, one per line. Default is None (in memory).
+    min_age (float, optional): Seconds since the last modification before a file is used. Default is 5.
+    timeout (float, optional): Stop after this many seconds without a new file. Default is None (never).
+
+    Yields:
+    str: Path of the next new file.
+    """
+    done = set()
+    if state_file is not None and os.path.exists(state_file):
+        with open(state_file) as f:
+            done.update(line.strip() for line in f if line.strip())
+
+    def record(path):
+        done.add(path)
+        if state_file is not None:
+            with open(state_file, 'a') as f:
+                f.write(path + '\n')
+
+    idle_since = time.monotonic()
+    while True:
+        now = time.time()
+        new = [path for path in sorted(glob.glob(os.path.join(directory, pattern)))
+               if path not in done and now - os.path.getmtime(path) >= min_age]
+        for path in new:
+            try:
+                yield path
+            except GeneratorExit:
+                # close() raises at the yield, after the consumer is done with the path
+                record(path)
+                raise
+            record(path)
+        if once:
+            return
+        if new:
+            idle_since = time.monotonic()
+        elif timeout is not None and time.monotonic() - idle_since >= timeout:
+            return
+        time.sleep(poll_interval)
+
+
+def read_fields(paths, var=None):
+    """
+    Read every file into memory and close it. Yields (path, field) pairs.
+
+    Parameters:
+    paths (iterable of str): Input files, e.g. from watch_files.
+    var (str, optional): Variable to read. Default is the only data variable of the file.
+    """
+    for path in paths:
+        with xr.open_dataset(path) as ds:
+            field = ds[var] if var is not None else ds[list(ds.data_vars)[0]]
+            yield path, field.load()
+
+
+def standardize_fields(items, to_range='0_360'):
+    """
+    Standard dimension names, 'to_range' longitudes and descending latitudes for every field,
+    as in IndexSession. Yields (path, field) pairs.
+    """
+    for path, field in items:
+        field = rename_dims_to_standard(field)
+        yield path, adjust_latitude(adjust_longitude(field, to_range=to_range))
+
+
+def anomaly_fields(items, climatology, freq='month'):
+    """
+    Anomalies of every field against a stored climatology. Yields (path, anomaly) pairs.
+
+    Parameters:
+    items (iterable): (path, field) pairs, e.g. from standardize_fields.
+    climatology (xarray.DataArray, ClimatologyAccumulator or EOFModel): The climatology. An
+        EOFModel uses its own climatology and region, and removes the global mean anomaly when
+        the model was fitted that way.
+    freq (str, optional): 'month' or 'dayofyear' for a DataArray climatology. Default is 'month'.
+    """
+    for path, field in items:
+        if isinstance(climatology, EOFModel):
+            anomaly = climatology.anomaly(field)
+        elif isinstance(climatology, ClimatologyAccumulator):
+            anomaly = climatology.anomaly(field)
+        else:
+            anomaly = calculate_anomaly_from(field, climatology, freq=freq)
+        yield path, anomaly
+
+
+def project_fields(items, model, mode=None):
+    """
+    Index values of every anomaly field by projection onto a fitted model. Yields (path, index) pairs.
+
+    Parameters:
+    items (iterable): (path, anomaly) pairs, e.g. from anomaly_fields.
+    model (EOFModel): Fitted or loaded model (see load_eof_model).
+    mode (int, optional): Mode of the index. Default is the mode of the index function.
+    """
+    for path, anomaly in items:
+        yield path, model.index_from_anomaly(anomaly, mode=mode)
+
+
+def index_stream(directory, model, var=None, pattern='*.nc', mode=None, **watch_kwargs):
+    """
+    Index values for every new monthly file in a directory, without re-reading the record.
+
+    Chains watch_files -> read_fields -> standardize_fields -> anomaly_fields -> project_fields.
+    Every step works on the time steps of one file only, so memory stays bounded by one file
+    whatever the length of the record.
+
+    Parameters:
+    directory (str): Directory receiving the monthly files.
+    model (EOFModel): Fitted or loaded model holding the patterns and the climatology.
+    var (str, optional): Variable to read from the files.
+    pattern (str, optional): Glob pattern of the input files. Default is '*.nc'.
+    mode (int, optional): Mode of the index. Default is the mode of the index function.
+    **watch_kwargs: Passed on to watch_files (poll_interval, once, state_file, min_age, timeout).
+
+    Yields:
+    tuple: (path, index values of the time steps of that file).
+
+    Examples:
+    >>> model = load_eof_model('pdo_model.nc')
+    >>> for path, pdo in index_stream('incoming/', model, var='sst', state_file='done.txt'):
+    ...     write_zarr(pdo.to_dataset(name='pdo_index'), 'pdo_index.zarr', append_dim='time')
+    """
+    paths = watch_files(directory, pattern=pattern, **watch_kwargs)
+    fields = standardize_fields(read_fields(paths, var=var), to_range=model.metadata.get('to_range', '0_360'))
+    return project_fields(anomaly_fields(fields, model), model, mode=mode)
@@ -1,14 +1,16 @@
 # anomaly.py
+import collections
+import functools
+import warnings
 import xarray as xr
 import numpy as np
-import xeofs
-import matplotlib.pyplot as plt
-import cartopy
-import cartopy.crs as ccrs
-import cartopy.feature as cfeature
-from cartopy.util import add_cyclic_point#(data, coord=None, axis=-1) 
+from .instrumentation import instrumented, stage
 
+# xeofs, matplotlib and cartopy take seconds to import, so they are only imported by the
+# functions that need them; headless workers that never fit or plot do not load them.
 
+
+@instrumented
 def compute_weights(data, lat_dim=None):
     """
     Compute weights based on the cosine of latitude values.
@@ -24,17 +26,149 @@ def compute_weights(data, lat_dim=None):
         lat_dim='lat'
     return np.cos(np.deg2rad(data[f'{lat_dim}']))
 
-def calculate_anomaly(data, clim_start=None, climatology_dim='time', clim_end=None, freq='month'):   
+@instrumented
+def area_weighted_coarsen(data, lat_factor, lon_factor, lat_dim='lat', lon_dim='lon'):
+    """
+    Average a gridded field over blocks of lat_factor x lon_factor cells, weighting every cell by its area.
+
+    Cells are weighted by the cosine of their latitude. NaN cells (e.g. land) are left out of the
+    block mean, and a block without valid cells stays NaN. Rows and columns left over at the end
+    form smaller blocks. The coordinates of a block are the means of those of its cells.
+
+    Parameters:
+    data (xarray.DataArray): Field with lat_dim and lon_dim, and any other dimensions.
+    lat_factor (int): Number of latitudes per block.
+    lon_factor (int): Number of longitudes per block.
+    lat_dim (str, optional): Latitude dimension. Default is 'lat'.
+    lon_dim (str, optional): Longitude dimension. Default is 'lon'.
+
+    Returns:
+    xarray.DataArray: The coarsened field, with the dimension order of 'data'.
+    """
+    if lat_factor <= 1 and lon_factor <= 1:
+        return data
+    order = data.dims
+    data = data.transpose(..., lat_dim, lon_dim)
+    values = np.asarray(data.values, dtype=np.float64)
+    n_lat, n_lon = values.shape[-2:]
+    pad_lat, pad_lon = -n_lat % lat_factor, -n_lon % lon_factor
+
+    def blocks(array, fill):
+        array = np.pad(array, [(0, 0)] * (array.ndim - 2) + [(0, pad_lat), (0, pad_lon)], constant_values=fill)
+        return array.reshape(array.shape[:-2] + (array.shape[-2] // lat_factor, lat_factor,
+                                                 array.shape[-1] // lon_factor, lon_factor))
+
+    weights = np.broadcast_to(np.cos(np.deg2rad(data[lat_dim].values))[:, np.newaxis], (n_lat, n_lon))
+    valid = np.isfinite(values)
+    weights = np.where(valid, weights, 0)
+    total = blocks(np.where(valid, values, 0) * weights, 0).sum(axis=(-3, -1))
+    weight_sum = blocks(weights, 0).sum(axis=(-3, -1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        coarse = np.where(weight_sum > 0, total / weight_sum, np.nan)
+
+    def block_coord(coord, factor, pad):
+        return np.nanmean(np.pad(coord.astype(np.float64), (0, pad), constant_values=np.nan).reshape(-1, factor), axis=1)
+
+    coords = {name: coord for name, coord in data.coords.items() if lat_dim not in coord.dims and lon_dim not in coord.dims}
+    coords[lat_dim] = block_coord(data[lat_dim].values, lat_factor, pad_lat)
+    coords[lon_dim] = block_coord(data[lon_dim].values, lon_factor, pad_lon)
+    coarse = xr.DataArray(coarse, dims=data.dims, coords=coords, name=data.name, attrs=data.attrs)
+    for dim in (lat_dim, lon_dim):
+        coarse[dim].attrs = data[dim].attrs
+    return coarse.transpose(*order)
+
+
+def quicklook_factors(n_lat, n_lon, width, height):
+    """
+    Block sizes (lat_factor, lon_factor) bringing an n_lat x n_lon grid down to at most about one
+    cell per pixel of a width x height pixel image.
+    """
+    return max(1, int(np.ceil(n_lat / max(height, 1)))), max(1, int(np.ceil(n_lon / max(width, 1))))
+
+
+def _monthly_anomaly(data, clim_start=None, clim_end=None, climatology_dim='time'):
+    """
+    Fast path of calculate_anomaly for gap-free monthly series held in memory.
+
+    Every calendar month is a strided (year, ...) view of the time axis, so the climatology is
+    one reduction per month and the anomaly one broadcast subtraction per month, without the
+    per-group gathering of groupby. Points without gaps are summed exactly like the groupby mean,
+    and only points containing NaN go through nanmean, so the values are identical.
+    Returns None when the data does not qualify (Dataset, dask-backed, non-float, daily or gappy
+    time axis, base period without every calendar month), so the caller falls back to groupby.
+    """
+    if not isinstance(data, xr.DataArray) or climatology_dim not in data.dims or data.chunks is not None:
+        return None
+    if not np.issubdtype(data.dtype, np.floating):
+        return None
+
+    try:
+        years = data[climatology_dim].dt.year.values
+        months = data[climatology_dim].dt.month.values
+    except (AttributeError, TypeError):
+        return None
+    month_stamp = years * 12 + months - 1
+    if years.size < 12 or not np.all(np.diff(month_stamp) == 1):
+        return None
+
+    if clim_start is None:
+        base_index = np.arange(years.size)
+    else:
+        base_index = np.flatnonzero((years >= int(clim_start)) & (years <= int(clim_end)))
+    if base_index.size < 12:
+        return None
+
+    axis = data.get_axis_num(climatology_dim)
+    values = np.moveaxis(data.values, axis, 0)
+    base = values[base_index[0]:base_index[-1] + 1]
+
+    climatology = np.empty((12,) + values.shape[1:], dtype=values.dtype)
+    for offset in range(12):
+        rows = base[offset::12]
+        mean = np.add.reduce(rows, axis=0) / rows.shape[0]
+        gaps = np.isnan(mean)
+        if gaps.any():
+            # NaN-skipping mean of the gappy points, accumulated year by year in the same
+            # order as the reduction above so that the result matches nanmean bit for bit
+            total = np.zeros(int(gaps.sum()), dtype=values.dtype)
+            count = np.zeros(total.shape, dtype=np.intp)
+            for row in rows:
+                row = row[gaps]
+                valid = ~np.isnan(row)
+                total += np.where(valid, row, 0)
+                count += valid
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', category=RuntimeWarning)   # all-NaN (land) points
+                mean[gaps] = np.where(count > 0, total / count, np.nan)
+        climatology[months[base_index[0] + offset] - 1] = mean
+
+    anomaly = np.empty_like(values)
+    for offset in range(12):
+        np.subtract(values[offset::12], climatology[months[offset] - 1], out=anomaly[offset::12])
+
+    anomaly = data.copy(data=np.moveaxis(anomaly, 0, axis))
+    return anomaly.assign_coords(month=(climatology_dim, months))
+
+
+@instrumented
+def calculate_anomaly(data, clim_start=None, climatology_dim='time', clim_end=None, freq='month', n_harmonics=None):
 
     """
     Calculate anomalies by subtracting the climatology from the data.
 
+    Gap-free monthly DataArrays held in memory take a vectorized (year, month) reshape path;
+    other inputs (daily, gappy, Dataset or dask-backed data) use groupby. Both give the same values.
+    With freq='dayofyear' and n_harmonics set, the daily climatology is instead fitted as the
+    first n_harmonics annual harmonics (see climatology.HarmonicClimatology), which is smoother
+    than 366 separate day means and much cheaper for long or dask-backed records.
+
     Parameters:
     data (xarray.DataArray or xarray.Dataset): The input data from which to calculate anomalies.
     clim_start (str, optional): The start year for the climatology period in 'YYYY' format. If None, the entire period is used.
     climatology_dim (str, optional): The dimension over which to calculate the climatology. Default is 'time'.
     clim_end (str, optional): The end year for the climatology period in 'YYYY' format. If None, the entire period is used.
     freq (str, optional): The frequency for grouping the data. Must be either 'month' or 'dayofyear'. Default is 'month'.
+    n_harmonics (int, optional): Number of annual harmonics of a smoothed daily climatology (freq='dayofyear' only). Default is None (day-of-year means).
 
     Returns:
     xarray.DataArray or xarray.Dataset: The anomalies calculated by subtracting the climatology from the data.
@@ -43,6 +177,25 @@ def calculate_anomaly(data, clim_start=None, climatology_dim='time', clim_end=No
     ValueError: If the frequency is not 'month' or 'dayofyear'.
     """
 
+    if n_harmonics is not None:
+        if freq != 'dayofyear':
+            raise ValueError('n_harmonics requires freq="dayofyear".')
+        from .climatology import HarmonicClimatology
+
+        def harmonic_anomaly(field):
+            if climatology_dim not in field.dims:
+                return field
+            climatology = HarmonicClimatology(n_harmonics, clim_start=clim_start, clim_end=clim_end,
+                                              time_dim=climatology_dim).update(field)
+            return climatology.anomaly(field)
+
+        return data.map(harmonic_anomaly) if isinstance(data, xr.Dataset) else harmonic_anomaly(data)
+
+    if freq == 'month':
+        anomaly = _monthly_anomaly(data, clim_start=clim_start, clim_end=clim_end, climatology_dim=climatology_dim)
+        if anomaly is not None:
+            return anomaly
+
     if clim_start is None:
         if freq == 'month':
             return data.groupby(f'{climatology_dim}.{freq}') - data.groupby(f'{climatology_dim}.{freq}').mean((f'{climatology_dim}'))
@@ -56,7 +209,8 @@ def calculate_anomaly(data, clim_start=None, climatology_dim='time', clim_end=No
 
 
 
-def line_plot(data, figsize=None, dpi=None, variance_fraction=None, color=None, label=None):
+@instrumented
+def line_plot(data, figsize=None, dpi=None, variance_fraction=None, color=None, label=None, path=None):
     """
     Plots a line graph for the given data.
 
@@ -67,6 +221,8 @@ def line_plot(data, figsize=None, dpi=None, variance_fraction=None, color=None,
     variance_fraction (float, optional): A variance fraction value to be displayed on the plot. Defaults to None.
     color (str, optional): The color of the line plot. Defaults to None.
     label (str, optional): The label for the plot. Defaults to None.
+    path (str, optional): Save the figure to this file and close it instead of showing it. For many
+                          plots, see rendering.render_lines. Defaults to None.
 
     Returns:
     None
@@ -74,6 +230,7 @@ def line_plot(data, figsize=None, dpi=None, variance_fraction=None, color=None,
     Raises:
     Exception: If an error occurs during plotting, it prints an error message.
     """
+    import matplotlib.pyplot as plt
 
 
     try:
@@ -92,13 +249,18 @@ def line_plot(data, figsize=None, dpi=None, variance_fraction=None, color=None,
             # ax.set_title(f'{label}', loc=title_loc, color=color)
             ax.set_title('', loc='center', color='w')
             ax.legend(frameon=False)
-            plt.show()
+            if path is not None:
+                plt.savefig(path)
+                plt.close()
+            else:
+                plt.show()
     except Exception as e:
         return print(f"Error while plotting: {e}")
 
 
 
-def contour_plot(data, projection=None, figsize=None, dpi=None, cmap=None, extend=None, levels=None, central_lon=None, central_lat=None, ax_global=False):
+@instrumented
+def contour_plot(data, projection=None, figsize=None, dpi=None, cmap=None, extend=None, levels=None, central_lon=None, central_lat=None, ax_global=False, path=None, quicklook=False):
     """
     Generate a contour plot for the given data.
     Parameters:
@@ -112,9 +274,18 @@ def contour_plot(data, projection=None, figsize=None, dpi=None, cmap=None, exten
     central_lon (float, optional): The central longitude for the projection. Defaults to 0.
     central_lat (float, optional): The central latitude for the projection. Defaults to 0.
     ax_global (bool, optional): Whether to set the axis to global. Defaults to False.
+    path (str, optional): Save the figure to this file and close it. For many maps, see rendering.render_maps. Defaults to None.
+    quicklook (bool, optional): Draw a raster preview instead of filled contours: the field is block-averaged
+                                (area-weighted, see area_weighted_coarsen) to about one cell per pixel of the axes
+                                and drawn with pcolormesh, so the time depends on the figure size, not on the grid.
+                                Defaults to False.
     Returns:
     None
     """
+    import matplotlib.pyplot as plt
+    import cartopy.crs as ccrs
+    import cartopy.feature as cfeature
+    from cartopy.util import add_cyclic_point
 
 
     try:
@@ -129,36 +300,149 @@ def contour_plot(data, projection=None, figsize=None, dpi=None, cmap=None, exten
             ax = plt.axes(projection=projection)
             lon=data.lon
             if levels == None:
-                levels=list(np.linspace(data.min(), data.max(), 10))
-            if (lon.min() <= -178 and lon.max() >= 178) or (lon.min() <= 2. and lon.max() >= 357.):
-                cyclic_data, cyclic_lon = add_cyclic_point(data, coord=lon)
-
-                cyclic_data = xr.DataArray(
-                    cyclic_data, 
-                    dims=data.dims,  # Keep the same dimensions
-                    coords={**data.coords, 'lon': cyclic_lon},  # Replace the original longitude with cyclic longitude
-                    attrs=data.attrs  # Copy the original attributes
-                )
+                levels=list(np.linspace(float(data.min()), float(data.max()), 10))
+            if quicklook:
+                # Mesh cells span the seam of global grids, so no cyclic point is needed
                 if ax_global==True:
                     ax.set_global()
-                 
-                data = cyclic_data#.plot.contourf(levels=levels, cmap=cmap, extend=extend, transform=ccrs.PlateCarree())
-            # else:
-            data.plot.contourf(levels=levels, cmap=cmap, extend=extend, transform=ccrs.PlateCarree())
+                factors = quicklook_factors(data.sizes['lat'], data.sizes['lon'], ax.bbox.width, ax.bbox.height)
+                data = area_weighted_coarsen(data, *factors)
+                data.plot.pcolormesh(levels=levels, cmap=cmap, extend=extend, transform=ccrs.PlateCarree(), rasterized=True)
+            else:
+                if (lon.min() <= -178 and lon.max() >= 178) or (lon.min() <= 2. and lon.max() >= 357.):
+                    cyclic_data, cyclic_lon = add_cyclic_point(data, coord=lon)
+
+                    cyclic_data = xr.DataArray(
+                        cyclic_data, 
+                        dims=data.dims,  # Keep the same dimensions
+                        coords={**data.coords, 'lon': cyclic_lon},  # Replace the original longitude with cyclic longitude
+                        attrs=data.attrs  # Copy the original attributes
+                    )
+                    if ax_global==True:
+                        ax.set_global()
+                     
+                    data = cyclic_data#.plot.contourf(levels=levels, cmap=cmap, extend=extend, transform=ccrs.PlateCarree())
+                # else:
+                data.plot.contourf(levels=levels, cmap=cmap, extend=extend, transform=ccrs.PlateCarree())
             # ax.coastlines()
             # ax.cfeature()
             ax.add_feature(cfeature.LAND, facecolor='grey')
             ax.add_feature(cfeature.OCEAN, facecolor='w')
             ax.add_feature(cfeature.COASTLINE)
+            if path is not None:
+                plt.savefig(path)
+                plt.close()
     except Exception as e:
         return print(f"Error while plotting: {e}")
 
 
 
-def compute_rotated_eofs(data, rotated=None, n_modes=None, standardize=None, use_coslat=None):
+EOF_SOLVERS = ('auto', 'full', 'randomized', 'gram')
+
+
+def _gram_svd(X, n_components):
+    """
+    Truncated SVD of a (sample, feature) matrix through the eigendecomposition of its Gram matrix.
+
+    The Gram matrix is built on the shorter side, X @ X.T when there are fewer samples (time steps)
+    than features (grid points) and X.T @ X otherwise, so the dense eigenproblem is only
+    min(n_samples, n_features) wide.
+    """
+    n_samples, n_features = X.shape
+    if n_samples <= n_features:
+        eigenvalues, U = np.linalg.eigh(X @ X.T)
+        order = np.argsort(eigenvalues)[::-1][:n_components]
+        s = np.sqrt(np.clip(eigenvalues[order], 0, None))
+        U = U[:, order]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            VT = np.where(s[:, np.newaxis] > 0, (U.T @ X) / s[:, np.newaxis], 0)
+    else:
+        eigenvalues, V = np.linalg.eigh(X.T @ X)
+        order = np.argsort(eigenvalues)[::-1][:n_components]
+        s = np.sqrt(np.clip(eigenvalues[order], 0, None))
+        VT = V[:, order].T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            U = np.where(s > 0, (X @ VT.T) / s, 0)
+    return U, s, VT
+
+
+def __getattr__(name):
+    # GramEOF lives in gram_eof, which imports xeofs
+    if name == 'GramEOF':
+        from .gram_eof import GramEOF
+        return GramEOF
+    # WarmStartRotator lives in rotation, which imports xeofs as well
+    if name == 'WarmStartRotator':
+        from .rotation import WarmStartRotator
+        return WarmStartRotator
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _eof_model(n_modes, standardize, use_coslat, solver='auto', solver_kwargs=None, random_state=None):
+    """
+    Build an unfitted EOF model for the requested solver backend.
+    """
+    if solver not in EOF_SOLVERS:
+        raise ValueError(f"Invalid solver '{solver}'. Choose one of {EOF_SOLVERS}.")
+    import xeofs
+    from .gram_eof import GramEOF
+
+    model_class = GramEOF if solver == 'gram' else xeofs.single.EOF
+    return model_class(
+        n_modes=n_modes, standardize=standardize, use_coslat=use_coslat,
+        solver='full' if solver == 'gram' else solver,
+        solver_kwargs=dict(solver_kwargs or {}) if solver != 'gram' else {},
+        random_state=random_state
+    )
+
+
+# Unrotated fits kept for reuse by later rotations of the same data, most recent last. The fits
+# hold their input data, so the cache is bounded in bytes (0 disables it)
+EOF_CACHE_MAX_BYTES = 2**28
+_EOF_CACHE = collections.OrderedDict()
+_EOF_CACHE_SIZES = {}
+
+
+def clear_eof_cache():
+    """
+    Drop the unrotated EOF fits kept by compute_rotated_eofs.
+    """
+    _EOF_CACHE.clear()
+    _EOF_CACHE_SIZES.clear()
+
+
+def _keep_eof_model(key, model):
+    """Keep an unrotated fit, dropping the oldest ones beyond EOF_CACHE_MAX_BYTES."""
+    size = sum(model.data[name].nbytes for name in model.data.keys())
+    if size > EOF_CACHE_MAX_BYTES:
+        return
+    _EOF_CACHE[key] = model
+    _EOF_CACHE_SIZES[key] = size
+    while sum(_EOF_CACHE_SIZES.values()) > EOF_CACHE_MAX_BYTES:
+        old_key, _ = _EOF_CACHE.popitem(last=False)
+        del _EOF_CACHE_SIZES[old_key]
+
+
+def _eof_cache_key(data, n_modes, standardize, use_coslat, solver, solver_kwargs, random_state):
+    """
+    Cache key of an unrotated fit. The data token hashes the values and coordinates (or, for dask
+    input, the task graph), so equal data gives the same key whatever the object identity.
+    """
+    from dask.base import tokenize
+    return (tokenize(data), n_modes, standardize, use_coslat, solver, tokenize(solver_kwargs), random_state)
+
+
+@instrumented
+def compute_rotated_eofs(data, rotated=None, n_modes=None, standardize=None, use_coslat=None,
+    solver='auto', solver_kwargs=None, random_state=None, n_rotated=None, initial_rotation=None, cache=True):
     """
     Compute EOFs using the xeofs module, with optional Varimax or Promax rotation.
 
+    The unrotated fit of a rotation is kept (up to EOF_CACHE_MAX_BYTES, input data included) and
+    reused by later rotations of the same data with the same fit options, so comparing Varimax
+    with Promax or sweeping n_rotated costs one SVD in total: a rotation only works on the small
+    (feature, mode) loading matrix. Unrotated results are never kept.
+
     Parameters:
     -----------
     data : xarray.DataArray
@@ -172,17 +456,50 @@ def compute_rotated_eofs(data, rotated=None, n_modes=None, standardize=None, use
         Whether to standardize the data. Default is False.
     use_coslat : bool, optional
         If True (default), weights EOFs by the cosine of latitude for area-averaging.
+    solver : str, optional
+        SVD backend. Default is 'auto'.
+        - 'auto': xeofs policy, exact SVD for small problems and randomized SVD otherwise.
+        - 'full': exact dense SVD.
+        - 'randomized': randomized truncated SVD (Halko et al.). Cost grows with n_modes
+          rather than with the rank of the data.
+        - 'gram': eigendecomposition of the Gram matrix on the shorter side (time x time for
+          gridded fields). Exact up to rounding for the leading modes, but squares the condition
+          number, so trailing modes close to the noise floor lose precision.
+        Use check_eof_solver to measure the accuracy of a backend against 'full'.
+    solver_kwargs : dict, optional
+        Options of the randomized solver, e.g. {'n_oversamples': 20, 'n_iter': 7}
+        (see sklearn.utils.extmath.randomized_svd). More power iterations improve accuracy
+        when the singular values decay slowly.
+    random_state : int, optional
+        Seed of the randomized solver, for reproducible results.
+    n_rotated : int, optional
+        Number of leading modes to rotate (at least 2). Default is n_modes.
+    initial_rotation : numpy.ndarray or xeofs.single.EOFRotator, optional
+        Warm start of the rotation: a previously rotated model (e.g. the Varimax solution before
+        a Promax one, or a rotation of one mode less) or its rotation matrix. Default is the
+        identity, which gives the xeofs result.
+    cache : bool, optional
+        Reuse and keep the unrotated fit of a rotation. Default is True. Use clear_eof_cache to
+        free memory.
 
     Returns:
     --------
     model : xeofs.single.EOF or xeofs.single.EOFRotator
-        The fitted EOF model, either rotated or unrotated.
+        The fitted EOF model, either rotated or unrotated. Rotated models are
+        rotation.WarmStartRotator instances, whose 'varimax_rotation' can start the next rotation.
 
     Notes:
     ------
     - Varimax corresponds to orthogonal rotations (power=1).
     - Promax corresponds to oblique rotations (power=4).
     - Returns None if an invalid rotation option is provided.
+    - Raises ValueError for an invalid solver, n_rotated or initial_rotation.
+
+    Examples:
+    --------
+    >>> varimax = compute_rotated_eofs(anomaly, rotated='Varimax', n_modes=10)
+    >>> promax = compute_rotated_eofs(anomaly, rotated='Promax', n_modes=10, initial_rotation=varimax)
+    >>> sweep = [compute_rotated_eofs(anomaly, rotated='Varimax', n_modes=10, n_rotated=k) for k in range(2, 11)]
     """
     if rotated==None:
         n_modes = n_modes if n_modes is not None else 1
@@ -191,103 +508,225 @@ def compute_rotated_eofs(data, rotated=None, n_modes=None, standardize=None, use
     standardize = standardize if standardize is not None else False
     use_coslat = use_coslat if use_coslat is not None else True
     rotated = rotated if rotated is not None else False
+    n_rotated = n_rotated if n_rotated is not None else n_modes
 
-    model = xeofs.single.EOF(n_modes=n_modes, standardize=standardize, use_coslat=use_coslat)
-    
+    if rotated and rotated not in ('Varimax', 'Promax'):
+        print("Invalid rotation option. Please specify None, 'Varimax', or 'Promax'.")
+        return None
+
+    # Invalid options raise here rather than being reported as a failed fit below
+    if solver not in EOF_SOLVERS:
+        raise ValueError(f"Invalid solver '{solver}'. Choose one of {EOF_SOLVERS}.")
+    if rotated and not 2 <= n_rotated <= n_modes:
+        raise ValueError(f"n_rotated ({n_rotated}) must be at least 2 and cannot exceed n_modes ({n_modes}).")
+    if initial_rotation is not None:
+        import xeofs
+        if not isinstance(initial_rotation, xeofs.single.EOFRotator) and np.ndim(initial_rotation) != 2:
+            raise ValueError("initial_rotation must be a rotation matrix or a fitted xeofs.single.EOFRotator.")
+
+    cache = cache and bool(rotated) and EOF_CACHE_MAX_BYTES > 0
     try:
-        model.fit(data, dim="time")
-        
+        key = _eof_cache_key(data, n_modes, standardize, use_coslat, solver, solver_kwargs,
+                             random_state) if cache else None
+        model = _EOF_CACHE.get(key) if cache else None
+        if model is not None:
+            _EOF_CACHE.move_to_end(key)
+        else:
+            # The decomposition needs concrete values, so lazy (dask) input is only read here,
+            # after the anomaly and regional selection have reduced it.
+            if data.chunks is not None:
+                with stage('compute', data=data) as record:
+                    data = record.set_output(data.compute())
+
+            model = _eof_model(n_modes, standardize, use_coslat, solver=solver, solver_kwargs=solver_kwargs,
+                               random_state=random_state)
+            with stage('eof_fit', data=data, solver=solver, n_modes=n_modes):
+                model.fit(data, dim="time")
+            if cache:
+                _keep_eof_model(key, model)
+
         # If no rotation is specified, return the fitted EOF model.
         if not rotated:
             return model
-        
-        # Choose the rotation method based on the input.
-        if rotated == 'Varimax':
-            rot_model = xeofs.single.EOFRotator(n_modes=n_modes, power=1)  # Varimax: Orthogonal rotation
-            return rot_model.fit(model)
-        elif rotated == 'Promax':
-            rot_model = xeofs.single.EOFRotator(n_modes=n_modes, power=4)  # Promax: Oblique rotation
+
+        from .rotation import WarmStartRotator
+
+        # Varimax: orthogonal rotation (power=1), Promax: oblique rotation (power=4)
+        rot_model = WarmStartRotator(n_modes=n_rotated, power=1 if rotated == 'Varimax' else 4,
+                                     initial_rotation=initial_rotation)
+        with stage('rotation', method=rotated, n_modes=n_rotated, warm_start=initial_rotation is not None):
             return rot_model.fit(model)
-        else:
-            print("Invalid rotation option. Please specify None, 'Varimax', or 'Promax'.")
-            return None
-    
+
     except Exception as e:
         print(f"Error during EOF calculation: {e}")
         return None
 
 
 
-def lanczos_filter_xarray(data, dT=1, Cf=None, Cf2=None, M=100, filter_type='low', time_dim=None):
+@instrumented
+def check_eof_solver(data, solver='randomized', n_modes=10, standardize=False, use_coslat=True,
+    solver_kwargs=None, random_state=None):
     """
-    Apply a Lanczos filter to an xarray DataArray using FFT-based filtering.
-    
+    Measure the accuracy of an EOF solver backend against the exact ('full') solver.
+
+    Both models are fitted on the same data and compared mode by mode. Singular vectors are only
+    defined up to sign, so patterns are compared through the absolute correlation, and near-degenerate
+    modes through the subspace they span.
+
     Parameters:
-    - data (xarray.DataArray): Input data to filter
-    - dT (float): Sampling interval (default: 1)
-    - Cf (float): Lower cut-off frequency in 1/dT units (default: Nyquist/2 for low/high-pass)
-    - Cf2 (float): Upper cut-off frequency (only used for bandpass)
-    - M (int): Number of coefficients (default: 100)
-    - filter_type (str): Type of filter - 'low', 'high', or 'band'
-    - time_dim (str): The name of the time dimension (default: auto-detect)
-    
+    -----------
+    data : xarray.DataArray
+        Input data with a time dimension, as passed to compute_rotated_eofs.
+    solver : str, optional
+        Backend to check: 'auto', 'randomized' or 'gram'. Default is 'randomized'.
+    n_modes : int, optional
+        Number of modes to compare. Default is 10.
+    standardize, use_coslat : bool, optional
+        As in compute_rotated_eofs.
+    solver_kwargs : dict, optional
+        Options of the randomized solver, e.g. {'n_oversamples': 20, 'n_iter': 7}.
+    random_state : int, optional
+        Seed of the randomized solver.
+
     Returns:
-    - xarray.DataArray: Filtered data
+    --------
+    xarray.Dataset
+        Per mode:
+        - 'singular_value_error': relative error of the singular value.
+        - 'pattern_correlation': absolute correlation between the two patterns (1 is exact).
+        - 'subspace_angle': largest principal angle in degrees between the spaces spanned by
+          modes 1..k of both solutions (0 is exact).
+        - 'explained_variance_ratio_error': absolute error of the explained variance ratio.
+
+    Examples:
+    --------
+    >>> check = check_eof_solver(sst_anomaly, solver='randomized', n_modes=5, solver_kwargs={'n_iter': 4})
+    >>> float(check.pattern_correlation.min())    # > 0.999 for well separated modes
     """
-    # Auto-detect time dimension if not provided
-    if time_dim is None:
-        time_dim = [dim for dim in data.dims if "time" in dim.lower()]
-        if not time_dim:
-            raise ValueError("Time dimension not found. Please specify 'time_dim'.")
-        time_dim = time_dim[0]
-    
+    if data.chunks is not None:
+        data = data.compute()
+
+    exact = _eof_model(n_modes, standardize, use_coslat, solver='full').fit(data, dim="time")
+    approx = _eof_model(n_modes, standardize, use_coslat, solver=solver, solver_kwargs=solver_kwargs,
+                        random_state=random_state).fit(data, dim="time")
+
+    # Components live in the weighted, NaN-free feature space where they are orthonormal
+    reference = exact.data['components'].transpose('feature', 'mode').values
+    candidate = approx.data['components'].transpose('feature', 'mode').values
+
+    overlap = reference.T @ candidate
+    pattern_correlation = np.abs(np.diag(overlap))
+    subspace_angle = np.empty(n_modes)
+    for k in range(1, n_modes + 1):
+        cosines = np.linalg.svd(overlap[:k, :k], compute_uv=False)
+        subspace_angle[k - 1] = np.degrees(np.arccos(np.clip(cosines.min(), -1, 1)))
+
+    s_exact = exact.singular_values().values
+    s_approx = approx.singular_values().values
+    modes = exact.singular_values().mode.values
+
+    return xr.Dataset(
+        {
+            'singular_value_error': ('mode', np.abs(s_approx - s_exact) / s_exact),
+            'pattern_correlation': ('mode', pattern_correlation),
+            'subspace_angle': ('mode', subspace_angle),
+            'explained_variance_ratio_error': ('mode', np.abs(approx.explained_variance_ratio().values
+                                                             - exact.explained_variance_ratio().values)),
+        },
+        coords={'mode': modes},
+        attrs={'solver': solver},
+    )
+
+
+
+@functools.lru_cache(maxsize=64)
+def _lanczos_response(n_time, M, Cf, Cf2, filter_type):
+    """
+    Frequency response of the Lanczos filter on the rfft bins of a series of length 'n_time'.
+
+    Cut-offs are given as fractions of the Nyquist frequency. The response is cached per
+    (n_time, M, Cf, Cf2, filter_type) and returned read-only.
+    """
+    n = np.arange(0, M + 1)
+    sigma = np.sinc(n / M)
+
+    if filter_type == 'low':
+        coef = Cf * np.sinc(2 * Cf * n) * sigma
+    elif filter_type == 'high':
+        coef = -Cf * np.sinc(2 * Cf * n) * sigma
+        coef[0] += 1
+    elif filter_type == 'band':
+        coef = (Cf2 * np.sinc(2 * Cf2 * n) - Cf * np.sinc(2 * Cf * n)) * sigma
+    else:
+        raise ValueError("Invalid filter type. Choose 'low', 'high', or 'band'")
 
+    # Only the first n_time // 2 + 1 points of the frequency axis are used by the rfft bins
+    Ff = np.linspace(0, 1, n_time)[:n_time // 2 + 1]
+    window = coef[0] + 2 * np.sum(coef[1:] * np.cos(np.pi * np.outer(Ff, np.arange(1, M + 1))), axis=1)
+    window.flags.writeable = False
+    return window
+
+
+def _lanczos_window(n_time, dT=1, Cf=None, Cf2=None, M=100, filter_type='low'):
+    """
+    Normalize the cut-off frequencies by the Nyquist frequency and return the cached response.
+    """
     Nf = 1 / (2 * dT)
     if Cf is None:
         Cf = Nf / 2
-    
+
     Cf /= Nf
-    
+
     if filter_type == 'band':
         if Cf2 is None:
             raise ValueError("For bandpass, Cf2 must be specified.")
         Cf2 /= Nf
+    else:
+        Cf2 = None
 
+    return _lanczos_response(n_time, M, Cf, Cf2, filter_type)
 
-    n = np.arange(0, M + 1)
-    sigma = np.sinc(n / M)
-    hk_low = Cf * np.sinc(2 * Cf * n) * sigma
-    hk_high = -Cf * np.sinc(2 * Cf * n) * sigma
-    hk_high[0] += 1
+
+def _detect_time_dim(data, time_dim=None):
+    if time_dim is None:
+        time_dim = [dim for dim in data.dims if "time" in dim.lower()]
+        if not time_dim:
+            raise ValueError("Time dimension not found. Please specify 'time_dim'.")
+        time_dim = time_dim[0]
+    return time_dim
+
+
+@instrumented
+def lanczos_filter_xarray(data, dT=1, Cf=None, Cf2=None, M=100, filter_type='low', time_dim=None):
+    """
+    Apply a Lanczos filter to an xarray DataArray using FFT-based filtering.
     
-    if filter_type == 'low':
-        coef = hk_low
-    elif filter_type == 'high':
-        coef = hk_high
-    elif filter_type == 'band':
-        hk_band = (Cf2 * np.sinc(2 * Cf2 * n) - Cf * np.sinc(2 * Cf * n)) * sigma
-        coef = hk_band
-    else:
-        raise ValueError("Invalid filter type. Choose 'low', 'high', or 'band'")
+    Parameters:
+    - data (xarray.DataArray): Input data to filter
+    - dT (float): Sampling interval (default: 1)
+    - Cf (float): Lower cut-off frequency in 1/dT units (default: Nyquist/2 for low/high-pass)
+    - Cf2 (float): Upper cut-off frequency (only used for bandpass)
+    - M (int): Number of coefficients (default: 100)
+    - filter_type (str): Type of filter - 'low', 'high', or 'band'
+    - time_dim (str): The name of the time dimension (default: auto-detect)
     
+    Returns:
+    - xarray.DataArray: Filtered data
+    """
+    # Auto-detect time dimension if not provided
+    time_dim = _detect_time_dim(data, time_dim)
+    window = _lanczos_window(data.sizes[time_dim], dT=dT, Cf=Cf, Cf2=Cf2, M=M, filter_type=filter_type)
 
-    Ff = np.linspace(0, 1, data.sizes[time_dim])
-    window = np.zeros_like(Ff)
-    for i, f in enumerate(Ff):
-        window[i] = coef[0] + 2 * np.sum(coef[1:] * np.cos(np.pi * np.arange(1, M + 1) * f))
-    
 
     def apply_fft_filtering(arr):
-        Cx = np.fft.rfft(arr)
-        CxH = Cx * window[:len(Cx)]
-        return np.fft.irfft(CxH, n=len(arr))
+        Cx = np.fft.rfft(arr, axis=-1)
+        return np.fft.irfft(Cx * window, n=arr.shape[-1], axis=-1)
     
     filtered = xr.apply_ufunc(
         apply_fft_filtering,
         data,
         input_core_dims=[[time_dim]],
         output_core_dims=[[time_dim]],
-        vectorize=True,
         dask="parallelized",
         output_dtypes=[data.dtype]
     )
@@ -296,6 +735,57 @@ def lanczos_filter_xarray(data, dT=1, Cf=None, Cf2=None, M=100, filter_type='low
 
 
 
+@instrumented
+def lanczos_filter_bank(data, bands, dT=1, M=100, time_dim=None, band_dim='band'):
+    """
+    Apply several Lanczos filters to one field with a single forward FFT.
+
+    Every band reuses the spectrum of the data and only pays for its own inverse FFT, so
+    splitting a field into e.g. interannual and decadal components costs one pass.
+
+    Parameters:
+    - data (xarray.DataArray): Input data to filter
+    - bands (dict): Mapping from band name to the keyword arguments of lanczos_filter_xarray
+      describing it, e.g. {'interannual': {'filter_type': 'band', 'Cf': 1/96, 'Cf2': 1/18},
+      'decadal': {'filter_type': 'low', 'Cf': 1/120}}. Keys 'filter_type', 'Cf', 'Cf2' and 'M'
+      are recognised.
+    - dT (float): Sampling interval (default: 1)
+    - M (int): Number of coefficients for bands that do not set their own (default: 100)
+    - time_dim (str): The name of the time dimension (default: auto-detect)
+    - band_dim (str): Name of the new dimension holding the bands (default: 'band')
+
+    Returns:
+    - xarray.DataArray: Filtered data with a leading 'band_dim' dimension, one entry per band
+    """
+    time_dim = _detect_time_dim(data, time_dim)
+    n_time = data.sizes[time_dim]
+    names = list(bands)
+    windows = np.stack([
+        _lanczos_window(n_time, dT=dT, Cf=spec.get('Cf'), Cf2=spec.get('Cf2'), M=spec.get('M', M),
+                        filter_type=spec.get('filter_type', 'low'))
+        for spec in bands.values()
+    ])
+
+
+    def apply_fft_filter_bank(arr):
+        Cx = np.fft.rfft(arr, axis=-1)
+        return np.fft.irfft(Cx[..., np.newaxis, :] * windows, n=arr.shape[-1], axis=-1)
+
+    filtered = xr.apply_ufunc(
+        apply_fft_filter_bank,
+        data,
+        input_core_dims=[[time_dim]],
+        output_core_dims=[[band_dim, time_dim]],
+        dask="parallelized",
+        output_dtypes=[data.dtype],
+        dask_gufunc_kwargs={'output_sizes': {band_dim: len(names)}},
+    )
+
+    return filtered.assign_coords({band_dim: names}).transpose(band_dim, *data.dims)
+
+
+
+@instrumented
 def standardize_data(data, data_std_dev=None, dim=None):
     """
     Standardizes the input data along a specified dimension.
@@ -321,6 +811,7 @@ def standardize_data(data, data_std_dev=None, dim=None):
         return data/data_std_dev
 
 
+@instrumented
 def project_data_onto_eofs(data, eof_modes):
     """
     Projects the input data onto the provided Empirical Orthogonal Functions (EOF) modes.
@@ -334,10 +825,14 @@ def project_data_onto_eofs(data, eof_modes):
     """
     return xr.dot(data, eof_modes)
 
+@instrumented
 def stack_vars(list_vars, stack_name=None, drop_dims=[]):
     """
     Stack a list of xarray DataArray or Dataset objects along a new dimension.
 
+    The result is a new array holding a copy of every variable. For combined EOFs of large
+    fields, combined_eof.combined_eofs works on the list directly without the copy.
+
     Parameters:
     -----------
     list_vars : list of xarray.DataArray or xarray.Dataset